@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""Benchmark the navigation of views over huge synthetic datasets.
+
+Every dataset of a benchmark file (see `create_testfile.createBenchmarkFile`)
+is opened in a view and a set of scripted sessions is replayed on it:
+Home/End jumps, PageDown storms, wheel scrolls and slider drags. For every
+session the time per buffer fault, the paint time and the peak RSS of the
+process are reported.
+
+The benchmark runs headless::
+
+    QT_QPA_PLATFORM=offscreen python tests/benchmark_navigation.py \\
+        --rows 1000000 --json results.json
+
+The benchmark file is created in a temporary directory unless an existing
+file is given with ``--file``.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import tables
+from qtpy import QtCore, QtGui, QtWidgets
+
+import create_testfile
+import vitables.vtapp
+from vitables.preferences import vtconfig
+from vitables.vttables import metrics
+
+#: The number of events replayed by every session.
+SESSION_EVENTS = 200
+
+#: The datasets of a benchmark file.
+DATASETS = {
+    'table': '/table',
+    'wide': '/wide',
+    'vlarray': '/vlarray',
+    'earray': '/earray',
+    'filenode': '/filenode',
+    'frame': '/frame/table',
+}
+
+
+def peakRSS():
+    """The peak resident set size of the process in MiB (None if unknown)."""
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / 2**20
+    return peak / 2**10
+
+
+def processEvents():
+    """Deliver the pending events (including read-ahead pages)."""
+
+    QtCore.QCoreApplication.processEvents()
+
+
+def pressKey(view, key):
+    """Send a key press to a view.
+
+    :Parameters:
+
+    - `view`: the view receiving the event
+    - `key`: a member of the Qt.Key enum
+    """
+
+    event = QtGui.QKeyEvent(QtCore.QEvent.KeyPress, key,
+                            QtCore.Qt.NoModifier)
+    view.keyPressEvent(event)
+
+
+def wheel(view, delta):
+    """Send a vertical wheel event to a view.
+
+    :Parameters:
+
+    - `view`: the view receiving the event
+    - `delta`: the wheel rotation in eighths of a degree
+    """
+
+    center = view.viewport().rect().center()
+    event = QtGui.QWheelEvent(QtCore.QPointF(center),
+                              QtCore.QPointF(view.mapToGlobal(center)),
+                              QtCore.QPoint(0, 0), QtCore.QPoint(0, delta),
+                              QtCore.Qt.NoButton, QtCore.Qt.NoModifier,
+                              QtCore.Qt.NoScrollPhase, False)
+    view.wheelEvent(event)
+
+
+def drag(view, fraction):
+    """Drag the vertical slider of a view to a given position.
+
+    :Parameters:
+
+    - `view`: the view being navigated
+    - `fraction`: the slider position as a fraction of its range
+    """
+
+    scrollbar = getattr(view, 'tricky_vscrollbar', None)
+    if scrollbar is None:
+        scrollbar = view.verticalScrollBar()
+        scrollbar.setValue(round(fraction * scrollbar.maximum()))
+        return
+    scrollbar.setSliderPosition(round(fraction * scrollbar.maximum()))
+    scrollbar.triggerAction(QtWidgets.QAbstractSlider.SliderMove)
+
+
+def homeEndSession(view):
+    """Jump between the first and the last rows."""
+
+    for event in range(SESSION_EVENTS // 10):
+        yield lambda: pressKey(view, QtCore.Qt.Key_End)
+        yield lambda: pressKey(view, QtCore.Qt.Key_Home)
+
+
+def pageDownSession(view):
+    """Go down a page at a time."""
+
+    yield lambda: pressKey(view, QtCore.Qt.Key_Home)
+    for event in range(SESSION_EVENTS):
+        yield lambda: pressKey(view, QtCore.Qt.Key_PageDown)
+
+
+def wheelSession(view):
+    """Scroll down and up with the mouse wheel."""
+
+    for delta in (-360, 360):
+        for event in range(SESSION_EVENTS // 2):
+            yield lambda delta=delta: wheel(view, delta)
+
+
+def dragSession(view):
+    """Drag the slider along the whole dataset and back."""
+
+    steps = SESSION_EVENTS // 2
+    for step in list(range(steps + 1)) + list(range(steps, -1, -1)):
+        yield lambda step=step: drag(view, step / steps)
+
+
+#: The scripted sessions replayed on every dataset.
+SESSIONS = {
+    'home_end': homeEndSession,
+    'page_down': pageDownSession,
+    'wheel': wheelSession,
+    'drag': dragSession,
+}
+
+
+def replay(view, session):
+    """Replay a scripted session on a view.
+
+    :Parameters:
+
+    - `view`: the view being navigated
+    - `session`: a callable that yields the steps of the session
+
+    :Returns: a dictionary with the measurements of the session
+    """
+
+    collector = metrics.getMetrics()
+    collector.reset()
+    view.setCurrentIndex(view.model().index(0, 0))
+    paint_times = []
+    started = time.perf_counter()
+    for step in session(view):
+        step()
+        processEvents()
+        painting = time.perf_counter()
+        view.viewport().repaint()
+        paint_times.append(time.perf_counter() - painting)
+    elapsed = time.perf_counter() - started
+    snapshot = collector.toDict()
+    return {
+        'events': len(paint_times),
+        'elapsed_s': elapsed,
+        'faults': snapshot['faults']['count'],
+        'fault_ms': snapshot['faults']['mean_ms'],
+        'fault_max_ms': snapshot['faults']['max_ms'],
+        'read_ms': snapshot['reads']['mean_ms'],
+        'cache_hit_ratio': snapshot['cache']['hit_ratio'],
+        'paint_ms': 1000 * sum(paint_times) / max(len(paint_times), 1),
+        'paint_max_ms': 1000 * max(paint_times, default=0),
+        'peak_rss_mib': peakRSS(),
+    }
+
+
+def treeIndex(view, filepath, nodepath):
+    """Find a node in the tree of databases.
+
+    Groups are expanded via the tree view (and not via its model) so that
+    the view keeps in sync with the lazily populated model.
+
+    :Parameters:
+
+    - `view`: the tree of databases view
+    - `filepath`: the full path of the file containing the node
+    - `nodepath`: the full path of the node in the file
+
+    :Returns: the model index of the node
+    """
+
+    model = view.model()
+    root = QtCore.QModelIndex()
+    for row in range(model.rowCount(root)):
+        index = model.index(row, 0, root)
+        if model.nodeFromIndex(index).filepath == filepath:
+            break
+    else:
+        raise ValueError(f'{filepath} is not open')
+    for name in filter(None, nodepath.split('/')):
+        view.expand(index)
+        for row in range(model.rowCount(index)):
+            child = model.index(row, 0, index)
+            if model.nodeFromIndex(child).name == name:
+                index = child
+                break
+        else:
+            raise ValueError(f'{nodepath} not found in {filepath}')
+    return index
+
+
+def runBenchmark(vtapp, filepath, datasets, sessions=None):
+    """Replay the scripted sessions on every dataset of a file.
+
+    :Parameters:
+
+    - `vtapp`: the application instance
+    - `filepath`: the full path of the benchmark file
+    - `datasets`: the full paths of the datasets keyed by a short name
+    - `sessions`: the names of the sessions being replayed (all by default)
+
+    :Returns: the measurements keyed by dataset and session names
+    """
+
+    gui = vtapp.gui
+    gui.resize(1280, 900)
+    gui.show()
+    vtapp.fileOpen(filepath, mode='r')
+    results = {}
+    try:
+        for name, nodepath in datasets.items():
+            index = treeIndex(gui.dbs_tree_view, filepath, nodepath)
+            gui.dbs_tree_view.setCurrentIndex(index)
+            started = time.perf_counter()
+            vtapp.nodeOpen(index)
+            processEvents()
+            datasheet = gui.workspace.subWindowList()[-1]
+            datasheet.showMaximized()
+            processEvents()
+            results[name] = {'open_s': time.perf_counter() - started}
+            for session in (sessions or SESSIONS):
+                results[name][session] = replay(datasheet.leaf_view,
+                                                SESSIONS[session])
+            datasheet.close()
+            processEvents()
+    finally:
+        root = treeIndex(gui.dbs_tree_view, filepath, '')
+        vtapp.fileClose(root)
+        processEvents()
+    return results
+
+
+def printResults(results):
+    """Print the measurements as a table.
+
+    :Parameter results: the measurements returned by `runBenchmark`
+    """
+
+    print(f"{'dataset':<10} {'session':<10} {'faults':>7} {'ms/fault':>9} "
+          f"{'paint ms':>9} {'elapsed s':>10} {'RSS MiB':>8}")
+    for name, sessions in results.items():
+        for session, values in sessions.items():
+            if not isinstance(values, dict):
+                continue
+            rss = values['peak_rss_mib']
+            print(f"{name:<10} {session:<10} {values['faults']:>7} "
+                  f"{values['fault_ms']:>9.2f} {values['paint_ms']:>9.2f} "
+                  f"{values['elapsed_s']:>10.2f} "
+                  f"{rss if rss is None else round(rss):>8}")
+
+
+def main(argv=None):
+    """Parse the command line and run the benchmark."""
+
+    global SESSION_EVENTS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int,
+                        default=create_testfile.BENCHMARK_ROWS,
+                        help='the number of rows of the biggest dataset')
+    parser.add_argument('--file', help='an existing benchmark file')
+    parser.add_argument('--datasets', nargs='+',
+                        help='the datasets being benchmarked (all by default)')
+    parser.add_argument('--sessions', nargs='+', choices=sorted(SESSIONS),
+                        help='the sessions being replayed (all by default)')
+    parser.add_argument('--events', type=int, default=SESSION_EVENTS,
+                        help='the number of events replayed by sessions')
+    parser.add_argument('--json', help='save the results in a JSON file')
+    args = parser.parse_args(argv)
+    SESSION_EVENTS = args.events
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    app.setOrganizationDomain('vitables.org')
+    app.setOrganizationName('ViTables')
+    app.setApplicationName('ViTables')
+    app.setApplicationVersion(vtconfig.getVersion())
+    vtapp = vitables.vtapp.VTApp(keep_splash=False)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = args.file
+        if filepath is None:
+            filepath = os.path.join(tmpdir, 'benchmark.h5')
+            print(f'Creating {filepath} ({args.rows} rows)...')
+            datasets = create_testfile.createBenchmarkFile(filepath,
+                                                           args.rows)
+        else:
+            with tables.open_file(filepath, 'r') as h5file:
+                datasets = {name: path for name, path in DATASETS.items()
+                            if path in h5file}
+        if args.datasets:
+            datasets = {name: path for name, path in datasets.items()
+                        if name in args.datasets}
+        results = runBenchmark(vtapp, filepath, datasets, args.sessions)
+
+    printResults(results)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump({'rows': args.rows, 'events': args.events,
+                       'results': results}, json_file, indent=2)
+    vtapp.gui.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,6 @@ def launcher():
 def h5file():
     if not os.path.exists('testfile.h5'):
         import create_testfile
-        print(create_testfile)
+        create_testfile.createTestFile('testfile.h5')
     yield tables.open_file('testfile.h5', 'r')
     os.remove('testfile.h5')
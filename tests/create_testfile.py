@@ -18,11 +18,26 @@
 #
 #       Author:  Vicent Mas - vmas@vitables.org
 
-"""Create a PyTables file for testing purposes."""
+"""Create PyTables files for testing and benchmarking purposes.
 
+`createTestFile` creates the small file used by the test suite.
+`createBenchmarkFile` creates a file with huge synthetic datasets of every
+kind supported by the views (see ``benchmark_navigation.py``).
+"""
+
+import numpy as np
 import tables
 from tables.nodes import filenode
 
+#: The number of rows of the biggest benchmark dataset.
+BENCHMARK_ROWS = 10**8
+
+#: The number of rows written at once in benchmark datasets.
+BLOCK_ROWS = 10**6
+
+#: The number of columns of the wide benchmark array.
+WIDE_COLUMNS = 5000
+
 
 class Particle(tables.IsDescription):
     """Description of a table record.
@@ -33,41 +48,153 @@ class Particle(tables.IsDescription):
     pressure    = tables.Float32Col(pos=4)      # float  (single-precision)
     temperature = tables.Float64Col(pos=5)      # double (double-precision)
 
-# Create a file in write mode
-h5file = tables.open_file('testfile.h5', 'w')
-
-# Create a table
-root = h5file.root
-group = h5file.create_group(root, "tables")
-table = h5file.create_table(group, 'Particles', Particle, "A table", tables.Filters(1))
-
-# Fill the table with 10 particles
-particle = table.row
-for i in range(10):
-    # First, assign the values to the Particle record
-    particle['name']  = f'Particle: {i:6d}'
-    particle['lati'] = i
-    particle['longi'] = 10 - i
-    particle['pressure'] = float(i*i)
-    particle['temperature'] = float(i**2)
-    # This injects the row values.
-    particle.append()
-
-# We need to flush the buffers in table in order to get an
-# accurate number of records on it.
-table.flush()
-
-# Create a filenode
-fnode = filenode.new_node(h5file, where='/', name='filenode')
-
-# Fill the filenode
-counter = 0
-while counter < 10:
-    line = f"This is a line inserted programmatically at position {counter}\n"
-    fnode.write(line.encode("utf-8"))
-    counter += 1
-fnode.write(bytearray("This is the last line.\n", "utf-8"))
-fnode.attrs.author = "Vicent Mas"
-fnode.close()
-
-h5file.close()
+
+def createTestFile(filepath='testfile.h5'):
+    """Create the file used by the test suite.
+
+    :Parameter filepath: the full path of the file being created
+    """
+
+    # Create a file in write mode
+    h5file = tables.open_file(filepath, 'w')
+
+    # Create a table
+    root = h5file.root
+    group = h5file.create_group(root, "tables")
+    table = h5file.create_table(group, 'Particles', Particle, "A table",
+                                tables.Filters(1))
+
+    # Fill the table with 10 particles
+    particle = table.row
+    for i in range(10):
+        # First, assign the values to the Particle record
+        particle['name']  = f'Particle: {i:6d}'
+        particle['lati'] = i
+        particle['longi'] = 10 - i
+        particle['pressure'] = float(i*i)
+        particle['temperature'] = float(i**2)
+        # This injects the row values.
+        particle.append()
+
+    # We need to flush the buffers in table in order to get an
+    # accurate number of records on it.
+    table.flush()
+
+    # Create a filenode
+    fnode = filenode.new_node(h5file, where='/', name='filenode')
+
+    # Fill the filenode
+    counter = 0
+    while counter < 10:
+        line = (f"This is a line inserted programmatically at position "
+                f"{counter}\n")
+        fnode.write(line.encode("utf-8"))
+        counter += 1
+    fnode.write(bytearray("This is the last line.\n", "utf-8"))
+    fnode.attrs.author = "Vicent Mas"
+    fnode.close()
+
+    h5file.close()
+
+
+def appendBlocks(leaf, nrows, makeBlock):
+    """Fill a dataset by blocks of rows.
+
+    :Parameters:
+
+    - `leaf`: the dataset being filled
+    - `nrows`: the number of rows being appended
+    - `makeBlock`: a callable that returns the rows in a given range
+    """
+
+    for start in range(0, nrows, BLOCK_ROWS):
+        leaf.append(makeBlock(start, min(start + BLOCK_ROWS, nrows)))
+    leaf.flush()
+
+
+def createBenchmarkFile(filepath, nrows=BENCHMARK_ROWS):
+    """Create a file with huge synthetic datasets.
+
+    Dataset sizes are proportional to `nrows`. Datasets are compressed so
+    the file is much smaller than the data it contains.
+
+    :Parameters:
+
+    - `filepath`: the full path of the file being created
+    - `nrows`: the number of rows of the biggest dataset
+
+    :Returns: the full paths of the created datasets keyed by a short name
+    """
+
+    filters = tables.Filters(5, 'blosc' if tables.which_lib_version('blosc')
+                             else 'zlib')
+    datasets = {}
+    with tables.open_file(filepath, 'w') as h5file:
+        # A long table with numeric and string fields
+        dtype = np.dtype([('index', 'i8'), ('value', 'f8'), ('label', 'S16')])
+        table = h5file.create_table('/', 'table', description=dtype,
+                                    filters=filters, expectedrows=nrows)
+
+        def tableBlock(start, stop):
+            block = np.empty(stop - start, dtype=dtype)
+            block['index'] = np.arange(start, stop)
+            block['value'] = block['index'] / 7.
+            block['label'] = b'row'
+            return block
+
+        appendBlocks(table, nrows, tableBlock)
+        datasets['table'] = table._v_pathname
+
+        # A wide array whose columns are windowed by the views
+        wide_rows = max(nrows // 10000, 100)
+        wide = h5file.create_earray('/', 'wide', atom=tables.Float32Atom(),
+                                    shape=(0, WIDE_COLUMNS), filters=filters,
+                                    expectedrows=wide_rows)
+        appendBlocks(wide, wide_rows, lambda start, stop: np.add.outer(
+            np.arange(start, stop, dtype='f4'),
+            np.arange(WIDE_COLUMNS, dtype='f4')))
+        datasets['wide'] = wide._v_pathname
+
+        # A VLArray with rows of variable length
+        vlarray = h5file.create_vlarray('/', 'vlarray',
+                                        atom=tables.Int32Atom(),
+                                        filters=filters,
+                                        expectedrows=max(nrows // 1000, 100))
+        for row in range(max(nrows // 1000, 100)):
+            vlarray.append(np.arange(row % 10))
+        vlarray.flush()
+        datasets['vlarray'] = vlarray._v_pathname
+
+        # An EArray whose enlargeable dimension is not the first one
+        earray_rows = max(nrows // 100, 100)
+        earray = h5file.create_earray('/', 'earray', atom=tables.Float64Atom(),
+                                      shape=(3, 0), filters=filters,
+                                      expectedrows=earray_rows)
+        appendBlocks(earray, earray_rows, lambda start, stop: np.vstack(
+            [np.arange(start, stop) + offset for offset in range(3)]))
+        datasets['earray'] = earray._v_pathname
+
+        # A filenode with many lines of text
+        fnode = filenode.new_node(h5file, where='/', name='filenode',
+                                  filters=filters)
+        for line in range(max(nrows // 1000, 100)):
+            fnode.write(f'This is line {line} of the filenode\n'.encode())
+        fnode.close()
+        datasets['filenode'] = '/filenode'
+
+    # A pandas dataframe (if pandas is available)
+    try:
+        import pandas as pd
+    except ImportError:
+        return datasets
+    frame_rows = max(nrows // 100, 100)
+    frame = pd.DataFrame({'value': np.arange(frame_rows) / 3.,
+                          'count': np.arange(frame_rows)})
+    frame.to_hdf(filepath, key='frame', mode='a', format='table',
+                 complevel=5)
+    datasets['frame'] = '/frame/table'
+    return datasets
+
+
+if __name__ == '__main__':
+    createTestFile()
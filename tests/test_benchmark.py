@@ -0,0 +1,26 @@
+"""Test class for the navigation benchmark."""
+
+import pytest
+
+import benchmark_navigation
+import create_testfile
+
+
+@pytest.mark.usefixtures('launcher')
+class TestBenchmark:
+    """Replay short sessions on small benchmark datasets."""
+
+    def test_runBenchmark(self, launcher, tmp_path, monkeypatch):
+        monkeypatch.setattr(benchmark_navigation, 'SESSION_EVENTS', 10)
+        filepath = str(tmp_path / 'benchmark.h5')
+        datasets = create_testfile.createBenchmarkFile(filepath, 300000)
+        assert {'table', 'wide', 'vlarray', 'earray',
+                'filenode'} <= set(datasets)
+        datasets = {name: datasets[name] for name in ('table', 'earray')}
+        results = benchmark_navigation.runBenchmark(
+            launcher.vtapp_object, filepath, datasets, ['home_end', 'drag'])
+        assert sorted(results) == ['earray', 'table']
+        home_end = results['table']['home_end']
+        assert home_end['events'] == 2
+        assert home_end['faults'] >= 1
+        assert home_end['paint_ms'] >= 0
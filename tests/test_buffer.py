@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""Test class for the buffer, page cache and metrics modules."""
+
+import json
+import time
+
+import numpy as np
+import pytest
+import tables
+from qtpy import QtCore
+
+import vitables.vttables.buffer as vtbuffer
+import vitables.vttables.leaf_model as leaf_model
+import vitables.vttables.metrics as vtmetrics
+import vitables.vttables.pagecache as pagecache
+import vitables.vttables.readahead as readahead
+
+
+@pytest.fixture()
+def datafile(tmp_path):
+    """A file with a table and several kind of arrays."""
+
+    h5file = tables.open_file(str(tmp_path / 'buffer.h5'), 'w')
+    records = np.zeros(1000, dtype=[('x', 'i4'), ('y', 'f8')])
+    records['x'] = np.arange(1000)
+    records['y'] = np.arange(1000) / 2.
+    h5file.create_table('/', 'table', obj=records)
+    h5file.create_array('/', 'array', obj=np.arange(3000).reshape(1000, 3))
+    h5file.create_array('/', 'scalar', obj=np.int64(7))
+    earray = h5file.create_earray('/', 'earray', atom=tables.Int32Atom(),
+                                  shape=(2, 0))
+    earray.append(np.arange(2000).reshape(2, 1000))
+    vlarray = h5file.create_vlarray('/', 'vlarray', atom=tables.Int32Atom())
+    for i in range(1000):
+        vlarray.append(np.arange(i % 5))
+    yield h5file
+    h5file.close()
+
+
+class TestPageCache:
+    """Test class for module pagecache."""
+
+    def test_lru_eviction(self):
+        cache = pagecache.PageCache(max_pages=2)
+        cache.put(0, np.zeros(10))
+        cache.put(1, np.zeros(10))
+        assert cache.get(0) is not None
+        cache.put(2, np.zeros(10))
+        assert 0 in cache
+        assert 1 not in cache
+        assert 2 in cache
+        assert (cache.hits, cache.misses) == (1, 0)
+
+    def test_memory_budget(self):
+        cache = pagecache.PageCache(max_pages=10, max_bytes=200)
+        for key in range(5):
+            cache.put(key, np.zeros(10))
+        assert len(cache) == 2
+        assert cache.nbytes == 160
+        # The latest page is kept even if it doesn't fit the budget
+        cache.put(5, np.zeros(100))
+        assert list(cache.pages) == [5]
+        cache.clear()
+        assert (len(cache), cache.nbytes) == (0, 0)
+
+    def test_groups(self):
+        cache = pagecache.PageCache(max_pages=3)
+        for key in range(4):
+            cache.put(('a', key), np.zeros(10), group='a')
+        cache.put(('b', 0), np.zeros(5), group='b')
+        # Evicted pages are removed from their groups
+        assert cache.groupKeys('a') == [('a', 2), ('a', 3)]
+        assert (cache.groupBytes('a'), cache.groupBytes('b')) == (160, 40)
+        cache.discard(('b', 0))
+        assert (cache.groupKeys('b'), cache.groupBytes('b')) == ([], 0)
+        cache.clear()
+        assert (len(cache), cache.nbytes) == (0, 0)
+
+
+class TestMetrics:
+    """Test class for module metrics."""
+
+    def test_histogram(self):
+        histogram = vtmetrics.Histogram()
+        for seconds in (0.00005, 0.002, 0.002, 20):
+            histogram.add(seconds)
+        assert histogram.counts[0] == 1
+        assert histogram.counts[vtmetrics.BUCKETS.index(3)] == 2
+        assert histogram.counts[-1] == 1
+        assert histogram.max == 20000
+
+    def test_buffer_reads(self, datafile, tmp_path):
+        collector = vtmetrics.getMetrics()
+        collector.reset()
+        rbuffer = vtbuffer.Buffer(datafile.root.table, page_size=100)
+        rbuffer.readBuffer(0, 300)
+        rbuffer.readBuffer(100, 300)
+        collector.recordFault(0.01, 300)
+        snapshot = collector.toDict()
+        assert snapshot['reads']['count'] == 3
+        assert snapshot['read_bytes'] >= 300 * 12
+        assert snapshot['faults_per_minute'] == 1
+        assert snapshot['views']['bytes'] >= 200 * 12
+        # Chunks made of a single cached page hold no memory on their own
+        assert rbuffer.privateMemory() >= 200 * 12
+        before = collector.viewsMemory()
+        other = vtbuffer.Buffer(datafile.root.table, page_size=100)
+        other.readBuffer(100, 200)
+        assert other.privateMemory() < 100 * 12
+        # Pages shared with other views are not counted again
+        assert collector.viewsMemory() - before == other.privateMemory()
+        filepath = tmp_path / 'metrics.json'
+        collector.exportJSON(str(filepath))
+        assert json.loads(filepath.read_text())['reads']['count'] == 3
+
+
+class TestBuffer:
+    """Test class for module buffer."""
+
+    @pytest.mark.parametrize('name', ['array', 'vlarray'])
+    def test_readBuffer(self, datafile, name):
+        leaf = datafile.get_node('/', name)
+        rbuffer = vtbuffer.Buffer(leaf, page_size=100)
+        rbuffer.readBuffer(150, 450)
+        expected = leaf.read(150, 450)
+        assert len(rbuffer.chunk) == 300
+        for row in (0, 123, 299):
+            assert np.array_equal(rbuffer.chunk[row], expected[row])
+        assert sorted(rbuffer.cache.pages) == [(1, 0), (2, 0), (3, 0), (4, 0)]
+
+    def test_table(self, datafile):
+        rbuffer = vtbuffer.Buffer(datafile.root.table, page_size=100)
+        rbuffer.readBuffer(150, 450)
+        assert sorted(rbuffer.chunk) == ['x', 'y']
+        assert rbuffer.getCell(0, 0) == 150
+        assert rbuffer.getCell(299, 1) == 449 / 2.
+        assert list(rbuffer.getColumn(0, 10, 13)) == [160, 161, 162]
+        assert sorted(rbuffer.cache.pages) == [(1, 0), (2, 0), (3, 0), (4, 0)]
+
+    def test_projection(self, tmp_path):
+        with tables.open_file(str(tmp_path / 'wide.h5'), 'w') as h5file:
+            dtype = [(f'f{i}', 'i4') for i in range(100)]
+            records = np.zeros(500, dtype=dtype)
+            for i in range(100):
+                records[f'f{i}'] = np.arange(500) + i
+            leaf = h5file.create_table('/', 'wide', obj=records)
+            rbuffer = vtbuffer.Buffer(leaf, page_size=100)
+            rbuffer.readBuffer(0, 300)
+            assert list(rbuffer.chunk) == leaf.colnames[:vtbuffer.MAX_FIELDS]
+
+            # Only the fields around the visible columns are kept
+            rbuffer.setVisibleColumns(60, 64)
+            assert 'f60' in rbuffer.chunk
+            assert 'f0' not in rbuffer.chunk
+            assert rbuffer.getCell(10, 60) == 70
+            page = rbuffer.cache.pages[(0, 0)]
+            assert 'f0' in page and 'f60' in page and 'f99' not in page
+
+            # Fields not kept are read when needed
+            assert rbuffer.getCell(5, 99) == 104
+            rbuffer.readBuffer(200, 500)
+            assert rbuffer.getCell(0, 99) == 299
+
+    def test_column_window(self, datafile):
+        leaf = datafile.create_array('/', 'matrix',
+                                     obj=np.arange(50000).reshape(100, 500))
+        rbuffer = vtbuffer.Buffer(leaf, page_size=30)
+        rbuffer.col_page_size = 64
+        rbuffer.setColumnWindow(100, 200)
+        rbuffer.readBuffer(20, 70)
+        assert rbuffer.chunk.shape == (50, 100)
+        assert rbuffer.getCell(0, 0) == 20 * 500 + 100
+        assert rbuffer.getCell(49, 99) == 69 * 500 + 199
+        assert sorted(rbuffer.cache.pages) == \
+            [(0, 1), (0, 2), (0, 3), (1, 1), (1, 2), (1, 3), (2, 1), (2, 2),
+             (2, 3)]
+        rbuffer.setColumnWindow(450, 500)
+        assert rbuffer.chunk.shape == (50, 50)
+        assert list(rbuffer.getColumn(49, 0, 2)) == [10499, 10999]
+
+    def test_slice(self, datafile):
+        data = np.arange(4 * 50 * 60 * 3).reshape(4, 50, 60, 3)
+        leaf = datafile.create_array('/', 'cube', obj=data)
+        rbuffer = vtbuffer.Buffer(leaf, page_size=16)
+        assert rbuffer.canSlice()
+        rbuffer.col_page_size = 32
+        rbuffer.setSlice((2, 1), (3, 0, 0, 1))
+        assert rbuffer.total_nrows() == 60
+        rbuffer.setColumnWindow(10, 45)
+        rbuffer.readBuffer(5, 40)
+        assert rbuffer.chunk.shape == (35, 35)
+        assert np.array_equal(rbuffer.chunk, data[3, 10:45, 5:40, 1].T)
+        assert rbuffer.getCell(0, 0) == data[3, 10, 5, 1]
+        with pytest.raises(ValueError):
+            rbuffer.setSlice((1, 1), (0, 0, 0, 0))
+        with pytest.raises(ValueError):
+            rbuffer.setSlice((0, 1), (0, 0, 0, 3))
+        rbuffer.setSlice()
+        rbuffer.readBuffer(0, 4)
+        assert rbuffer.chunk.shape == (4, 50, 60, 3)
+
+    def test_page_size(self, datafile):
+        records = np.zeros(100000, dtype=[('x', 'f8'), ('y', 'i4')])
+        leaf = datafile.create_table('/', 'big', obj=records,
+                                     chunkshape=(3000,))
+        rbuffer = vtbuffer.Buffer(leaf)
+        assert rbuffer.page_size == 6000
+
+        # Pages with huge rows are smaller than pages with small rows
+        leaf = datafile.create_carray('/', 'matrix', atom=tables.Float64Atom(),
+                                      shape=(10000, 4000), chunkshape=(10, 50))
+        rbuffer = vtbuffer.Buffer(leaf)
+        assert rbuffer.col_page_size == 100
+        assert rbuffer.page_size == 2620
+        assert rbuffer.pageSelection((1, 2)) == \
+            (slice(2620, 5240), slice(200, 300))
+
+    def test_chunk_size(self, datafile):
+        # Rows of 12 bytes and rows of 24000 bytes
+        assert vtbuffer.Buffer(datafile.root.table).rowBytes() == 12
+        leaf = datafile.create_array('/', 'fat', obj=np.zeros((10, 3000)))
+        rbuffer = vtbuffer.Buffer(leaf)
+        assert rbuffer.rowBytes() == 24000
+        assert leaf_model.chunkSize(12, 2**20) == 10922
+        assert leaf_model.chunkSize(24000, 2**30) == 5592
+        # The minimum fills the view whatever the budget is
+        assert leaf_model.chunkSize(24000, 2**20) == leaf_model.MIN_CHUNK_SIZE
+        assert leaf_model.chunkSize(None) == leaf_model.CHUNK_SIZE
+
+    def test_shared_cache(self, datafile):
+        cache = pagecache.PageCache(max_pages=100)
+        leaf = datafile.root.table
+        first = vtbuffer.Buffer(leaf, page_size=100, cache=cache)
+        first.readBuffer(0, 300)
+        # Other views of the same dataset don't read it again
+        second = vtbuffer.Buffer(leaf, page_size=100, cache=cache)
+        second.readBuffer(100, 300)
+        assert (second.cache.hits, second.cache.misses) == (2, 0)
+        other = vtbuffer.Buffer(datafile.root.array, page_size=100,
+                                cache=cache)
+        other.readBuffer(0, 100)
+        assert len(cache) == 4
+        # Pages of modified nodes are forgotten
+        pagecache.invalidate(datafile.filename, '/table', cache)
+        assert len(first.cache) == 0
+        assert sorted(other.cache.pages) == [(0, 0)]
+        pagecache.invalidate(datafile.filename, cache=cache)
+        assert len(cache) == 0
+
+    def test_cached_pages(self, datafile):
+        leaf = datafile.root.table
+        rbuffer = vtbuffer.Buffer(leaf, page_size=100)
+        rbuffer.readBuffer(0, 300)
+        misses = rbuffer.cache.misses
+        rbuffer.readBuffer(50, 250)
+        assert rbuffer.cache.misses == misses
+        assert rbuffer.getCell(0, 0) == 50
+
+    def test_earray(self, datafile):
+        leaf = datafile.root.earray
+        rbuffer = vtbuffer.Buffer(leaf, page_size=64)
+        assert rbuffer.axes == (1, 0)
+        rbuffer.readBuffer(60, 200)
+        # The main dimension runs along rows
+        assert rbuffer.chunk.shape == (140, 2)
+        assert rbuffer.getCell(0, 0) == 60
+        assert rbuffer.getCell(0, 1) == 1060
+        assert list(rbuffer.getColumn(1, 10, 13)) == [1070, 1071, 1072]
+        # Chunks made of a single page are views of the cached page
+        rbuffer.readBuffer(70, 120)
+        assert np.shares_memory(rbuffer.chunk, rbuffer.cache.peek((1, 0)))
+
+    def test_scalar(self, datafile):
+        rbuffer = vtbuffer.Buffer(datafile.root.scalar)
+        rbuffer.readBuffer(0, 1)
+        assert rbuffer.getCell(0, 0) == 7
+
+    def test_end_of_dataset(self, datafile):
+        rbuffer = vtbuffer.Buffer(datafile.root.array, page_size=300)
+        rbuffer.readBuffer(950, 1100)
+        assert len(rbuffer.chunk) == 50
+        assert rbuffer.getCell(49, 2) == 2999
+
+    def test_sorted_table(self, datafile):
+        table = datafile.root.table
+        table.modify_column(column=np.arange(1000)[::-1] % 300, colname='x')
+        rbuffer = vtbuffer.Buffer(table, page_size=100)
+        with pytest.raises(ValueError):
+            rbuffer.setSortOrder('x')
+        table.cols.x.create_csindex()
+        rbuffer.setSortOrder('x')
+        rbuffer.readBuffer(0, 1000)
+        column = rbuffer.getColumn(0, 0, 1000)
+        assert np.array_equal(column, np.sort(table.col('x')))
+        rbuffer.setSortOrder('x', descending=True)
+        rbuffer.readBuffer(900, 1000)
+        assert np.array_equal(rbuffer.getColumn(0, 0, 100),
+                              np.sort(table.col('x'))[99::-1])
+        # Storage order is restored
+        rbuffer.setSortOrder()
+        rbuffer.readBuffer(0, 100)
+        assert rbuffer.getCell(0, 0) == table[0]['x']
+
+    def test_coordinates(self, datafile):
+        table = datafile.root.table
+        coordinates = datafile.create_earray('/', 'coordinates',
+                                             tables.Int64Atom(), (0,))
+        coordinates.append(np.arange(3, 1000, 7))
+        rbuffer = vtbuffer.Buffer(table, page_size=50, coordinates=coordinates)
+        assert rbuffer.total_nrows() == len(coordinates)
+        rbuffer.readBuffer(40, 120)
+        assert rbuffer.getCell(0, 0) == 3 + 40 * 7
+        assert list(rbuffer.getColumn(0, 0, 3)) == [283, 290, 297]
+        rbuffer.readBuffer(100, 200)
+        assert rbuffer.getCell(42, 1) == (3 + 142 * 7) / 2.
+        assert sorted(rbuffer.cache.pages) == [(0, 0), (1, 0), (2, 0)]
+        with pytest.raises(ValueError):
+            rbuffer.setSortOrder('x')
+        # Pages are forgotten when the coordinates are deleted
+        pagecache.invalidate(datafile.filename, '/coordinates')
+        assert not rbuffer.cache.pages
+
+    def test_vlarray_objects(self, datafile, monkeypatch):
+        monkeypatch.setattr(vtbuffer, 'MAX_DECODED_ROWS', 10)
+        leaf = datafile.create_vlarray('/', 'objects',
+                                       atom=tables.ObjectAtom())
+        for i in range(500):
+            leaf.append({'row': i, 'payload': 'x' * 1000})
+        rbuffer = vtbuffer.Buffer(leaf)
+        # Pages are sized from the rows size
+        assert 1000 < rbuffer.rowBytes() < 1200
+        assert rbuffer.page_size < vtbuffer.PAGE_SIZE
+        rbuffer.readBuffer(100, 300)
+        # Pages keep raw rows that are decoded on demand
+        assert rbuffer.chunk[0].dtype == np.uint8
+        assert rbuffer.rowSummary(0).endswith('bytes object>')
+        assert rbuffer.getCell(5, 0)['row'] == 105
+        assert [cell['row'] for cell in rbuffer.getColumn(0, 10, 30)] == \
+            list(range(110, 130))
+        assert sorted(rbuffer.decoded) == list(range(120, 130))
+        rbuffer = vtbuffer.Buffer(datafile.root.vlarray)
+        rbuffer.readBuffer(0, 10)
+        assert rbuffer.rowSummary(3) == '<3 int32>'
+
+    @pytest.mark.usefixtures('launcher')
+    def test_read_ahead(self, datafile):
+        filename = datafile.filename
+        datafile.close()
+        h5file = tables.open_file(filename, 'r')
+        rbuffer = vtbuffer.Buffer(h5file.root.table, page_size=100)
+        rbuffer.enableReadAhead()
+        assert rbuffer.read_ahead is not None
+        rbuffer.readBuffer(300, 500)
+        assert rbuffer.pending == {(1, 0), (2, 0), (5, 0), (6, 0)}
+        deadline = time.time() + 10
+        while rbuffer.pending and time.time() < deadline:
+            QtCore.QCoreApplication.processEvents()
+        assert [key[0] for key in sorted(rbuffer.cache.pages)] == \
+            [1, 2, 3, 4, 5, 6]
+        assert np.array_equal(rbuffer.cache.get((6, 0))['x'],
+                              np.arange(600, 700))
+        rbuffer.close()
+        readahead.closeFile(filename)
+        h5file.close()
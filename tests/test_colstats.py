@@ -0,0 +1,129 @@
+"""Test class for the statistics of datasets."""
+
+import time
+
+import numpy as np
+import pytest
+import tables
+from qtpy import QtCore
+
+import vitables.nodeprops.colstats as colstats
+import vitables.nodeprops.statsdlg as statsdlg
+import vitables.vttables.pagecache as pagecache
+
+
+@pytest.fixture()
+def datafile(tmp_path):
+    """A file with a table and an array."""
+
+    h5file = tables.open_file(str(tmp_path / 'stats.h5'), 'w')
+    records = np.zeros(10000, dtype=[('x', 'i4'), ('y', 'f8'), ('s', 'S4')])
+    records['x'] = np.arange(10000) % 300
+    records['y'] = np.linspace(-5, 5, 10000)
+    records['y'][:5] = np.nan
+    records['y'][5] = -np.inf
+    records['s'] = [b'a', b'b', b'c', b'd'] * 2500
+    h5file.create_table('/', 'table', obj=records)
+    h5file.create_array('/', 'array', obj=np.arange(6000.).reshape(2000, 3))
+    yield h5file
+    h5file.close()
+
+
+class TestColStats:
+    """Test class for module colstats."""
+
+    def test_streaming(self, datafile, monkeypatch):
+        monkeypatch.setattr(pagecache, 'BLOCK_BYTES', 4096)
+        table = datafile.root.table
+        ranges = colstats.scanRanges(table, 'y')
+        assert len(list(colstats.scanBlocks(table, ranges))) > 1
+        stats = colstats.computeStatistics(table, 'y')
+        y = table.col('y')
+        finite = y[np.isfinite(y)]
+        assert (stats['count'], stats['nan'], stats['neginf']) == \
+            (10000, 5, 1)
+        assert (stats['min'], stats['max']) == (finite.min(), finite.max())
+        assert stats['mean'] == pytest.approx(finite.mean())
+        assert stats['std'] == pytest.approx(finite.std())
+        assert sum(stats['histogram']['counts']) == finite.size
+
+        stats = colstats.computeStatistics(table, 'x')
+        assert (stats['distinct'], stats['distinct_exact']) == (300, True)
+        stats = colstats.computeStatistics(table, 's')
+        assert not stats['numeric'] and stats['distinct'] == 4
+
+        progress = []
+        stats = colstats.computeStatistics(datafile.root.array,
+                                           progress=progress.append)
+        assert (stats['min'], stats['max'], stats['count']) == (0, 5999, 6000)
+        assert progress[-1] == 100
+        assert colstats.computeStatistics(
+            datafile.root.array, cancelled=lambda: True) is None
+
+    def test_wide_array(self, datafile, monkeypatch):
+        monkeypatch.setattr(pagecache, 'BLOCK_BYTES', 4096)
+        wide = datafile.create_array('/', 'wide',
+                                     obj=np.arange(20000.).reshape(10, 2000))
+        # Rows bigger than a block are split along columns
+        ranges = colstats.scanRanges(wide)
+        assert [axis for (axis, _) in ranges] == [0, 1]
+        blocks = list(colstats.scanBlocks(wide, ranges))
+        assert len(blocks) == 40
+        assert max(wide[block].nbytes for block in blocks) <= 4096
+        stats = colstats.computeStatistics(wide)
+        assert (stats['min'], stats['max'], stats['count']) == \
+            (0, 19999, 20000)
+
+        # Scanners read through their own file handle
+        filename = datafile.filename
+        datafile.close()
+        with tables.open_file(filename, 'r') as h5file:
+            scanner = colstats.StatsScanner(h5file.root.wide)
+            results = []
+            scanner.stats_computed.connect(
+                lambda stats, error: results.append((stats, error)))
+            scanner.run()
+            assert results[0][0]['count'] == 20000 and not results[0][1]
+            assert h5file.isopen
+
+    def test_histogram(self):
+        histogram = colstats.Histogram(bins=10)
+        values = np.random.default_rng(0).uniform(-100, 100, 5000)
+        values[:10] /= 100
+        for block in (values[:10], values[10:]):
+            histogram.add(block)
+        result = histogram.toDict()
+        counts, _ = np.histogram(values, bins=result['edges'])
+        assert result['counts'] == counts.tolist()
+
+    def test_store(self, datafile, tmp_path):
+        store = colstats.StatsStore(str(tmp_path / 'statistics'))
+        table = datafile.root.table
+        assert store.load(table, 'x') is None
+        stats = colstats.computeStatistics(table, 'x')
+        store.save(table, 'x', stats)
+        assert store.load(table, 'x') == stats
+        assert store.load(table, 'y') is None
+        # Stale statistics are never returned
+        table.append(table[:10])
+        table.flush()
+        assert store.load(table, 'x') is None
+
+    @pytest.mark.usefixtures('launcher')
+    def test_dialog(self, datafile, tmp_path, monkeypatch):
+        monkeypatch.setattr(colstats, '_store',
+                            colstats.StatsStore(str(tmp_path / 'statistics')))
+        dialog = statsdlg.StatsDlg(datafile.root.table)
+        deadline = time.time() + 10
+        while dialog.scanner is not None and time.time() < deadline:
+            QtCore.QCoreApplication.processEvents()
+        assert dialog.table.item(0, 1).text() == '10000'
+        assert dialog.histogram.counts
+        # Saved statistics are displayed instantly
+        dialog.columns_combo.setCurrentIndex(1)
+        dialog.scanner.wait()
+        QtCore.QCoreApplication.processEvents()
+        dialog.columns_combo.setCurrentIndex(0)
+        assert dialog.scanner is None
+        assert dialog.status_label.text() == 'Saved statistics'
+        dialog.close()
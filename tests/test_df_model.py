@@ -0,0 +1,72 @@
+"""Test class for the model of pandas dataframes."""
+
+import numpy as np
+import pytest
+import tables
+
+import vitables.vttables.buffer as vtbuffer
+import vitables.vttables.df_model as df_model
+
+pd = pytest.importorskip('pandas')
+
+
+@pytest.fixture()
+def datafile(tmp_path):
+    """A file with a wide frame table and a fixed format frame."""
+
+    filepath = str(tmp_path / 'frames.h5')
+    frame = pd.DataFrame(np.random.default_rng(0).random((500, 100)),
+                         columns=[f'c{i}' for i in range(100)])
+    frame['when'] = pd.date_range('2020', periods=500, freq='h')
+    frame['f32'] = np.float32(0.1)
+    frame['s'] = 'abc'
+    frame.to_hdf(filepath, key='wide', format='table', mode='w')
+    fixed = frame.iloc[:, :3].copy()
+    fixed.columns = pd.MultiIndex.from_tuples([('a', 1), ('a', 2), ('b', 1)])
+    fixed.index = pd.MultiIndex.from_arrays(
+        [np.arange(500) // 10, np.arange(500) % 10], names=['x', None])
+    fixed.to_hdf(filepath, key='fixed', format='fixed')
+    h5file = tables.open_file(filepath)
+    yield h5file, frame, fixed
+    h5file.close()
+
+
+@pytest.mark.usefixtures('launcher')
+class TestDataFrameModel:
+    """Test class for module df_model."""
+
+    def test_projection(self, datafile):
+        h5file, frame, _ = datafile
+        model = df_model.try_opening_as_dataframe(h5file.root.wide.table)
+        assert model.numcols == 103
+        assert sorted(model._values) == list(range(vtbuffer.MAX_FIELDS))
+        # Views of the same file share the store
+        assert df_model.try_opening_as_dataframe(
+            h5file.root.wide.table)._hstore is model._hstore
+
+        # Columns out of the window are read when they become visible
+        model.setVisibleColumns(95, 103)
+        assert 101 in model._values and 0 not in model._values
+        for col in (0, 50, 100, 101, 102):
+            expected = [str(frame.iat[row, col]) for row in range(10)]
+            strings = [model.data(model.index(row + 1, col + 1))
+                       for row in range(10)]
+            assert strings == expected
+        assert model.cellValue(0, 100) == frame.iat[0, 100]
+        assert model.data(model.index(0, 1)) == 'c0'
+        assert model.data(model.index(1, 0)) == str(frame.index[0])
+
+    def test_fixed_multiindex(self, datafile):
+        h5file, _, fixed = datafile
+        model = df_model.try_opening_as_dataframe(
+            h5file.root.fixed.block0_values)
+        assert model._nheaders == (2, 2)
+        assert sorted(model._values) == [0, 1, 2]
+        assert model.headerData(0, df_model.Qt.Horizontal,
+                                df_model.Qt.DisplayRole) == 'x'
+        assert model.headerData(1, df_model.Qt.Horizontal,
+                                df_model.Qt.DisplayRole) == 'I1'
+        assert [model.data(model.index(row, 3)) for row in range(2)] == \
+            ['a', '2'] == model.columnLabels(1)
+        assert model.data(model.index(2, 1)) == '0'
+        assert model.data(model.index(3, 2)) == str(fixed.iat[1, 0])
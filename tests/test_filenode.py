@@ -22,6 +22,7 @@
 
 import os.path
 
+import numpy as np
 import pytest
 
 import vitables.filenodeutils as fnutils
@@ -52,9 +53,23 @@ class TestFilenode:
             lines = f.readlines()
         assert lines[-1] == 'This is the last line.\n'
 
+    def test_lineOffsets(self, launcher, fnode, tmp_path, monkeypatch):
+        monkeypatch.setattr(fnutils, 'INDEX_BLOCK_BYTES', 100)
+        offsets = fnutils.lineOffsets(fnode)
+        with fnutils.filenode.open_node(fnode) as f:
+            lines = f.read().splitlines(keepends=True)
+        assert offsets.dtype == 'int64'
+        assert offsets.tolist() == [0] + list(
+            np.cumsum([len(line) for line in lines]))
+
+        store = fnutils.LineIndexStore(str(tmp_path / 'filenodes'))
+        assert store.load(fnode) is None
+        store.save(fnode, offsets)
+        assert store.load(fnode).tolist() == offsets.tolist()
+
         # We have to do this by hand because the VTApp.nodeOpen method is
         # not being called
-        launcher.vtapp_object.filenodes_map[fnode] = file, len(lines)
+        launcher.vtapp_object.filenodes_map[fnode] = offsets
 
     def test_filenodeTotalRows(self, fnode):
         assert fnutils.filenodeTotalRows(fnode) == 11
@@ -78,3 +93,10 @@ class TestFilenode:
         fnb.readBuffer(0, 100)
         assert fnb.getCell(2, 5) == ('This is a line inserted '
                                      'programmatically at position 2\n')
+
+    def test_fnbReadRange(self, fnode):
+        fnb = fnbuffer.FilenodeBuffer(fnode)
+        fnb.readBuffer(3, 5)
+        assert fnb.chunk == [
+            'This is a line inserted programmatically at position 3\n',
+            'This is a line inserted programmatically at position 4\n']
@@ -0,0 +1,129 @@
+"""Test class for finding cells of datasets."""
+
+import time
+
+import numpy as np
+import pytest
+import tables
+from qtpy import QtCore
+
+import vitables.vttables.buffer as vtbuffer
+import vitables.vttables.finder as finder
+import vitables.vttables.pagecache as pagecache
+
+
+@pytest.fixture()
+def datafile(tmp_path, monkeypatch):
+    """A file with a table and arrays scanned in several blocks."""
+
+    monkeypatch.setattr(pagecache, 'BLOCK_BYTES', 4096)
+    h5file = tables.open_file(str(tmp_path / 'find.h5'), 'w')
+    records = np.zeros(20000, dtype=[('x', 'i4'), ('y', 'f8'), ('s', 'S8')])
+    records['x'] = np.arange(20000)
+    records['y'] = np.arange(20000) / 2.
+    records['s'] = b'abc'
+    records['s'][[3000, 15000]] = b'xxfoo'
+    h5file.create_table('/', 'table', obj=records)
+    earray = h5file.create_earray('/', 'earray', atom=tables.Int32Atom(),
+                                  shape=(3, 0))
+    earray.append(np.arange(30000).reshape(3, 10000))
+    vlarray = h5file.create_vlarray('/', 'vlarray', atom=tables.Int32Atom())
+    for i in range(1000):
+        vlarray.append(np.arange(i % 7))
+    yield h5file
+    h5file.close()
+
+
+def cellFinder(leaf, text, mode='value', column=None):
+    return finder.Finder(vtbuffer.Buffer(leaf, page_size=100),
+                         finder.FindQuery(text, mode, column))
+
+
+class TestFinder:
+    """Test class for module finder."""
+
+    def test_table(self, datafile):
+        table = datafile.root.table
+        cells = cellFinder(table, 'foo', 'substring')
+        assert len(list(cells.blocks(0))) > 1
+        assert cells.find(0, 0) == (3000, 2)
+        assert cells.find(3000, 2) == (15000, 2)
+        assert cells.find(3000, 2, inclusive=True) == (3000, 2)
+        assert cells.find(15000, 2) is None
+        assert cells.find(19999, 0, backward=True) == (15000, 2)
+        assert cells.find(15000, 2, backward=True) == (3000, 2)
+        # Values are matched in every column unless a column is given
+        assert cellFinder(table, '700').find(0, 0) == (700, 0)
+        assert cellFinder(table, '700').find(700, 0) == (1400, 1)
+        assert cellFinder(table, '700', column=1).find(0, 0) == (1400, 1)
+        cells = cellFinder(table, '(x > 12345) & (y < 7000)', 'condition')
+        assert cells.find(0, 1) == (12346, 1)
+        assert cells.find(14000, 1, backward=True) == (13999, 1)
+
+    def test_sorted_table(self, datafile):
+        table = datafile.root.table
+        table.cols.y.create_csindex()
+        rbuffer = vtbuffer.Buffer(table, page_size=100)
+        rbuffer.setSortOrder('y', descending=True)
+        query = finder.FindQuery('x == 0', 'condition', None)
+        assert finder.Finder(rbuffer, query).find(0, 0) == (19999, 0)
+        # Conditions see the same variables whatever the scan path
+        query = finder.FindQuery('x < nrows', 'condition', None)
+        for cells in (finder.Finder(rbuffer, query),
+                      cellFinder(table, query.text, 'condition')):
+            with pytest.raises((NameError, KeyError)):
+                cells.find(0, 0)
+
+    def test_arrays(self, datafile):
+        # Rows of the EArray run along its main dimension
+        assert cellFinder(datafile.root.earray, '20005').find(0, 0) == (5, 2)
+        cells = cellFinder(datafile.root.earray, 'x % 1000 == 999',
+                           'condition')
+        assert cells.find(0, 0) == (999, 0)
+        assert cells.find(999, 0) == (999, 1)
+        assert cellFinder(datafile.root.vlarray, '5').find(0, 0) == (6, 0)
+        with pytest.raises(ValueError):
+            cellFinder(datafile.root.vlarray, 'x > 1', 'condition')
+
+    def test_wide_array(self, datafile):
+        wide = datafile.create_array(
+            '/', 'wide', obj=np.arange(12000, dtype='i4').reshape(4, 3000))
+        cells = cellFinder(wide, '8500')
+        # Blocks don't exceed BLOCK_BYTES even if a row does
+        assert cells.block_rows == 1 and cells.block_cols < 3000
+        assert cells.readBlock(0, 1, 0, cells.block_cols).nbytes <= 4096
+        assert cells.find(0, 0) == (2, 2500)
+        cells = cellFinder(wide, 'x % 3000 == 10', 'condition')
+        assert cells.find(3, 2999, backward=True) == (3, 10)
+
+    @pytest.mark.usefixtures('launcher')
+    def test_worker(self, datafile):
+        cells = cellFinder(datafile.root.table, 'foo', 'substring')
+        results = []
+        worker = finder.FindWorker(cells, 5000, 0)
+        worker.find_finished.connect(
+            lambda match, error: results.append((match, error)))
+        worker.start()
+        deadline = time.time() + 10
+        while not results and time.time() < deadline:
+            QtCore.QCoreApplication.processEvents()
+        worker.wait()
+        assert results == [((15000, 2), '')]
+        worker = finder.FindWorker(cellFinder(datafile.root.table, 'x >',
+                                              'condition'), 0, 0)
+        worker.find_finished.connect(
+            lambda match, error: results.append((match, error)))
+        worker.run()
+        assert results[-1][0] is None and results[-1][1]
+
+        # Workers read through their own file handle
+        filename = datafile.filename
+        datafile.close()
+        with tables.open_file(filename, 'r') as h5file:
+            worker = finder.FindWorker(cellFinder(h5file.root.table, '700'),
+                                       0, 0)
+            worker.find_finished.connect(
+                lambda match, error: results.append((match, error)))
+            worker.run()
+            assert results[-1] == ((700, 0), '')
+            assert worker.finder.leaf is h5file.root.table and h5file.isopen
@@ -0,0 +1,105 @@
+"""Test class for the navigation of leaf views."""
+
+import time
+
+import numpy as np
+import pytest
+import tables
+from qtpy import QtCore
+
+import vitables.vttables.leaf_model as leaf_model
+import vitables.vttables.leaf_view as leaf_view
+
+
+@pytest.fixture()
+def table(tmp_path):
+    """A table with more rows than a model chunk."""
+
+    h5file = tables.open_file(str(tmp_path / 'rows.h5'), 'w')
+    records = np.zeros(300000, dtype=[('x', 'i8'), ('y', 'f8')])
+    records['x'] = np.arange(300000)
+    yield h5file.create_table('/', 'table', obj=records)
+    h5file.close()
+
+
+@pytest.mark.usefixtures('launcher')
+class TestLeafView:
+    """Test class for module leaf_view."""
+
+    def test_locateRow(self, table):
+        model = leaf_model.LeafModel(table)
+        assert model.numrows < model.leaf_numrows
+        row = model.locateRow(234567)
+        assert model.start <= 234567 < model.start + model.numrows
+        assert model.start % model.rbuffer.page_size == 0
+        assert model.cell(row, 0) == 234567
+        # The last rows are reachable too
+        row = model.locateRow(299999)
+        assert model.start + model.numrows == 300000
+        assert model.cell(row, 0) == 299999
+        with pytest.raises(ValueError):
+            model.locateRow(300000)
+        model.close()
+
+    def test_goToRow(self, table):
+        model = leaf_model.LeafModel(table)
+        view = leaf_view.LeafView(model)
+        index = view.goToRow(250000, 1)
+        assert view.currentIndex() == index
+        assert (model.start + index.row(), index.column()) == (250000, 1)
+        assert view.valid_current_buffer == model.start
+        view.goToRow(10)
+        assert model.start + view.currentIndex().row() == 10
+        assert view.currentIndex().column() == 1
+        model.close()
+
+    def test_sortRows(self, table):
+        table.modify_column(column=np.arange(300000)[::-1], colname='y')
+        model = leaf_model.LeafModel(table)
+        view = leaf_view.LeafView(model)
+        assert model.canSort(1) and not model.hasSortedIndex(1)
+        # The index is built in background and then rows are sorted
+        job = view.buildSortedIndex(1, False)
+        assert job is not None and view.buildSortedIndex(0, False) is None
+        deadline = time.time() + 30
+        while model.sortOrder() is None and time.time() < deadline:
+            QtCore.QCoreApplication.processEvents()
+        assert model.sortOrder() == (1, False)
+        assert (model.cell(0, 0), model.cell(0, 1)) == (299999, 0.)
+        view.sortRows(1, descending=True)
+        assert model.cell(0, 0) == 0
+        assert view.horizontalHeader().sortIndicatorOrder() == \
+            QtCore.Qt.DescendingOrder
+        view.sortRows(None)
+        assert model.sortOrder() is None and model.cell(0, 0) == 0
+        job.wait(30000)
+        model.close()
+
+    def test_close_while_sorting(self, table):
+        table.modify_column(column=np.arange(300000)[::-1], colname='y')
+        model = leaf_model.LeafModel(table)
+        view = leaf_view.LeafView(model)
+        # Closed views forget the sort but the index is still built
+        job = view.buildSortedIndex(1, False)
+        view.close()
+        assert job.wait(30000)
+        QtCore.QCoreApplication.processEvents()
+        assert model.sortOrder() is None and model.hasSortedIndex(1)
+        model.close()
+
+    def test_lazy_vlarray_rows(self, table):
+        leaf = table._v_file.create_vlarray('/', 'waves',
+                                            atom=tables.Float64Atom())
+        for i in range(1000):
+            leaf.append(np.arange(i % 50, dtype='f8'))
+        model = leaf_model.LeafModel(leaf)
+        changed = []
+        model.dataChanged.connect(lambda first, last: changed.append(
+            (first.row(), last.row())))
+        # Rows are displayed as a summary until they are formatted
+        assert model.data(model.index(7, 0)) == '<7 float64>'
+        assert model.data(model.index(3, 0)) == '<3 float64>'
+        QtCore.QCoreApplication.processEvents()
+        assert changed == [(3, 7)]
+        assert model.data(model.index(3, 0)) == '[0.,1.,2.]'
+        model.close()
@@ -0,0 +1,369 @@
+"""Test class for the execution of queries."""
+
+import os
+
+import numpy as np
+import pytest
+import tables
+from qtpy import QtCore, QtTest
+
+import vitables.queries.indexdlg as indexdlg
+import vitables.queries.indexing as indexing
+import vitables.queries.query as query
+import vitables.queries.querycache as querycache
+import vitables.queries.queryworker as queryworker
+
+
+@pytest.fixture()
+def datafile(tmp_path):
+    """A file with a table being queried and a temporary database."""
+
+    h5file = tables.open_file(str(tmp_path / 'source.h5'), 'a')
+    records = np.zeros(1000, dtype=[('x', 'i8'), ('y y', 'f8')])
+    records['x'] = np.arange(1000)
+    records['y y'] = np.arange(1000) % 7
+    h5file.create_table('/', 'table', obj=records, chunkshape=64)
+    tmp_h5file = tables.open_file(str(tmp_path / 'tmp.h5'), 'w')
+    tmp_h5file.create_group('/', '_p_query_results')
+    yield h5file, tmp_h5file
+    tmp_h5file.close()
+    h5file.close()
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    """A query cache in a temporary directory."""
+
+    query_cache = querycache.QueryCache(str(tmp_path / 'cache'))
+    monkeypatch.setattr(querycache, '_cache', query_cache)
+    return query_cache
+
+
+def runQuery(new_query):
+    """Run a query and wait for it.
+
+    :Returns: the arguments of the completion signal
+    """
+
+    loop = QtCore.QEventLoop()
+    completed = []
+    new_query.query_completed.connect(
+        lambda *args: (completed.append(args), loop.quit()))
+    new_query.run()
+    QtCore.QTimer.singleShot(60000, loop.quit)
+    loop.exec_()
+    return completed
+
+
+def waitSignal(spy, timeout=60000):
+    """Wait until a spied signal is emitted and the slots it queued are run.
+
+    Signals emitted by worker threads are recorded as soon as they are
+    emitted, so they can be emitted before waiting for them.
+    """
+
+    if not len(spy):
+        spy.wait(timeout)
+    QtCore.QCoreApplication.processEvents()
+    assert len(spy)
+
+
+def queryDescription(table, **kwargs):
+    """The description of a query made by the New Query dialog."""
+
+    qdescr = {'condition': '(x % 2 == 0) & (col0 < 3)',
+              'rows_range': (np.int64(10), np.int64(1000), np.int64(3)),
+              'ft_name': 'result', 'indices_field_name': 'coords',
+              'condvars': {'col0': table.cols._f_col('y y')},
+              'src_filepath': table._v_file.filename,
+              'src_path': table._v_pathname, 'title': 'a title'}
+    qdescr.update(kwargs)
+    return qdescr
+
+
+def expectedCoordinates():
+    """The rows selected by the default query."""
+
+    rows = np.arange(10, 1000, 3)
+    return rows[(rows % 2 == 0) & (rows % 7 < 3)]
+
+
+class TestQuery:
+    """Test class for modules query and queryworker."""
+
+    def test_scanTable(self, datafile, monkeypatch, tmp_path):
+        monkeypatch.setattr(queryworker, 'CHUNK_ROWS', 100)
+        h5file, tmp_h5file = datafile
+        table = h5file.root.table
+        qdescr = queryDescription(table, keep_coordinates=True)
+        qdescr['condvars'] = {'col0': 'y y'}
+        messages = []
+
+        def report(*args):
+            messages.append(args)
+
+        assert queryworker.scanTable(table, tmp_h5file, qdescr, report,
+                                     lambda: False)
+        result = tmp_h5file.root.result
+        assert result.colnames[0] == 'coords'
+        np.testing.assert_array_equal(result.col('coords'),
+                                      expectedCoordinates())
+        np.testing.assert_array_equal(result.col('x'), expectedCoordinates())
+        assert result.attrs.query_condition == 'a title'
+        # Chunks keep the step of the range
+        assert len(messages) == 4
+        assert messages[-1] == (330, len(expectedCoordinates()))
+
+        np.testing.assert_array_equal(tmp_h5file.root._p_coordinates,
+                                      expectedCoordinates())
+
+        tmp_h5file.remove_node('/_p_coordinates')
+        # Rows are appended as they are found if coordinates are not needed
+        qdescr.update(ft_name='streamed', indices_field_name='',
+                      keep_coordinates=False)
+        assert queryworker.scanTable(table, tmp_h5file, qdescr, report,
+                                     lambda: False)
+        np.testing.assert_array_equal(tmp_h5file.root.streamed.col('x'),
+                                      expectedCoordinates())
+        assert '/_p_coordinates' not in tmp_h5file
+        assert messages[-1] == (330, len(expectedCoordinates()))
+
+        qdescr.update(ft_name='cancelled')
+        assert not queryworker.scanTable(table, tmp_h5file, qdescr,
+                                         report, lambda: True)
+
+        # Cached coordinates are read without evaluating the condition
+        path = str(tmp_path / 'coordinates.npy')
+        np.save(path, expectedCoordinates()[::2])
+        qdescr.update(ft_name='cached', coordinates_path=path,
+                      condition='nonsense')
+        assert queryworker.scanTable(table, tmp_h5file, qdescr, report,
+                                     lambda: False)
+        np.testing.assert_array_equal(tmp_h5file.root.cached.col('x'),
+                                      expectedCoordinates()[::2])
+
+    def test_partitionRange(self):
+        parts = queryworker.partitionRange(10, 1000, 3, 4, align=16)
+        assert parts == [(10, 298), (298, 586), (586, 874), (874, 1000)]
+        rows = [row for (start, stop) in parts
+                for row in range(start, stop, 3)]
+        assert rows == list(range(10, 1000, 3))
+        assert queryworker.partitionRange(0, 10, 1, 4, align=8) == \
+            [(0, 8), (8, 10)]
+        assert queryworker.partitionRange(5, 5, 1, 4) == []
+
+    def test_query_process(self, launcher, datafile):
+        h5file, tmp_h5file = datafile
+        table = h5file.root.table
+        new_query = query.Query(tmp_h5file, 'uid', table,
+                                queryDescription(table), workers=1)
+        loop = QtCore.QEventLoop()
+        completed = []
+        new_query.query_completed.connect(
+            lambda *args: (completed.append(args), loop.quit()))
+        new_query.run()
+        result_path = new_query.result_paths[0]
+        QtCore.QTimer.singleShot(60000, loop.quit)
+        loop.exec_()
+        assert completed == [(True, 'uid')]
+        np.testing.assert_array_equal(tmp_h5file.root.result.col('coords'),
+                                      expectedCoordinates())
+        assert not os.path.exists(result_path)
+
+    def test_parallel_query(self, launcher, datafile, monkeypatch):
+        monkeypatch.setattr(queryworker, 'MIN_PARTITION_ROWS', 64)
+        h5file, tmp_h5file = datafile
+        table = h5file.root.table
+        new_query = query.Query(tmp_h5file, 'uid', table,
+                                queryDescription(table), workers=3)
+        assert len(new_query.partitions()) == 3
+        loop = QtCore.QEventLoop()
+        completed = []
+        new_query.query_completed.connect(
+            lambda *args: (completed.append(args), loop.quit()))
+        new_query.run()
+        QtCore.QTimer.singleShot(60000, loop.quit)
+        loop.exec_()
+        assert completed == [(True, 'uid')]
+        result = tmp_h5file.root.result
+        # Results are merged in row order
+        np.testing.assert_array_equal(result.col('coords'),
+                                      expectedCoordinates())
+        assert result.attrs.query_condition == 'a title'
+
+    def test_cached_query(self, launcher, datafile, cache):
+        h5file, tmp_h5file = datafile
+        filename = h5file.filename
+        qdescr = queryDescription(h5file.root.table)
+        # Results of queries on writable files are not cached
+        writable = query.Query(tmp_h5file, 'uid', h5file.root.table, qdescr,
+                               workers=1)
+        assert runQuery(writable) == [(True, 'uid')]
+        assert writable.cache_key is None and not os.path.isdir(cache.directory)
+
+        h5file.close()
+        h5file = tables.open_file(filename, 'r')
+        table = h5file.root.table
+        qdescr = queryDescription(table, ft_name='first')
+        first = query.Query(tmp_h5file, 'uid', table, qdescr, workers=1)
+        assert runQuery(first) == [(True, 'uid')]
+        assert first.cached_path is None
+        path = cache.lookup(first.cache_key)
+        np.testing.assert_array_equal(np.load(path), expectedCoordinates())
+
+        qdescr.update(ft_name='again', indices_field_name='')
+        again = query.Query(tmp_h5file, 'uid', table, qdescr, workers=1)
+        assert runQuery(again) == [(True, 'uid')]
+        assert again.cached_path == path
+        np.testing.assert_array_equal(tmp_h5file.root.again.col('x'),
+                                      expectedCoordinates())
+        h5file.close()
+
+        # Modified files are queried again
+        with tables.open_file(filename, 'a') as h5file:
+            h5file.root.table.modify_column(0, column=np.array([-1]),
+                                            colname='x')
+        with tables.open_file(filename, 'r') as h5file:
+            table = h5file.root.table
+            qdescr = queryDescription(table, ft_name='modified')
+            modified = query.Query(tmp_h5file, 'uid', table, qdescr,
+                                   workers=1)
+            assert runQuery(modified) == [(True, 'uid')]
+            assert modified.cached_path is None
+
+    def test_eviction(self, cache):
+        for (second, key) in enumerate(('a', 'b', 'c')):
+            cache.save(key, 100, [np.arange(50), np.arange(50, 100)])
+            os.utime(cache.entryPath(key), ns=(0, second * 10**9))
+        cache.max_bytes = 3 * os.path.getsize(cache.entryPath('a'))
+        cache.save('d', 1000, [np.arange(1000)])
+        assert cache.lookup('d') is None
+        cache.lookup('a')
+        cache.save('e', 100, [np.arange(100)])
+        # The least recently used result is evicted
+        assert cache.lookup('b') is None
+        assert cache.lookup('a') and cache.lookup('c') and cache.lookup('e')
+        np.testing.assert_array_equal(np.load(cache.lookup('e')),
+                                      np.arange(100))
+
+    def test_coordinates_only(self, launcher, datafile, cache, tmp_path):
+        h5file, tmp_h5file = datafile
+        # Results are cached for read-only files
+        h5file.close()
+        h5file = tables.open_file(h5file.filename, 'r')
+        table = h5file.root.table
+        qdescr = queryDescription(table, coordinates_only=True)
+        new_query = query.Query(tmp_h5file, 'uid', table, qdescr, workers=1)
+        assert runQuery(new_query) == [(True, 'uid')]
+        result = tmp_h5file.root.result
+        assert isinstance(result, tables.EArray)
+        np.testing.assert_array_equal(result.read(), expectedCoordinates())
+        assert result.attrs.query_coordinates
+        assert result.attrs.query_indices_field == 'coords'
+        assert result.attrs.query_table == '/table'
+
+        # Cached results are added without starting workers
+        qdescr.update(ft_name='again')
+        again = query.Query(tmp_h5file, 'uid', table, qdescr, workers=1)
+        assert runQuery(again) == [(True, 'uid')]
+        assert not again.processes
+        np.testing.assert_array_equal(tmp_h5file.root.again.read(),
+                                      expectedCoordinates())
+
+        # Materialized rows are read from the given coordinates
+        path = str(tmp_path / 'materialize.npy')
+        np.save(path, result.read())
+        qdescr = queryDescription(
+            table, ft_name='rows', condition='nonsense',
+            rows_range=(int(result[0]), int(result[-1]) + 1, 1),
+            coordinates_path=path)
+        rows = query.Query(tmp_h5file, 'uid', table, qdescr, workers=1)
+        assert runQuery(rows) == [(True, 'uid')]
+        np.testing.assert_array_equal(tmp_h5file.root.rows.col('coords'),
+                                      expectedCoordinates())
+        assert not os.path.exists(path)
+        h5file.close()
+
+    def test_queryPlan(self, datafile):
+        h5file, _ = datafile
+        table = h5file.root.table
+        condvars = {'col0': table.cols._f_col('y y')}
+        condition = '(x % 2 == 0) & (col0 < sin(3))'
+        assert indexing.conditionColumns(table, condition, condvars) == \
+            ['x', 'y y']
+        plan = indexing.queryPlan(table, condition, condvars, (10, 1000, 3))
+        assert plan.indexed == [] and plan.unindexed == ['x', 'y y']
+        assert plan.nrows == 330 and plan.nbytes == 330 * 16
+        table.cols.x.create_index()
+        plan = indexing.queryPlan(table, '(x < 5) & (col0 < 3)', condvars)
+        assert plan.indexed == ['x'] and plan.unindexed == ['y y']
+        # Unindexed alternatives need a full scan
+        plan = indexing.queryPlan(table, '(x < 5) | (col0 < 3)', condvars)
+        assert plan.indexed == []
+
+    def test_index_job(self, launcher, datafile):
+        h5file, _ = datafile
+        table = h5file.root.table
+
+        def runJob(*args, **kwargs):
+            job = indexing.createIndexJob(table, *args, **kwargs)
+            progress, errors = [], []
+            job.progress.connect(lambda *args: progress.append(args))
+            job.job_finished.connect(errors.append)
+            # Slots are connected before the job starts, so the thread end
+            # is notified after every job signal
+            spy = QtTest.QSignalSpy(job.finished)
+            assert indexing.runningJob(table) is job
+            assert indexing.createIndexJob(table, ['x'], 'remove') is None
+            job.start()
+            waitSignal(spy)
+            assert errors == ['']
+            assert indexing.runningJob(table) is None
+            return progress
+
+        progress = runJob(['x', 'y y'], 'create', kind='light', optlevel=3)
+        assert progress == [(0, 'x'), (1, 'y y'), (2, '')]
+        assert indexing.indexInfo(table.cols.x) == \
+            {'kind': 'light', 'optlevel': 3, 'csi': False, 'dirty': False}
+        runJob(['x'], 'csi')
+        assert indexing.indexInfo(table.cols.x)['csi']
+        runJob(['x'], 'reindex')
+        assert table.cols.x.index.is_csi
+        runJob(['x', 'y y'], 'remove')
+        assert not table.cols.x.is_indexed
+        assert indexing.indexInfo(table.cols._f_col('y y')) is None
+        with pytest.raises(ValueError):
+            indexing.IndexJob(table, ['x'], 'drop')
+
+        # Any error is reported and closing a file stops its jobs
+        def fail(column):
+            raise RuntimeError('failed')
+
+        job = indexing.createIndexJob(table, ['x'], 'create')
+        job.processColumn = fail
+        errors = []
+        job.job_finished.connect(errors.append)
+        job.run()
+        assert errors == ['x: failed']
+        job.start()
+        indexing.cancelJobs(h5file.filename)
+        assert job.isFinished() and indexing.runningJob(table) is None
+
+    def test_index_dialog(self, launcher, datafile):
+        h5file, _ = datafile
+        table = h5file.root.table
+        table.cols.x.create_csindex()
+        dlg = indexdlg.IndexDlg(table)
+        assert dlg.columns_table.rowCount() == 2
+        assert dlg.columns_table.item(0, 1).text() == 'full'
+        assert not dlg.operation_buttons['remove'].isEnabled()
+        dlg.columns_table.selectRow(0)
+        # The dialog is updated from the event loop so it cannot be missed
+        spy = QtTest.QSignalSpy(dlg.indexes_changed)
+        dlg.operation_buttons['remove'].click()
+        job = dlg.job
+        assert spy.wait(60000)
+        job.wait(60000)
+        assert dlg.job is None and not table.cols.x.is_indexed
+        assert dlg.columns_table.item(0, 1).text() == 'not indexed'
+        dlg.close()
@@ -1,5 +1,6 @@
 """Test class for utils.py"""
 
+import numpy as np
 import pytest
 from qtpy import QtGui, QtWidgets
 
@@ -113,3 +114,16 @@ class TestUtils:
     def test_forwardPath(self):
         filepath = 'C:\\Users\\my_name\\Desktop\\'
         assert utils.forwardPath(filepath) == 'C:/Users/my_name/Desktop/'
+
+    @pytest.mark.parametrize('column', [
+        np.array([0., -0., 1 / 3, 1.e8, 1.e-5, np.nan, -np.inf, 123456.789]),
+        np.array([0.1, 3.e4, 1.e-5], dtype='float32'),
+        np.array([-3, 0, 2**40]),
+        np.array([True, False]),
+        np.array([b'abc', b''], dtype='S3'),
+        np.array(['abc', 'd']),
+        np.arange(6).reshape(3, 2),
+    ])
+    def test_formatArrayColumn(self, column):
+        expected = [utils.formatArrayContent(cell) for cell in column]
+        assert utils.formatArrayColumn(column) == expected
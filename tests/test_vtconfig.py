@@ -9,6 +9,7 @@ from qtpy import QtGui, QtWidgets
 
 # from qtpy.QtTest import QTest
 import vitables.utils
+from vitables.queries import queryworker
 
 
 @pytest.mark.usefixtures('launcher')
@@ -34,6 +35,9 @@ class TestLogger:
         cfg.writeValue('Session/restoreLastSession', False)
         cfg.writeValue('Session/startupWorkingDir', 'home')
         cfg.writeValue('Session/lastWorkingDir', vitables.utils.getHomeDir())
+        cfg.writeValue('Views/memoryBudget', 256)
+        cfg.writeValue('Views/pageCacheBudget', 1024)
+        cfg.writeValue('Queries/workers', 4)
 
     def test_credentials(self, launcher, config):
         organization = launcher.app.organizationName()
@@ -137,3 +141,22 @@ class TestLogger:
     def test_lastWorkingDir(self, config):
         config.writeValue('Session/lastWorkingDir', 1)
         assert config.lastWorkingDir() == vitables.utils.getHomeDir()
+
+    def test_viewMemoryBudget(self, config):
+        config.writeValue('Views/memoryBudget', 1024)
+        assert config.viewMemoryBudget() == 1024
+        # Budgets too small to be useful are ignored
+        config.writeValue('Views/memoryBudget', 1)
+        assert config.viewMemoryBudget() == 256
+
+    def test_pageCacheBudget(self, config):
+        config.writeValue('Views/pageCacheBudget', 4096)
+        assert config.pageCacheBudget() == 4096
+        config.writeValue('Views/pageCacheBudget', 'a lot')
+        assert config.pageCacheBudget() == 1024
+
+    def test_queryWorkers(self, config):
+        config.writeValue('Queries/workers', 6)
+        assert config.queryWorkers() == 6
+        config.writeValue('Queries/workers', 0)
+        assert config.queryWorkers() == queryworker.DEFAULT_WORKERS
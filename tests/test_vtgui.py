@@ -38,12 +38,15 @@ class TestVTGui:
             ['fileNew', 'fileOpen', 'fileOpenRO', 'fileClose', 'fileCloseAll',
              'fileSaveAs', 'fileExit', 'nodeOpen', 'nodeClose',
              'nodeProperties', 'nodeNew', 'nodeRename', 'nodeCut', 'nodeCopy',
-             'nodePaste', 'nodeDelete', 'queryNew', 'queryDeleteAll',
-             'settingsPreferences', 'windowCascade', 'windowTile',
+             'nodePaste', 'nodeDelete', 'queryNew', 'queryMaterialize',
+             'datasetIndexes',
+             'queryDeleteAll', 'settingsPreferences', 'windowCascade', 'windowTile',
              'windowRestoreAll', 'windowMinimizeAll', 'windowClose',
              'windowCloseAll', 'windowSeparator', 'mdiTabbed',
              'helpUsersGuide', 'helpAbout', 'helpAboutQt', 'helpVersions',
-             'calculate']
+             'calculate', 'datasetSlice', 'datasetGoToRow',
+             'datasetStatistics', 'datasetFind', 'datasetFindNext',
+             'datasetFindPrevious']
         assert sorted(gui_actions) == sorted(expected_actions)
 
     def test_fileToolBar(self, launcher):
@@ -134,7 +137,12 @@ class TestVTGui:
 
         actions = [a.objectName() for a in menu_actions
                    if not (a.isSeparator() or a.menu())]
-        expected_actions = ['queryNew', 'calculate', 'export_csv']
+        expected_actions = ['queryNew', 'queryMaterialize', 'datasetFind',
+                            'datasetFindNext',
+                            'datasetFindPrevious', 'datasetGoToRow',
+                            'datasetSlice', 'datasetStatistics',
+                            'datasetIndexes', 'calculate',
+                            'export_csv']
         assert sorted(actions) == sorted(expected_actions)
 
         separators = [a for a in menu_actions if a.isSeparator()]
@@ -240,7 +248,8 @@ class TestVTGui:
                    if not (a.isSeparator() or a.menu())]
         expected_actions = ['nodeOpen', 'nodeClose',  'nodeProperties',
                             'nodeRename', 'nodeCut', 'nodeCopy', 'nodePaste',
-                            'nodeDelete', 'queryNew', 'export_csv']
+                            'nodeDelete', 'queryNew', 'queryMaterialize',
+                            'datasetIndexes', 'export_csv']
         assert sorted(actions) == sorted(expected_actions)
 
         separators = [a for a in menu_actions if a.isSeparator()]
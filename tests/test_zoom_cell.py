@@ -0,0 +1,68 @@
+"""Test class for zooming the cells of datasets."""
+
+import numpy as np
+import pytest
+import tables
+
+import vitables.vttables.buffer as vtbuffer
+import vitables.vtwidgets.zoom_cell as zoom_cell
+
+
+@pytest.fixture()
+def datafile(tmp_path):
+    """A file with a table of image patches and a 4-D array."""
+
+    h5file = tables.open_file(str(tmp_path / 'zoom.h5'), 'w')
+    records = np.zeros(4, dtype=[('id', 'i4'), ('patch', 'f4', (600, 300))])
+    records['id'] = [3, 1, 2, 0]
+    for row in range(4):
+        records['patch'][row] = row + np.arange(180000.).reshape(600, 300)
+    table = h5file.create_table('/', 'table', obj=records)
+    table.cols.id.create_csindex()
+    h5file.create_array('/', 'array',
+                        obj=np.arange(2 * 3 * 700 * 5).reshape(2, 3, 700, 5))
+    yield h5file
+    h5file.close()
+
+
+class TestZoomCell:
+    """Test class for module zoom_cell."""
+
+    def test_array_cell(self):
+        source = zoom_cell.ArrayCell(np.arange(1000000.).reshape(1000, 1000))
+        model = zoom_cell.ZoomModel(source)
+        assert (model.rowCount(), model.columnCount()) == (1000, 1000)
+        assert model.displayString(999, 3) == '999003.'
+        # Just the displayed blocks are formatted
+        assert list(model.display_strings) == [(3, 3)]
+        assert source.cell(2, 1).data == 2001.
+
+        record = np.zeros((), dtype=[('a', 'i4'), ('b', 'f8', (2,))])[()]
+        source = zoom_cell.ArrayCell(record)
+        assert (source.nrows, source.ncols, source.headers) == \
+            (1, 2, ['a', 'b'])
+        assert source.cell(0, 1).nrows == 2
+        assert not zoom_cell.ArrayCell('text').canZoom()
+        assert zoom_cell.ZoomModel(
+            zoom_cell.ArrayCell([1, 'a'])).displayString(1, 0) == 'a'
+
+    def test_disk_cell(self, datafile, monkeypatch):
+        monkeypatch.setattr(zoom_cell, 'TILE_BYTES', 4096)
+        rbuffer = vtbuffer.Buffer(datafile.root.array)
+        assert zoom_cell.canReadCell(rbuffer)
+        source = zoom_cell.diskCell(rbuffer, 1, 2)
+        assert isinstance(source, zoom_cell.HyperslabCell)
+        assert (source.nrows, source.ncols) == (700, 5)
+        model = zoom_cell.ZoomModel(source)
+        expected = datafile.root.array[1, 2]
+        assert model.displayString(650, 4) == str(expected[650, 4])
+        assert source.cell(650, 4).data == expected[650, 4]
+        assert len(source.tiles) == 1
+
+        rbuffer = vtbuffer.Buffer(datafile.root.table)
+        source = zoom_cell.diskCell(rbuffer, 2, 1)
+        assert (source.nrows, source.ncols) == (600, 300)
+        assert source.data[0, 0] == 2.
+        rbuffer.setSortOrder('id', descending=True)
+        source = zoom_cell.diskCell(rbuffer, 0, 1)
+        assert source.data[0, 0] == 0.
@@ -1,4 +1,5 @@
 from vitables.start import gui
 
-gui()
-
+# Query worker processes import the main module too
+if __name__ == '__main__':
+    gui()
@@ -232,8 +232,12 @@ class ExtTSFormatter:
         if isinstance(leaf, tables.link.Link):
             leaf = leaf.__call__()
 
-        # Look for formattable time fields in the dataset
+        # Look for formattable time fields in the dataset. Query results
+        # made of coordinates display the rows of the queried table
         node_kind = datasheet.dbt_leaf.node_kind
+        if node_kind == 'table (coordinates)':
+            leaf = datasheet.leaf_model.leaf
+            node_kind = 'table'
         ts_kind = findTS(leaf, node_kind)
         if ts_kind is None:
             return
@@ -361,10 +365,9 @@ class TSLeafModel:
             return None
 
         if role == QtCore.Qt.DisplayRole:
-            cell = self.model.cell(row, col)
             if index.column() in self.ts_cols:
-                return self.tsFormatter(cell)
-            return self.formatContent(cell)
+                return self.tsFormatter(self.model.cell(row, col))
+            return self.model.displayString(row, col)
 
         if role == QtCore.Qt.TextAlignmentRole:
             return QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop
@@ -384,7 +387,6 @@ class TSLeafModel:
         """
         row, col = index.row(), index.column()
         n_columns, n_index = self.model._nheaders
-        df = self.model._chunk
 
         if not index.isValid() or not (0 <= row < (self.numrows + n_columns)):
             return None
@@ -397,7 +399,7 @@ class TSLeafModel:
 
         if is_index:
             if role == Qt.DisplayRole:
-                val = df.index[row - n_columns]
+                val = self.model.indexValue(row - n_columns)
                 if n_index > 1:
                     val = val[col]
                 if col in self.ts_cols:
@@ -411,10 +413,7 @@ class TSLeafModel:
 
         if is_columns:
             if role == Qt.DisplayRole:
-                val = df.columns[col - n_index]
-                if n_columns > 1:
-                    val = val[row]
-                return str(val)
+                return self.model.columnLabels(col - n_index)[row]
             if role == Qt.FontRole:
                 return _axis_font
             if role == Qt.TextAlignmentRole:
@@ -422,10 +421,10 @@ class TSLeafModel:
             return
 
         if role == Qt.DisplayRole:
-            val = self.model._chunk.iat[row - n_columns, col - n_index]
             if col in self.ts_cols:
-                return self.tsFormatter(val)
-            return str(val)
+                return self.tsFormatter(
+                    self.model.cellValue(row - n_columns, col - n_index))
+            return self.model.columnStrings(col - n_index)[row - n_columns]
 
         # if role == Qt.TextAlignmentRole:
         #     return int(Qt.AlignLeft|Qt.AlignTop)
@@ -23,18 +23,32 @@ This module defines some convenience functions for dealing with filenodes.
 
 Efficiently managing filenodes is pretty difficult as they behave as regular
 text files. By design, regular files I/O is not optimized for performing well
-when the files are huge. In fact, even medium size files perform poorly. The
-linecache module helps a little with this problem but at a price: it holds the
-whole file in memory.
+when the files are huge. In fact, even medium size files perform poorly.
+Filenodes are displayed line by line so the offsets of their lines are
+found in a single streaming pass and kept in a compact line index. Lines are
+then read by seeking inside the filenode. The line indexes of big filenodes
+are saved in sidecar files so they are built just once.
 """
 
+import hashlib
+import logging
 import os
 import tempfile
 
+import numpy as np
+from qtpy import QtCore
 from tables.nodes import filenode
 
 import vitables.utils as vtutils
 
+log = logging.getLogger(__name__)
+
+#: The amount of data (in bytes) scanned at once when indexing lines.
+INDEX_BLOCK_BYTES = 2**24
+
+#: Line indexes of filenodes bigger than this (in bytes) are saved.
+INDEX_CACHE_BYTES = 2**26
+
 
 def isFilenode(leaf):
     """Find out if PyTables node is tied to a filenode."""
@@ -66,10 +80,143 @@ def filenodeToFile(leaf):
 
 def filenodeTotalRows(leaf):
     """Traverse the whole filenode and count its number of rows."""
+    return len(lineOffsets(leaf)) - 1
 
-    # Warning: this is SLOW for large files
-    counter = 0
+
+def lineOffsets(leaf):
+    """Find the offsets of the lines of a filenode.
+
+    The filenode is read in a single streaming pass.
+
+    :Parameter leaf: the filenode being indexed
+
+    :Returns: an int64 array with the offset of every line followed by
+      the size of the filenode, so line ``i`` spans the bytes from
+      ``offsets[i]`` to ``offsets[i + 1]``
+    """
+
+    starts = [np.zeros(1, dtype=np.int64)]
+    size = 0
     with filenode.open_node(leaf, 'r') as f:
-        for line in f:
-            counter += 1
-    return counter
+        while True:
+            block = f.read(INDEX_BLOCK_BYTES)
+            if not block:
+                break
+            newlines = np.flatnonzero(
+                np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+            starts.append(newlines.astype(np.int64) + (size + 1))
+            size += len(block)
+    offsets = np.concatenate(starts)
+    # The last line may not end with a newline
+    if offsets[-1] != size:
+        offsets = np.append(offsets, size)
+    return offsets
+
+
+class LineIndexStore:
+    """A sidecar store of the line indexes of filenodes.
+
+    Every line index is saved in a `numpy` file of the store directory
+    along with the state of the filenode (modification time and size of its
+    database, size of the filenode) so stale indexes are never returned.
+
+    :Parameter directory: the directory where line indexes are saved
+    """
+
+    def __init__(self, directory):
+        """Setup the store."""
+        self.directory = directory
+
+    def indexPath(self, leaf):
+        """The sidecar file of a given filenode.
+
+        :Parameter leaf: the filenode
+        """
+
+        key = f'{os.path.abspath(leaf._v_file.filename)}#{leaf._v_pathname}'
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.npz')
+
+    @staticmethod
+    def nodeState(leaf):
+        """The state of a filenode when it is indexed.
+
+        :Parameter leaf: the filenode
+        """
+
+        stat = os.stat(leaf._v_file.filename)
+        return np.array([stat.st_mtime_ns, stat.st_size, leaf.nrows],
+                        dtype=np.int64)
+
+    def load(self, leaf):
+        """Read the line index of a filenode.
+
+        :Parameter leaf: the filenode
+
+        :Returns: the line offsets or None if missing or stale
+        """
+
+        try:
+            with np.load(self.indexPath(leaf)) as saved:
+                if np.array_equal(saved['state'], self.nodeState(leaf)):
+                    return saved['offsets']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def save(self, leaf, offsets):
+        """Save the line index of a filenode.
+
+        Errors are logged but not raised because indexes can always be
+        built again.
+
+        :Parameters:
+
+        - `leaf`: the filenode
+        - `offsets`: the line offsets of the filenode
+        """
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            np.savez(self.indexPath(leaf), offsets=offsets,
+                     state=self.nodeState(leaf))
+        except OSError as e:
+            log.error(f'The line index of {leaf._v_pathname} cannot be '
+                      f'saved: {e}')
+
+
+_store = None
+
+
+def getLineIndexStore():
+    """Return the line index store, creating it if needed.
+
+    Line indexes are saved in the cache directory of the application.
+    """
+
+    global _store
+    if _store is None:
+        cache_dir = QtCore.QStandardPaths.writableLocation(
+            QtCore.QStandardPaths.CacheLocation)
+        _store = LineIndexStore(os.path.join(cache_dir, 'filenodes'))
+    return _store
+
+
+def filenodeLineIndex(leaf):
+    """The line index of a filenode.
+
+    Saved indexes are used if they are not stale. Otherwise the filenode
+    is indexed and, if it is big, its index is saved.
+
+    :Parameter leaf: the filenode
+
+    :Returns: the line offsets of the filenode (see `lineOffsets`)
+    """
+
+    store = getLineIndexStore()
+    offsets = store.load(leaf)
+    if offsets is None:
+        offsets = lineOffsets(leaf)
+        if offsets[-1] >= INDEX_CACHE_BYTES:
+            store.save(leaf, offsets)
+    return offsets
@@ -34,6 +34,8 @@ import tables
 from qtpy import QtCore, QtWidgets
 
 import vitables.utils
+from vitables.queries import indexing
+from vitables.vttables import finder, pagecache, readahead
 
 __docformat__ = 'restructuredtext'
 
@@ -118,12 +120,25 @@ class DBDoc(QtCore.QObject):
         return h5file
 
     def closeH5File(self):
-        """Closes a tables.File instance."""
+        """Closes a tables.File instance.
 
-        try:
-            self.h5file.close()
-        except (tables.NodeError, OSError):
-            vitables.utils.formatExceptionInfo()
+        The background jobs using the file are stopped first and the file is
+        closed holding `readahead.HDF5_LOCK`.
+        """
+
+        # Index jobs and searches may still use this file
+        indexing.cancelJobs(self.filepath)
+        finder.cancelWorkers(self.filepath)
+        # The read-ahead worker may have its own handle of this file
+        readahead.closeFile(self.filepath)
+        pagecache.invalidate(self.filepath)
+        with readahead.HDF5_LOCK:
+            if self.hidden_group is not None:
+                self.h5file.remove_node(self.hidden_group, recursive=True)
+            try:
+                self.h5file.close()
+            except (tables.NodeError, OSError):
+                vitables.utils.formatExceptionInfo()
 
     def getFileFormat(self):
         """
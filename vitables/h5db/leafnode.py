@@ -103,6 +103,12 @@ class LeafNode:
                 self.icon = icons['filenode']
         except AttributeError:
             pass
+        if self.node_kind == 'earray' and \
+                getattr(self.node.attrs, 'query_coordinates', False):
+            # Query results made of the coordinates of the selected rows
+            # look like the queried table
+            self.node_kind = 'table (coordinates)'
+            self.icon = icons['table']
 
     def row(self):
         """The position of this node in the parent's list of children.
@@ -32,6 +32,7 @@ import os
 import tables
 
 import vitables.utils
+from vitables.vttables import pagecache
 
 
 class TNodeEditor:
@@ -62,6 +63,7 @@ class TNodeEditor:
         """
 
         try:
+            pagecache.invalidate(self.h5file.filename, nodepath)
             self.h5file.remove_node(where=nodepath, recursive=True)
             self.h5file.flush()
         except (tables.NodeError, OSError):
@@ -105,6 +107,10 @@ class TNodeEditor:
         """
 
         try:
+            # The pasted node may overwrite an existing one
+            pagecache.invalidate(self.h5file.filename,
+                                 f'{parent._v_pathname.rstrip("/")}/'
+                                 f'{childname}')
             self.h5file.copy_node(src_node, newparent=parent,
                 newname=childname, overwrite=True, recursive=True)
             self.h5file.flush()
@@ -125,6 +131,9 @@ class TNodeEditor:
         where, current_name = os.path.split(nodepath)
 
         try:
+            pagecache.invalidate(self.h5file.filename, nodepath)
+            pagecache.invalidate(self.h5file.filename,
+                                 os.path.join(where, new_name))
             self.h5file.rename_node(where, new_name, current_name, overwrite=1)
             self.h5file.flush()
         except (tables.NodeError, OSError):
@@ -143,6 +152,8 @@ class TNodeEditor:
 
         try:
             if final_name in self.h5file.get_node(where)._v_children.keys():
+                pagecache.invalidate(self.h5file.filename,
+                                     os.path.join(where, final_name))
                 self.h5file.remove_node(where, final_name, recursive=True)
             self.h5file.create_group(where, final_name, title='')
             self.h5file.flush()
@@ -163,6 +174,9 @@ class TNodeEditor:
 
         try:
             dst_h5file = dst_dbdoc.h5file
+            pagecache.invalidate(self.h5file.filename, childpath)
+            pagecache.invalidate(dst_h5file.filename,
+                                 os.path.join(parentpath, childname))
             parent_node = dst_h5file.get_node(parentpath)
             if self.h5file is dst_h5file:
                 self.h5file.move_node(childpath, newparent=parent_node,
@@ -17,5 +17,6 @@
 #
 #       Author:  Vicent Mas - vmas@vitables.org
 
-__all__ = ["attreditor", "attrpropdlg", "grouppropdlg", "groupproppage",
-    "leafpropdlg", "leafproppage", "linkpropdlg", "nodeinfo"]
+__all__ = ["attreditor", "attrpropdlg", "colstats", "grouppropdlg",
+    "groupproppage", "leafpropdlg", "leafproppage", "linkpropdlg", "nodeinfo",
+    "statsdlg"]
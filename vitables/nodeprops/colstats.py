@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module computes the statistics of table columns and arrays.
+
+Datasets are scanned block by block so they never have to fit in memory:
+minimum, maximum, mean and standard deviation are merged block after block,
+NaN and infinite values are counted, the number of distinct values is
+estimated with a K minimum values sketch and an histogram is built whose
+bins are widened (never approximated) as new values are found.
+
+Scans are done in a worker thread (see `StatsScanner`) and their results are
+saved in a sidecar file in the cache directory of the application, keyed by
+the state of the dataset, so statistics of unchanged datasets are available
+instantly (see `StatsStore`).
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+import tables
+from qtpy import QtCore
+
+from vitables.vttables import pagecache, readahead
+
+__docformat__ = 'restructuredtext'
+
+log = logging.getLogger(__name__)
+
+#: The number of bins of histograms (it must be even).
+HISTOGRAM_BINS = 50
+
+#: The number of hash values kept by the distinct values sketch.
+SKETCH_SIZE = 2048
+
+
+class Histogram:
+    """An histogram of values with a fixed number of equal width bins.
+
+    The bins range is set by the first values added. When values out of
+    range are added the bin width is doubled (merging pairs of bins) until
+    the range covers them, so counts are never approximated.
+
+    :Parameter bins: the number of bins
+    """
+
+    def __init__(self, bins=HISTOGRAM_BINS):
+        """Create an empty histogram."""
+
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.low = None
+        self.width = None
+
+    def high(self):
+        """The upper edge of the last bin."""
+        return self.low + self.counts.size * self.width
+
+    def edges(self):
+        """The edges of the bins."""
+        return self.low + self.width * np.arange(self.counts.size + 1)
+
+    def add(self, values):
+        """Add finite values to the histogram.
+
+        :Parameter values: a 1-D array of finite values
+        """
+
+        if not values.size:
+            return
+        values = values.astype(np.float64, copy=False)
+        vmin, vmax = values.min(), values.max()
+        bins = self.counts.size
+        if self.low is None:
+            # Bin widths are powers of two and edges are multiples of the
+            # width, so edges are exact and merging bins is exact too
+            span = (vmax - vmin) / bins or max(abs(vmin), 1.) * 2.**-30
+            self.width = math.ldexp(1., math.frexp(span)[1])
+            self.low = math.floor(vmin / self.width) * self.width
+        while vmin < self.low or vmax > self.high():
+            pairs = self.counts.reshape(-1, 2).sum(axis=1)
+            empty = np.zeros(bins // 2, dtype=np.int64)
+            if vmin < self.low:
+                self.low -= bins * self.width
+                self.counts = np.concatenate((empty, pairs))
+            else:
+                self.counts = np.concatenate((pairs, empty))
+            self.width *= 2
+        indices = np.floor((values - self.low) / self.width).astype(np.int64)
+        np.clip(indices, 0, bins - 1, out=indices)
+        self.counts += np.bincount(indices, minlength=bins)
+
+    def toDict(self):
+        """The histogram as a dictionary of bin edges and counts."""
+
+        if self.low is None:
+            return {'edges': [], 'counts': []}
+        return {'edges': self.edges().tolist(),
+                'counts': self.counts.tolist()}
+
+
+def hashValues(values):
+    """Hash the values of an array.
+
+    Values of any fixed size type are hashed by mixing the 64-bit words of
+    their binary representation.
+
+    :Parameter values: a 1-D array
+    :Returns: an array of 64-bit hashes
+    """
+
+    values = np.ascontiguousarray(values)
+    nwords = -(-values.dtype.itemsize // 8)
+    raw = np.zeros((values.size, nwords * 8), dtype=np.uint8)
+    raw[:, :values.dtype.itemsize] = \
+        values.view(np.uint8).reshape(values.size, -1)
+    words = raw.view(np.uint64)
+    hashes = np.full(values.size, 0x9e3779b97f4a7c15, dtype=np.uint64)
+    for word in range(nwords):
+        # The splitmix64 finalizer
+        hashes ^= words[:, word]
+        hashes ^= hashes >> np.uint64(30)
+        hashes *= np.uint64(0xbf58476d1ce4e5b9)
+        hashes ^= hashes >> np.uint64(27)
+        hashes *= np.uint64(0x94d049bb133111eb)
+        hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+class DistinctSketch:
+    """Estimate the number of distinct values with a K minimum values sketch.
+
+    The smallest `size` distinct hashes seen are kept. The count is exact
+    (barring hash collisions) while less than `size` distinct values are
+    seen.
+
+    :Parameter size: the number of hashes kept
+    """
+
+    def __init__(self, size=SKETCH_SIZE):
+        """Create an empty sketch."""
+
+        self.size = size
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def add(self, values):
+        """Add values to the sketch.
+
+        :Parameter values: a 1-D array
+        """
+
+        hashes = hashValues(values)
+        if self.hashes.size == self.size:
+            hashes = hashes[hashes < self.hashes[-1]]
+        self.hashes = np.unique(
+            np.concatenate((self.hashes, hashes)))[:self.size]
+
+    def isExact(self):
+        """Find out if the estimate is an exact count."""
+        return self.hashes.size < self.size
+
+    def estimate(self):
+        """The estimated number of distinct values."""
+
+        if self.isExact():
+            return int(self.hashes.size)
+        return int(round((self.size - 1) * 2.**64 / float(self.hashes[-1])))
+
+
+class StreamingStats:
+    """Statistics of a dataset computed block by block.
+
+    Numeric statistics are only computed for integer, boolean and floating
+    point values. Only the number of values and distinct values are computed
+    for other types (e.g. strings).
+    """
+
+    def __init__(self):
+        """Create empty statistics."""
+
+        self.count = 0
+        self.nan = 0
+        self.posinf = 0
+        self.neginf = 0
+        self.numeric = None
+        # Statistics of the finite values
+        self.finite = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.
+        self.m2 = 0.
+        self.histogram = Histogram()
+        self.distinct = DistinctSketch()
+
+    def update(self, values):
+        """Add a block of values.
+
+        :Parameter values: an array of any shape
+        """
+
+        values = np.asarray(values).ravel()
+        if self.numeric is None:
+            self.numeric = values.dtype.kind in 'biuf'
+        self.count += values.size
+        if not values.size:
+            return
+        if not self.numeric:
+            self.distinct.add(values)
+            return
+        if values.dtype.kind == 'b':
+            values = values.view(np.uint8)
+        if values.dtype.kind == 'f':
+            nan = np.isnan(values)
+            self.nan += int(nan.sum())
+            self.posinf += int(np.isposinf(values).sum())
+            self.neginf += int(np.isneginf(values).sum())
+            # Adding 0 makes -0.0 and 0.0 the same value
+            self.distinct.add(values[~nan] + 0.)
+            values = values[np.isfinite(values)]
+        else:
+            self.distinct.add(values)
+        if not values.size:
+            return
+
+        # Merge the minimum, maximum, mean and M2 of the block (Chan et al.)
+        vmin, vmax = values.min().item(), values.max().item()
+        self.min = vmin if self.min is None else min(self.min, vmin)
+        self.max = vmax if self.max is None else max(self.max, vmax)
+        nblock = values.size
+        mean = values.mean(dtype=np.float64)
+        m2 = np.square(values - mean, dtype=np.float64).sum()
+        total = self.finite + nblock
+        delta = mean - self.mean
+        self.mean += delta * nblock / total
+        self.m2 += m2 + delta**2 * self.finite * nblock / total
+        self.finite = total
+        self.histogram.add(values)
+
+    def toDict(self):
+        """The statistics as a JSON serialisable dictionary."""
+
+        stats = {
+            'count': self.count,
+            'distinct': self.distinct.estimate(),
+            'distinct_exact': self.distinct.isExact(),
+            'numeric': bool(self.numeric),
+        }
+        if self.numeric:
+            stats.update({
+                'nan': self.nan,
+                'posinf': self.posinf,
+                'neginf': self.neginf,
+                'min': self.min,
+                'max': self.max,
+                'mean': float(self.mean) if self.finite else None,
+                'std': float(np.sqrt(self.m2 / self.finite))
+                if self.finite else None,
+                'histogram': self.histogram.toDict(),
+            })
+        return stats
+
+
+def scanRanges(leaf, colname=None):
+    """Split the axes of a dataset in ranges scanned at once.
+
+    Blocks are made of whole rows (ranges along the main dimension) aligned
+    with the chunks of the dataset and read in no more than
+    `pagecache.BLOCK_BYTES` bytes. Arrays whose rows don't fit in a block are
+    split along their other axes too.
+
+    :Parameters:
+
+    - `leaf`: a `tables.Table` or an array
+    - `colname`: the name of the scanned column of a table
+
+    :Returns: a list of ``(axis, slices)`` tuples. A block is made by
+      choosing a slice of every listed axis, the axes not listed being read
+      as a whole
+    """
+
+    shape = leaf.shape
+    if not shape:
+        return []
+    if isinstance(leaf, tables.Table):
+        axes = [0]
+        unit = leaf.coldtypes[colname].itemsize * shape[0]
+    else:
+        axes = [leaf.maindim] + [axis for axis in range(len(shape))
+                                 if axis != leaf.maindim]
+        unit = leaf.atom.itemsize * int(np.prod(shape))
+
+    # The axes before the split one are scanned one index at a time
+    block_bytes = pagecache.BLOCK_BYTES
+    for (position, axis) in enumerate(axes):
+        unit //= max(shape[axis], 1)
+        if unit <= block_bytes:
+            break
+    step = max(block_bytes // max(unit, 1), 1)
+    chunkshape = getattr(leaf, 'chunkshape', None)
+    if chunkshape and step >= chunkshape[axis]:
+        step = step // chunkshape[axis] * chunkshape[axis]
+    ranges = [(each, [slice(index, index + 1)
+                      for index in range(shape[each])])
+              for each in axes[:position]]
+    ranges.append((axis, [slice(start, min(start + step, shape[axis]))
+                          for start in range(0, shape[axis], step)]))
+    return ranges
+
+
+def scanBlocks(leaf, ranges):
+    """Iterate over the blocks of a dataset.
+
+    :Parameters:
+
+    - `leaf`: a `tables.Table` or an array
+    - `ranges`: the ranges returned by `scanRanges`
+
+    :Returns: an iterator of selections, tuples of slices in the dataset
+      axes
+    """
+
+    axes = [axis for (axis, _) in ranges]
+    for slices in itertools.product(*[slices for (_, slices) in ranges]):
+        selection = [slice(None)] * len(leaf.shape)
+        for (axis, axis_slice) in zip(axes, slices):
+            selection[axis] = axis_slice
+        yield tuple(selection)
+
+
+def computeStatistics(leaf, colname=None, progress=None, cancelled=None):
+    """Compute the statistics of a table column or an array.
+
+    Every block is read while holding the HDF5 lock, so views keep
+    working during long scans: they wait for the read of one block at most.
+
+    :Parameters:
+
+    - `leaf`: a `tables.Table` or an array
+    - `colname`: the name of the scanned column of a table
+    - `progress`: a callable called with the percentage of scanned blocks
+    - `cancelled`: a callable that returns True if the scan is cancelled
+
+    :Returns: the statistics dictionary or None if the scan is cancelled
+    """
+
+    stats = StreamingStats()
+    ranges = scanRanges(leaf, colname)
+    nblocks = math.prod(len(slices) for (_, slices) in ranges)
+    for number, selection in enumerate(scanBlocks(leaf, ranges)):
+        if cancelled is not None and cancelled():
+            return None
+        with readahead.HDF5_LOCK:
+            if not leaf.shape:
+                values = leaf.read()
+            elif isinstance(leaf, tables.Table):
+                rows = selection[0]
+                values = leaf.read(rows.start, rows.stop, field=colname)
+            elif len(selection) == 1:
+                values = leaf.read(selection[0].start, selection[0].stop)
+            else:
+                values = leaf[selection]
+        stats.update(values)
+        if progress is not None:
+            progress(100 * (number + 1) // nblocks)
+    return stats.toDict()
+
+
+class StatsScanner(QtCore.QThread):
+    """Compute the statistics of a table column or an array in background.
+
+    Like the read-ahead worker, the scanner reads the dataset through its own
+    handle of the file, so the `PyTables` objects of the GUI thread are never
+    used from the worker thread. Files opened in a writable mode cannot be
+    opened twice so they are scanned through the GUI handle. Blocks are read
+    holding `readahead.HDF5_LOCK`, so the GUI waits for the read of one block
+    at most when it reads a file during a scan.
+
+    :Parameters:
+
+    - `leaf`: a `tables.Table` or an array
+    - `colname`: the name of the scanned column of a table
+    """
+
+    progress = QtCore.Signal(int)
+    stats_computed = QtCore.Signal(object, str)
+
+    def __init__(self, leaf, colname=None):
+        """Setup the scanner."""
+
+        super(StatsScanner, self).__init__()
+        self.leaf = leaf
+        self.colname = colname
+        self.filename = leaf._v_file.filename
+        self.nodepath = leaf._v_pathname
+        self.mode = readahead.workerMode(leaf._v_file)
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Stop the scan as soon as the current block is processed."""
+        self.cancel_event.set()
+
+    def run(self):
+        """Scan the dataset and emit the statistics (None if the scan is
+        cancelled) and an error message (empty if the scan succeeded).
+        """
+
+        stats, error = None, ''
+        h5file = None
+        try:
+            leaf = self.leaf
+            if self.mode is not None:
+                with readahead.HDF5_LOCK:
+                    h5file = tables.open_file(self.filename, self.mode)
+                    leaf = h5file.get_node(self.nodepath)
+            stats = computeStatistics(leaf, self.colname,
+                                      self.progress.emit,
+                                      self.cancel_event.is_set)
+        except (tables.HDF5ExtError, tables.NoSuchNodeError, ValueError,
+                MemoryError, OSError) as e:
+            error = str(e)
+        finally:
+            if h5file is not None:
+                with readahead.HDF5_LOCK:
+                    h5file.close()
+        self.stats_computed.emit(stats, error)
+
+
+class StatsStore:
+    """A sidecar store of the statistics of datasets.
+
+    Statistics of the datasets of a given file are saved in a JSON file
+    of the store directory. They are keyed by the dataset path and column
+    name, along with the state of the dataset (shape, type and modification
+    time of its file) so stale statistics are never returned.
+
+    :Parameter directory: the directory where statistics are saved
+    """
+
+    def __init__(self, directory):
+        """Setup the store."""
+        self.directory = directory
+
+    def storePath(self, filepath):
+        """The sidecar file of a given database.
+
+        :Parameter filepath: the full path of the database
+        """
+
+        digest = hashlib.sha1(
+            os.path.abspath(filepath).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.json')
+
+    @staticmethod
+    def nodeKey(leaf, colname=None):
+        """The key of the statistics of a dataset in a sidecar file."""
+
+        if colname is None:
+            return leaf._v_pathname
+        return f'{leaf._v_pathname}#{colname}'
+
+    @staticmethod
+    def nodeState(leaf):
+        """The state of a dataset when its statistics are computed.
+
+        :Parameter leaf: a `tables.Table` or an array
+        """
+
+        stat = os.stat(leaf._v_file.filename)
+        return {'shape': [int(size) for size in leaf.shape],
+                'dtype': str(leaf.dtype),
+                'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+
+    def readStore(self, filepath):
+        """Read the sidecar file of a database (empty if missing)."""
+
+        try:
+            with open(self.storePath(filepath)) as store_file:
+                return json.load(store_file)
+        except (OSError, ValueError):
+            return {'file': os.path.abspath(filepath), 'nodes': {}}
+
+    def load(self, leaf, colname=None):
+        """Read the statistics of a dataset.
+
+        :Parameters:
+
+        - `leaf`: a `tables.Table` or an array
+        - `colname`: the name of a table column
+
+        :Returns: the statistics or None if missing or stale
+        """
+
+        store = self.readStore(leaf._v_file.filename)
+        entry = store['nodes'].get(self.nodeKey(leaf, colname))
+        if entry is None or entry['state'] != self.nodeState(leaf):
+            return None
+        return entry['stats']
+
+    def save(self, leaf, colname, stats):
+        """Save the statistics of a dataset.
+
+        Errors are logged but not raised because statistics can always be
+        computed again.
+
+        :Parameters:
+
+        - `leaf`: a `tables.Table` or an array
+        - `colname`: the name of a table column (None for arrays)
+        - `stats`: the statistics dictionary
+        """
+
+        filepath = leaf._v_file.filename
+        store = self.readStore(filepath)
+        store['nodes'][self.nodeKey(leaf, colname)] = {
+            'state': self.nodeState(leaf), 'stats': stats}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.storePath(filepath), 'w') as store_file:
+                json.dump(store, store_file)
+        except OSError as e:
+            log.error(f'Statistics of {leaf._v_pathname} cannot be saved: {e}')
+
+
+_store = None
+
+
+def getStatsStore():
+    """Return the statistics store, creating it if needed.
+
+    Statistics are saved in the cache directory of the application.
+    """
+
+    global _store
+    if _store is None:
+        cache_dir = QtCore.QStandardPaths.writableLocation(
+            QtCore.QStandardPaths.CacheLocation)
+        _store = StatsStore(os.path.join(cache_dir, 'statistics'))
+    return _store
@@ -191,7 +191,9 @@ class NodeInfo:
     def _type(self):
         """The `PyTables` data type of the atom for `tables.Leaf` nodes."""
 
-        if self.node_type.count('array'):
+        # Query results made of coordinates are int64 EArrays
+        if self.node_type.count('array') or \
+                self.node_type == 'table (coordinates)':
             try:
                 return str(self.node.atom.type)
             except AttributeError:
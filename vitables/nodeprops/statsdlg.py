@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module displays in a dialog the statistics of table columns and arrays
+computed by the :mod:`vitables.nodeprops.colstats` module.
+
+Statistics saved by previous scans are displayed instantly. Otherwise the
+dataset is scanned in background and the scan can be cancelled.
+"""
+
+import logging
+
+import tables
+from qtpy import QtCore, QtGui, QtWidgets
+
+from vitables.nodeprops import colstats
+
+__docformat__ = 'restructuredtext'
+
+translate = QtWidgets.QApplication.translate
+log = logging.getLogger(__name__)
+
+
+class HistogramView(QtWidgets.QWidget):
+    """A widget that draws an histogram as a bar chart.
+
+    :Parameter parent: the parent of this widget
+    """
+
+    def __init__(self, parent):
+        """Create an empty histogram view."""
+
+        super(HistogramView, self).__init__(parent)
+        self.edges = []
+        self.counts = []
+        self.setMinimumHeight(120)
+
+    def setHistogram(self, histogram):
+        """Display an histogram.
+
+        Empty bins at both ends of the histogram are not drawn.
+
+        :Parameter histogram: a dictionary of bin edges and counts (None for
+          clearing the view)
+        """
+
+        edges, counts = [], []
+        if histogram and any(histogram['counts']):
+            counts = histogram['counts']
+            first = next(i for i, count in enumerate(counts) if count)
+            last = len(counts) - next(
+                i for i, count in enumerate(reversed(counts)) if count)
+            edges = histogram['edges'][first:last + 1]
+            counts = counts[first:last]
+        self.edges, self.counts = edges, counts
+        if counts:
+            self.setToolTip(translate(
+                'HistogramView', 'From {0:.6g} to {1:.6g}, {2} bins',
+                'The histogram tooltip').format(edges[0], edges[-1],
+                                                len(counts)))
+        else:
+            self.setToolTip('')
+        self.update()
+
+    def paintEvent(self, event):
+        """Draw the bars of the histogram.
+
+        :Parameter event: the paint event
+        """
+
+        if not self.counts:
+            return
+        painter = QtGui.QPainter(self)
+        rect = self.rect().adjusted(2, 2, -2, -2)
+        highest = max(self.counts)
+        width = rect.width() / len(self.counts)
+        color = self.palette().color(QtGui.QPalette.Highlight)
+        for bin_number, count in enumerate(self.counts):
+            height = round(rect.height() * count / highest)
+            painter.fillRect(
+                QtCore.QRectF(rect.left() + bin_number * width,
+                              rect.bottom() - height, max(width - 1, 1),
+                              height), color)
+        painter.end()
+
+
+class StatsDlg(QtWidgets.QDialog):
+    """
+    A non modal dialog displaying the statistics of a dataset.
+
+    For tables the statistics of one column are displayed at a time.
+
+    :Parameter leaf: a `tables.Table` or an array
+    """
+
+    def __init__(self, leaf, parent=None):
+        """Setup the dialog."""
+
+        super(StatsDlg, self).__init__(parent)
+        self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        self.leaf = leaf
+        self.scanner = None
+        self.store = colstats.getStatsStore()
+        self.setWindowTitle(translate(
+            'StatsDlg', 'Statistics: {0}',
+            'The statistics dialog title').format(leaf._v_pathname))
+
+        layout = QtWidgets.QVBoxLayout(self)
+        self.columns_combo = QtWidgets.QComboBox(self)
+        if isinstance(leaf, tables.Table):
+            self.columns_combo.addItems(leaf.colpathnames)
+            form = QtWidgets.QFormLayout()
+            form.addRow(translate('StatsDlg', 'Column:',
+                                  'A label of the statistics dialog'),
+                        self.columns_combo)
+            layout.addLayout(form)
+        else:
+            self.columns_combo.hide()
+
+        self.table = QtWidgets.QTableWidget(0, 2, self)
+        self.table.setHorizontalHeaderLabels([
+            translate('StatsDlg', 'Statistic', 'A statistics table header'),
+            translate('StatsDlg', 'Value', 'A statistics table header')])
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        self.histogram = HistogramView(self)
+        layout.addWidget(self.histogram)
+
+        self.status_label = QtWidgets.QLabel(self)
+        layout.addWidget(self.status_label)
+        self.progress_bar = QtWidgets.QProgressBar(self)
+        self.progress_bar.setRange(0, 100)
+        layout.addWidget(self.progress_bar)
+
+        buttons = QtWidgets.QDialogButtonBox(self)
+        self.compute_button = buttons.addButton(
+            translate('StatsDlg', 'Recompute', 'A statistics dialog button'),
+            QtWidgets.QDialogButtonBox.ActionRole)
+        self.cancel_button = buttons.addButton(
+            translate('StatsDlg', 'Stop', 'A statistics dialog button'),
+            QtWidgets.QDialogButtonBox.ActionRole)
+        buttons.addButton(QtWidgets.QDialogButtonBox.Close)
+        layout.addWidget(buttons)
+
+        self.compute_button.clicked.connect(self.computeStats)
+        self.cancel_button.clicked.connect(self.cancelScan)
+        buttons.rejected.connect(self.close)
+        self.columns_combo.currentIndexChanged.connect(self.showStats)
+        self.resize(420, 520)
+        self.showStats()
+
+    def colname(self):
+        """The name of the selected table column (None for arrays)."""
+
+        if isinstance(self.leaf, tables.Table):
+            return self.columns_combo.currentText()
+        return None
+
+    def showStats(self):
+        """Display the statistics of the selected column or array.
+
+        Saved statistics are displayed if they are not stale. Otherwise
+        the dataset is scanned.
+        """
+
+        self.cancelScan()
+        stats = self.store.load(self.leaf, self.colname())
+        if stats is None:
+            self.computeStats()
+            return
+        self.fillTable(stats)
+        self.progress_bar.setValue(100)
+        self.status_label.setText(translate(
+            'StatsDlg', 'Saved statistics', 'The statistics dialog status'))
+
+    def computeStats(self):
+        """Scan the dataset in background."""
+
+        self.cancelScan()
+        self.fillTable(None)
+        self.progress_bar.setValue(0)
+        self.status_label.setText(translate(
+            'StatsDlg', 'Scanning...', 'The statistics dialog status'))
+        self.scanner = colstats.StatsScanner(self.leaf, self.colname())
+        self.scanner.progress.connect(self.progress_bar.setValue)
+        self.scanner.stats_computed.connect(self.scanFinished)
+        self.compute_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.scanner.start(QtCore.QThread.LowPriority)
+
+    def cancelScan(self):
+        """Stop the running scan (if any) and wait for it."""
+
+        if self.scanner is None:
+            return
+        scanner, self.scanner = self.scanner, None
+        scanner.stats_computed.disconnect(self.scanFinished)
+        scanner.progress.disconnect(self.progress_bar.setValue)
+        scanner.cancel()
+        scanner.wait()
+        self.compute_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText(translate(
+            'StatsDlg', 'Scan cancelled', 'The statistics dialog status'))
+
+    def scanFinished(self, stats, error):
+        """Display and save the statistics computed by a scan.
+
+        :Parameters:
+
+        - `stats`: the statistics dictionary (None if the scan has been
+          cancelled)
+        - `error`: the error message of a failed scan
+        """
+
+        # The scanner thread is about to finish
+        self.scanner.wait()
+        self.scanner = None
+        self.compute_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        if error:
+            log.error(translate(
+                'StatsDlg', 'Statistics of {0} cannot be computed: {1}',
+                'A statistics error').format(self.leaf._v_pathname, error))
+            self.status_label.setText(error)
+            return
+        if stats is None:
+            return
+        self.store.save(self.leaf, self.colname(), stats)
+        self.fillTable(stats)
+        self.status_label.setText(translate(
+            'StatsDlg', 'Statistics computed', 'The statistics dialog status'))
+
+    def rows(self, stats):
+        """The ``(statistic, value)`` pairs displayed by the dialog.
+
+        :Parameter stats: the statistics dictionary
+        """
+
+        distinct = str(stats['distinct'])
+        if not stats['distinct_exact']:
+            distinct = '~' + distinct
+        rows = [
+            (translate('StatsDlg', 'Values', 'A statistic'),
+             str(stats['count'])),
+            (translate('StatsDlg', 'Distinct values', 'A statistic'),
+             distinct),
+        ]
+        if not stats['numeric']:
+            return rows
+        for name, key in (
+                (translate('StatsDlg', 'Minimum', 'A statistic'), 'min'),
+                (translate('StatsDlg', 'Maximum', 'A statistic'), 'max'),
+                (translate('StatsDlg', 'Mean', 'A statistic'), 'mean'),
+                (translate('StatsDlg', 'Standard deviation', 'A statistic'),
+                 'std'),
+                (translate('StatsDlg', 'NaN values', 'A statistic'), 'nan'),
+                (translate('StatsDlg', '+Inf values', 'A statistic'),
+                 'posinf'),
+                (translate('StatsDlg', '-Inf values', 'A statistic'),
+                 'neginf')):
+            value = stats[key]
+            rows.append((name, '' if value is None else f'{value:.10g}'))
+        return rows
+
+    def fillTable(self, stats):
+        """Display the statistics.
+
+        :Parameter stats: the statistics dictionary (None for clearing the
+          dialog)
+        """
+
+        rows = [] if stats is None else self.rows(stats)
+        self.table.setRowCount(len(rows))
+        for row, (name, value) in enumerate(rows):
+            self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(name))
+            self.table.setItem(row, 1, QtWidgets.QTableWidgetItem(value))
+        self.table.resizeColumnToContents(0)
+        self.histogram.setHistogram(stats and stats.get('histogram'))
+
+    def closeEvent(self, event):
+        """Stop the running scan before closing the dialog.
+
+        :Parameter event: the close event
+        """
+
+        self.cancelScan()
+        super(StatsDlg, self).closeEvent(event)
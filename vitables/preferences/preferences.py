@@ -90,6 +90,11 @@ class Preferences(QtWidgets.QDialog, Ui_SettingsDialog):
             self.config.initial_working_directory
         self.init_prefs['Session/restoreLastSession'] = \
             self.config.restore_last_session
+        self.init_prefs['Views/memoryBudget'] = \
+            self.config.view_memory_budget
+        self.init_prefs['Views/pageCacheBudget'] = \
+            self.config.page_cache_budget
+        self.init_prefs['Queries/workers'] = self.config.query_workers
 
         # The following preferences are applied to the Preferences dialog when
         # the OK button is clicked
@@ -204,6 +209,10 @@ class Preferences(QtWidgets.QDialog, Ui_SettingsDialog):
 
         self.restoreCB.setChecked(self.config.restore_last_session)
 
+        self.memoryBudgetSB.setValue(self.config.view_memory_budget)
+        self.pageCacheBudgetSB.setValue(self.config.page_cache_budget)
+        self.queryWorkersSB.setValue(self.config.query_workers)
+
         # Style page
         self.sampleTE.selectAll()
         self.sampleTE.setCurrentFont(self.vtgui.logger.font())
@@ -337,6 +346,49 @@ class Preferences(QtWidgets.QDialog, Ui_SettingsDialog):
         else:
             self.new_prefs['Session/restoreLastSession'] = False
 
+    @QtCore.Slot("int", name="on_memoryBudgetSB_valueChanged")
+    def setViewMemoryBudget(self, value):
+        """
+        Configure the amount of memory used by every view.
+
+        The number of rows read at once from a dataset is computed from
+        this amount of memory and the dataset row size.
+
+        This is a slot method.
+
+        :Parameter value: the amount of memory in MiB
+        """
+
+        self.new_prefs['Views/memoryBudget'] = value
+
+    @QtCore.Slot("int", name="on_pageCacheBudgetSB_valueChanged")
+    def setPageCacheBudget(self, value):
+        """
+        Configure the amount of memory used by the shared page cache.
+
+        Pages read from datasets are cached and shared by every view.
+
+        This is a slot method.
+
+        :Parameter value: the amount of memory in MiB
+        """
+
+        self.new_prefs['Views/pageCacheBudget'] = value
+
+    @QtCore.Slot("int", name="on_queryWorkersSB_valueChanged")
+    def setQueryWorkers(self, value):
+        """
+        Configure the number of processes used by every query.
+
+        Large tables are split in partitions queried in parallel.
+
+        This is a slot method.
+
+        :Parameter value: the maximum number of processes
+        """
+
+        self.new_prefs['Queries/workers'] = value
+
     @QtCore.Slot(name="on_fontPB_clicked")
     def setLoggerFont(self):
         """Slot for setting the logger font."""
@@ -95,7 +95,8 @@ from qtpy import QtCore, QtGui, QtWidgets
 import vitables.utils
 from vitables import __version__
 from vitables.preferences import cfgexception
-from vitables.vttables import datasheet
+from vitables.queries import queryworker
+from vitables.vttables import datasheet, pagecache
 
 __docformat__ = 'restructuredtext'
 
@@ -251,6 +252,64 @@ class Config(QtCore.QSettings):
         else:
             return setting_value
 
+    def viewMemoryBudget(self):
+        """
+        Returns the `Memory per view` setting (in MiB).
+
+        This is a user preference that can be setup in the Preferences dialog.
+        It bounds the memory used by the buffer of every view of a dataset.
+        """
+
+        key = 'Views/memoryBudget'
+        default_value = 256
+        try:
+            setting_value = self.value(key, type=int)
+        except TypeError:
+            setting_value = default_value
+        if isinstance(setting_value, int) and (16 <= setting_value <= 65536):
+            return setting_value
+        else:
+            return default_value
+
+    def pageCacheBudget(self):
+        """
+        Returns the `Page cache` setting (in MiB).
+
+        This is a user preference that can be setup in the Preferences dialog.
+        It bounds the memory used by the pages cached for every open view.
+        """
+
+        key = 'Views/pageCacheBudget'
+        default_value = pagecache.SHARED_MAX_BYTES // 2**20
+        try:
+            setting_value = self.value(key, type=int)
+        except TypeError:
+            setting_value = default_value
+        if isinstance(setting_value, int) and \
+                (16 <= setting_value <= 1048576):
+            return setting_value
+        else:
+            return default_value
+
+    def queryWorkers(self):
+        """
+        Returns the `Query workers` setting.
+
+        This is a user preference that can be setup in the Preferences dialog.
+        It bounds the number of processes that scan a queried table.
+        """
+
+        key = 'Queries/workers'
+        default_value = queryworker.DEFAULT_WORKERS
+        try:
+            setting_value = self.value(key, type=int)
+        except TypeError:
+            setting_value = default_value
+        if isinstance(setting_value, int) and (1 <= setting_value <= 256):
+            return setting_value
+        else:
+            return default_value
+
     def windowPosition(self):
         """
         Returns the main window geometry settings.
@@ -477,6 +536,9 @@ class Config(QtCore.QSettings):
         config['HelpBrowser/History'] = self.helpHistory()
         config['HelpBrowser/Bookmarks'] = self.helpBookmarks()
         config['Look/currentStyle'] = self.readStyle()
+        config['Views/memoryBudget'] = self.viewMemoryBudget()
+        config['Views/pageCacheBudget'] = self.pageCacheBudget()
+        config['Queries/workers'] = self.queryWorkers()
         # read extension config
         for k in extension_keys:
             key = f'Extensions/{k}'
@@ -554,6 +616,19 @@ class Config(QtCore.QSettings):
         if key in config:
             self.initial_working_directory = config[key]
 
+        key = 'Views/memoryBudget'
+        if key in config:
+            self.view_memory_budget = config[key]
+
+        key = 'Views/pageCacheBudget'
+        if key in config:
+            self.page_cache_budget = config[key]
+            pagecache.getCache().setMaxBytes(config[key] * 2**20)
+
+        key = 'Queries/workers'
+        if key in config:
+            self.query_workers = config[key]
+
         key = 'Logger/Paper'
         logger = self.vtapp.gui.logger
         if key in config:
@@ -612,6 +687,12 @@ class Config(QtCore.QSettings):
         self.writeValue('Workspace/Background', vtgui.workspace.background())
         # Style
         self.writeValue('Look/currentStyle', self.current_style)
+        # Memory per view
+        self.writeValue('Views/memoryBudget', self.view_memory_budget)
+        # Memory used by the shared page cache
+        self.writeValue('Views/pageCacheBudget', self.page_cache_budget)
+        # Processes used by every query
+        self.writeValue('Queries/workers', self.query_workers)
         # Startup working directory
         self.writeValue('Session/startupWorkingDir',
                         self.initial_working_directory)
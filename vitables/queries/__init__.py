@@ -17,4 +17,4 @@
 #
 #       Author:  Vicent Mas - vmas@vitables.org
 
-__all__ = ["query", "querydlg", "querymgr"]
+__all__ = ["indexdlg", "indexing", "query", "querycache", "querydlg", "querymgr", "queryworker"]
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module provides a dialog for managing the indexes of table columns.
+
+The indexes of the selected columns can be created (of a given kind and
+optimization level or completely sorted), rebuilt and removed. Indexes are
+processed in background by the :mod:`vitables.queries.indexing` module.
+"""
+
+import logging
+
+from qtpy import QtCore, QtWidgets
+
+from vitables.queries import indexing
+from vitables.vttables import sorting
+
+__docformat__ = 'restructuredtext'
+
+translate = QtWidgets.QApplication.translate
+log = logging.getLogger(__name__)
+
+
+class IndexDlg(QtWidgets.QDialog):
+    """
+    A non modal dialog for managing the indexes of a table.
+
+    :Parameters:
+
+    - `table`: the `tables.Table` whose indexes are managed
+    - `parent`: the parent of the dialog
+    """
+
+    # Emitted once the indexes of the table have been processed
+    indexes_changed = QtCore.Signal()
+
+    def __init__(self, table, parent=None):
+        """Setup the dialog."""
+
+        super(IndexDlg, self).__init__(parent)
+        self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        self.table = table
+        self.job = None
+        self.setWindowTitle(translate(
+            'IndexDlg', 'Indexes: {0}',
+            'The indexes dialog title').format(table._v_pathname))
+
+        layout = QtWidgets.QVBoxLayout(self)
+        self.columns_table = QtWidgets.QTableWidget(0, 5, self)
+        self.columns_table.setHorizontalHeaderLabels([
+            translate('IndexDlg', 'Column', 'An indexes table header'),
+            translate('IndexDlg', 'Kind', 'An indexes table header'),
+            translate('IndexDlg', 'Optlevel', 'An indexes table header'),
+            translate('IndexDlg', 'CSI', 'An indexes table header'),
+            translate('IndexDlg', 'Dirty', 'An indexes table header')])
+        self.columns_table.verticalHeader().hide()
+        self.columns_table.horizontalHeader().setStretchLastSection(True)
+        self.columns_table.setEditTriggers(
+            QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.columns_table.setSelectionBehavior(
+            QtWidgets.QAbstractItemView.SelectRows)
+        layout.addWidget(self.columns_table)
+
+        form = QtWidgets.QFormLayout()
+        self.kind_combo = QtWidgets.QComboBox(self)
+        self.kind_combo.addItems(indexing.INDEX_KINDS)
+        self.kind_combo.setCurrentText(indexing.DEFAULT_KIND)
+        form.addRow(translate('IndexDlg', 'Index kind:',
+                              'A label of the indexes dialog'),
+                    self.kind_combo)
+        self.optlevel_spinbox = QtWidgets.QSpinBox(self)
+        self.optlevel_spinbox.setRange(0, 9)
+        self.optlevel_spinbox.setValue(indexing.DEFAULT_OPTLEVEL)
+        form.addRow(translate('IndexDlg', 'Optimization level:',
+                              'A label of the indexes dialog'),
+                    self.optlevel_spinbox)
+        layout.addLayout(form)
+
+        self.status_label = QtWidgets.QLabel(self)
+        layout.addWidget(self.status_label)
+        self.progress_bar = QtWidgets.QProgressBar(self)
+        layout.addWidget(self.progress_bar)
+
+        buttons = QtWidgets.QDialogButtonBox(self)
+        self.operation_buttons = {}
+        for (operation, text) in (
+                ('create', translate('IndexDlg', 'Create',
+                                     'An indexes dialog button')),
+                ('csi', translate('IndexDlg', 'Create CSI',
+                                  'An indexes dialog button')),
+                ('reindex', translate('IndexDlg', 'Reindex',
+                                      'An indexes dialog button')),
+                ('remove', translate('IndexDlg', 'Remove',
+                                     'An indexes dialog button'))):
+            button = buttons.addButton(
+                text, QtWidgets.QDialogButtonBox.ActionRole)
+            button.clicked.connect(
+                lambda checked=False, operation=operation:
+                self.processIndexes(operation))
+            self.operation_buttons[operation] = button
+        self.cancel_button = buttons.addButton(
+            translate('IndexDlg', 'Stop', 'An indexes dialog button'),
+            QtWidgets.QDialogButtonBox.ActionRole)
+        buttons.addButton(QtWidgets.QDialogButtonBox.Close)
+        layout.addWidget(buttons)
+
+        self.cancel_button.clicked.connect(self.cancelJob)
+        buttons.rejected.connect(self.close)
+        self.columns_table.itemSelectionChanged.connect(self.updateButtons)
+        self.resize(480, 420)
+        self.showIndexes()
+
+    def showIndexes(self):
+        """Display the indexes of the table columns.
+
+        Nested columns cannot be indexed so they are not listed.
+        """
+
+        table = self.table
+        infos = [(name, indexing.indexInfo(table.cols._f_col(name)))
+                 for name in table.colpathnames]
+        no = translate('IndexDlg', 'no', 'A boolean flag of an index')
+        yes = translate('IndexDlg', 'yes', 'A boolean flag of an index')
+        self.columns_table.setRowCount(len(infos))
+        for (row, (name, info)) in enumerate(infos):
+            if info is None:
+                cells = [name, translate('IndexDlg', 'not indexed',
+                                         'The kind of an index'), '', '', '']
+            else:
+                cells = [name, info['kind'], str(info['optlevel']),
+                         yes if info['csi'] else no,
+                         yes if info['dirty'] else no]
+            for (column, text) in enumerate(cells):
+                self.columns_table.setItem(
+                    row, column, QtWidgets.QTableWidgetItem(text))
+        self.columns_table.resizeColumnsToContents()
+        self.updateButtons()
+
+    def selectedColumns(self):
+        """The pathnames of the selected columns."""
+
+        rows = sorted(set(index.row() for index in
+                          self.columns_table.selectedIndexes()))
+        return [self.columns_table.item(row, 0).text() for row in rows]
+
+    def updateButtons(self):
+        """Enable the buttons that can be used.
+
+        Indexes of read-only files cannot be modified and no more than one
+        job at a time can run on a table.
+        """
+
+        idle = self.job is None
+        writable = self.table._v_file.mode != 'r'
+        selected = bool(self.selectedColumns())
+        for button in self.operation_buttons.values():
+            button.setEnabled(idle and writable and selected)
+        self.kind_combo.setEnabled(idle and writable)
+        self.optlevel_spinbox.setEnabled(idle and writable)
+        self.cancel_button.setEnabled(not idle)
+        if not writable:
+            self.status_label.setText(translate(
+                'IndexDlg', 'The file is read-only.',
+                'The indexes dialog status'))
+
+    def processIndexes(self, operation):
+        """Process the indexes of the selected columns in background.
+
+        :Parameter operation: one of `indexing.INDEX_OPERATIONS`
+        """
+
+        colnames = [name for name in self.selectedColumns()
+                    if sorting.canIndex(self.table, name)]
+        if self.job is not None or not colnames:
+            return
+        job = indexing.createIndexJob(
+            self.table, colnames, operation,
+            kind=self.kind_combo.currentText(),
+            optlevel=self.optlevel_spinbox.value())
+        if job is None:
+            self.status_label.setText(translate(
+                'IndexDlg', 'The indexes of the table are being processed.',
+                'The indexes dialog status'))
+            return
+        self.job = job
+        self.progress_bar.setRange(0, len(colnames))
+        self.progress_bar.setValue(0)
+        job.progress.connect(self.showProgress)
+        job.job_finished.connect(self.jobFinished)
+        job.start()
+        self.updateButtons()
+
+    def showProgress(self, done, colname):
+        """Show the progress of the running job.
+
+        :Parameters:
+
+        - `done`: the number of processed columns
+        - `colname`: the column being processed
+        """
+
+        self.progress_bar.setValue(done)
+        if colname:
+            self.status_label.setText(translate(
+                'IndexDlg', 'Processing column {0}...',
+                'The indexes dialog status').format(colname))
+
+    def jobFinished(self, error):
+        """Display the indexes once the running job is done.
+
+        :Parameter error: the error raised by the job (if any)
+        """
+
+        cancelled = self.job.cancelled
+        self.job = None
+        if error:
+            log.error(translate(
+                'IndexDlg', 'The indexes cannot be processed: {0}',
+                'An indexing error').format(error))
+            status = translate('IndexDlg', 'Failed',
+                               'The indexes dialog status')
+        elif cancelled:
+            status = translate('IndexDlg', 'Stopped',
+                               'The indexes dialog status')
+        else:
+            status = translate('IndexDlg', 'Done',
+                               'The indexes dialog status')
+        self.showIndexes()
+        self.status_label.setText(status)
+        self.indexes_changed.emit()
+
+    def cancelJob(self):
+        """Stop the running job once the current column is processed."""
+
+        if self.job is not None:
+            self.job.cancel()
+
+    def closeEvent(self, event):
+        """Stop the running job when the dialog is closed.
+
+        :Parameter event: the close event
+        """
+
+        if self.job is not None:
+            self.job.job_finished.disconnect(self.jobFinished)
+            self.job.progress.disconnect(self.showProgress)
+            self.job.cancel()
+            self.job = None
+        super(IndexDlg, self).closeEvent(event)
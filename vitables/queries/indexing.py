@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module plans queries and manages the indexes of table columns.
+
+Conditions on indexed columns are solved by `PyTables` reading the indexes
+and the selected rows only, instead of scanning the whole range of queried
+rows. The plan of a query (see `queryPlan`) tells which columns are used by
+the condition, which indexes will be used and how much data a full scan
+reads, so users can decide to index the columns before querying.
+
+Indexes are created, rebuilt and removed in a worker thread (see `IndexJob`)
+because indexing big tables takes a while. `PyTables` doesn't report the
+progress of the indexing of a column so jobs report the indexed columns.
+
+The HDF5 library is not thread safe, so jobs process every column holding
+`readahead.HDF5_LOCK`. The lock is also taken by the other threads reading
+files (read-ahead, statistics scans, searches), by buffers, and by the GUI
+code that reads the indexes (query plans, the indexes dialog, sorted views).
+The rest of the GUI (the tree of databases, the property dialogs...) reads
+files without the lock, so it is safe only if it doesn't read the file being
+indexed. Files are never closed while one of their tables is being indexed:
+closing a file cancels its jobs (see `cancelJobs`) and waits until the column
+being processed is done, and then closes the file holding the lock.
+"""
+
+import collections
+import logging
+
+import tables
+from qtpy import QtCore
+
+from vitables.vttables import readahead, sorting
+
+__docformat__ = 'restructuredtext'
+
+log = logging.getLogger(__name__)
+
+#: The kinds of indexes, from the fastest to build to the fastest to query.
+INDEX_KINDS = ('ultralight', 'light', 'medium', 'full')
+
+#: The default kind of the created indexes.
+DEFAULT_KIND = 'medium'
+
+#: The default optimization level (0 to 9) of the created indexes.
+DEFAULT_OPTLEVEL = 6
+
+#: The operations done by index jobs: create indexes of the chosen kind and
+#: optimization level, create completely sorted indexes (CSI), rebuild
+#: indexes and remove indexes.
+INDEX_OPERATIONS = ('create', 'csi', 'reindex', 'remove')
+
+#: The plan of a query: the pathnames of the columns used by the condition,
+#: those whose indexes will be used, those with no index, and the number of
+#: rows and bytes read by a full scan of the queried range.
+QueryPlan = collections.namedtuple(
+    'QueryPlan', ['columns', 'indexed', 'unindexed', 'nrows', 'nbytes'])
+
+
+def conditionColumns(table, condition, condvars=None):
+    """The columns of a table used by a condition.
+
+    :Parameters:
+
+    - `table`: the queried `tables.Table`
+    - `condition`: the query condition
+    - `condvars`: a dictionary mapping condition variables to columns
+
+    :Returns: a list with the column pathnames in order of appearance
+    :Raises SyntaxError: if the condition is not a Python expression
+    """
+
+    condvars = condvars or {}
+    columns = []
+    for name in compile(condition, '<condition>', 'eval').co_names:
+        if name in condvars:
+            name = condvars[name].pathname
+        elif name not in table.colpathnames:
+            # Functions and constants
+            continue
+        if name not in columns:
+            columns.append(name)
+    return columns
+
+
+def queryPlan(table, condition, condvars=None, rows_range=None):
+    """Find out how a query will be made.
+
+    :Parameters:
+
+    - `table`: the queried `tables.Table`
+    - `condition`: the query condition
+    - `condvars`: a dictionary mapping condition variables to columns
+    - `rows_range`: the ``(start, stop, step)`` range of queried rows (the
+      whole table if None)
+
+    :Returns: a `QueryPlan`
+    :Raises: the errors raised by `tables.Table.will_query_use_indexing`
+      for invalid conditions
+    """
+
+    columns = conditionColumns(table, condition, condvars)
+    with readahead.HDF5_LOCK:
+        indexed = table.will_query_use_indexing(condition, condvars)
+        unindexed = [name for name in columns
+                     if not table.cols._f_col(name).is_indexed]
+    if rows_range is None:
+        nrows = table.nrows
+    else:
+        nrows = len(range(*(int(value) for value in rows_range)))
+    return QueryPlan(columns, sorted(indexed), unindexed, nrows,
+                     nrows * table.rowsize)
+
+
+def indexInfo(column):
+    """Describe the index of a column.
+
+    :Parameter column: the `tables.Column` being described
+
+    :Returns: a dictionary with the kind, optimization level, CSI and dirty
+      flags of the index (None if the column is not indexed)
+    """
+
+    with readahead.HDF5_LOCK:
+        if not column.is_indexed:
+            return None
+        index = column.index
+        return {'kind': index.kind, 'optlevel': index.optlevel,
+                'csi': index.is_csi, 'dirty': index.dirty}
+
+
+class IndexJob(QtCore.QThread):
+    """Create, rebuild or remove the indexes of table columns in background.
+
+    Every column is processed holding `readahead.HDF5_LOCK`, so the reads
+    done holding the lock block until the column being processed is done. A
+    cancelled job stops once the current column is processed.
+
+    Jobs are created by `createIndexJob`. Their signals must be connected
+    before they are started.
+
+    :Parameters:
+
+    - `table`: the `tables.Table` instance
+    - `colnames`: the pathnames of the columns
+    - `operation`: one of `INDEX_OPERATIONS`
+    - `kind`: the kind of the created indexes
+    - `optlevel`: the optimization level of the created indexes
+    """
+
+    # The number of processed columns and the column being processed
+    progress = QtCore.Signal(int, str)
+    # An error message (empty if every column has been processed)
+    job_finished = QtCore.Signal(str)
+
+    def __init__(self, table, colnames, operation, kind=DEFAULT_KIND,
+                 optlevel=DEFAULT_OPTLEVEL):
+        """Setup the job."""
+
+        super(IndexJob, self).__init__()
+        if operation not in INDEX_OPERATIONS:
+            raise ValueError(f'Unknown index operation {operation}')
+        self.table = table
+        self.colnames = list(colnames)
+        self.operation = operation
+        self.kind = kind
+        self.optlevel = optlevel
+        self.cancelled = False
+
+    def start(self, priority=QtCore.QThread.LowPriority):
+        """Start processing the columns.
+
+        :Parameter priority: the priority of the worker thread
+        """
+
+        super(IndexJob, self).start(priority)
+
+    def cancel(self):
+        """Stop the job once the current column is processed."""
+        self.cancelled = True
+
+    def processColumn(self, column):
+        """Apply the job operation to a column.
+
+        :Parameter column: the `tables.Column` being processed
+        """
+
+        operation = self.operation
+        if operation == 'remove':
+            if column.is_indexed:
+                column.remove_index()
+        elif operation == 'reindex':
+            if column.is_indexed:
+                column.reindex()
+        else:
+            if column.is_indexed:
+                # Indexes of other kinds are replaced
+                column.remove_index()
+            if operation == 'csi':
+                column.create_csindex()
+            else:
+                column.create_index(optlevel=self.optlevel, kind=self.kind)
+
+    def run(self):
+        """Process the columns and emit an error message (empty if every
+        column has been processed).
+        """
+
+        error = ''
+        colname = ''
+        try:
+            for (done, colname) in enumerate(self.colnames):
+                if self.cancelled:
+                    break
+                self.progress.emit(done, colname)
+                with readahead.HDF5_LOCK:
+                    self.processColumn(self.table.cols._f_col(colname))
+                    self.table.flush()
+            else:
+                self.progress.emit(len(self.colnames), '')
+        except Exception as e:
+            error = f'{colname}: {e}'
+        finally:
+            self.job_finished.emit(error)
+
+
+# The running jobs, keyed by (file name, table path). They must be
+# referenced until they finish
+_jobs = {}
+
+
+def runningJob(table):
+    """The index job running on a table (None if there is no such job).
+
+    :Parameter table: the `tables.Table` instance
+    """
+
+    return _jobs.get((table._v_file.filename, table._v_pathname))
+
+
+def cancelJobs(filename=None):
+    """Stop the index jobs and wait for them.
+
+    Jobs stop once the column being processed is done.
+
+    :Parameter filename: the name of the file whose jobs are stopped (None
+      for stopping every job)
+    """
+
+    for (key, job) in list(_jobs.items()):
+        if filename is None or key[0] == filename:
+            job.cancel()
+            job.wait()
+            _jobs.pop(key, None)
+
+
+def createIndexJob(table, colnames, operation, kind=DEFAULT_KIND,
+                   optlevel=DEFAULT_OPTLEVEL):
+    """Create a job processing the indexes of some columns of a table.
+
+    The job is not started so that its signals can be connected before it
+    emits them. No more than one job at a time can exist for a given table,
+    so the returned job must be started.
+
+    :Parameters:
+
+    - `table`: the `tables.Table` instance
+    - `colnames`: the pathnames of the columns
+    - `operation`: one of `INDEX_OPERATIONS`
+    - `kind`: the kind of the created indexes
+    - `optlevel`: the optimization level of the created indexes
+
+    :Returns: the `IndexJob` thread or None if the table cannot be indexed
+      or another job exists for it
+    """
+
+    if runningJob(table) is not None:
+        log.info(f'The indexes of {table._v_pathname} are being processed')
+        return None
+    if not all(sorting.canIndex(table, colname) for colname in colnames):
+        log.error(f'The indexes of {table._v_pathname} cannot be modified')
+        return None
+    key = (table._v_file.filename, table._v_pathname)
+    job = IndexJob(table, colnames, operation, kind, optlevel)
+    _jobs[key] = job
+    job.finished.connect(lambda: _jobs.pop(key, None))
+    log.info(f'Processing ({operation}) the indexes of '
+             f'{table._v_pathname}: {", ".join(colnames)}')
+    return job
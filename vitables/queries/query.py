@@ -22,200 +22,437 @@
 This module executes `tables.Table` queries at low level.
 
 It collects information from the `New Query` dialog, processes it and then
-executes the query.
+executes the query in parallel worker processes (see `queryworker`).
 """
 
+import contextlib
+import logging
+import multiprocessing
+import os
+import queue
+import tempfile
+
 import numpy as np
 import tables
 from qtpy import QtCore, QtWidgets
 
 import vitables.utils
+from vitables.queries import querycache, queryworker
 
 __docformat__ = 'restructuredtext'
 
 translate = QtWidgets.QApplication.translate
 
+log = logging.getLogger(__name__)
+
+#: The interval (in milliseconds) between checks of the worker progress.
+POLL_INTERVAL = 100
+
+#: The processes are started from scratch so they don't inherit the state
+#: of Qt and HDF5 from the GUI process.
+MP_CONTEXT = multiprocessing.get_context('spawn')
+
+
+@contextlib.contextmanager
+def unlockedFiles():
+    """Let the processes started in this context read locked HDF5 files.
+
+    HDF5 locks the files open for writing, so files open in read-write
+    mode by ViTables could not be read by worker processes otherwise.
+    """
+
+    previous = os.environ.get('HDF5_USE_FILE_LOCKING')
+    os.environ['HDF5_USE_FILE_LOCKING'] = 'FALSE'
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ['HDF5_USE_FILE_LOCKING']
+        else:
+            os.environ['HDF5_USE_FILE_LOCKING'] = previous
+
+
+def workerCount():
+    """The maximum number of worker processes of a query.
+
+    It is set in the Preferences dialog.
+    """
+
+    vtapp = vitables.utils.getVTApp()
+    config = getattr(vtapp, 'config', None)
+    workers = getattr(config, 'query_workers', None)
+    if workers is None:
+        return queryworker.DEFAULT_WORKERS
+    return workers
+
 
 class Query(QtCore.QObject):
     """Class implementing a tables.Table query.
 
-    Ideally queries SHOULD be sequentially executed in a secondary thread for
-    keeping the GUI responsive (i.e. not frozen) while a query (a potentially
-    long-running operation) is taking place. Unfortunately this goal has
-    proven difficult to achieve because `PyTables` is not thread-safe. So one
-    more task to the TO DO list :-)
-
-    The query is implemented in a clever way that doesn't interfer with the
+    Queries are executed in worker processes that open the source file
+    read-only, so the GUI is kept responsive while a query (a potentially
+    long-running operation) is taking place, and `PyTables` (which is not
+    thread-safe) is never used concurrently in the GUI process. The range
+    of queried rows is split in partitions aligned to the chunks of the
+    table and every partition is scanned by its own worker. Workers store
+    their result tables in files of their own and report the scanned and
+    matched rows. When every worker is done the result tables are merged,
+    in row order, in the temporary database.
+
+    The coordinates of the selected rows are cached (see `querycache`) so
+    the same query made again on an unchanged file doesn't scan the table.
+    Results of queries on files opened in a writable mode are not cached:
+    the size and modification time of those files don't tell reliably if
+    the queried table has been modified.
+
+    If the ``coordinates_only`` item of the query description is True then
+    the query result is an `EArray` with the coordinates of the selected
+    rows, which are read from the queried table when they are displayed.
+    Its rows can be stored in a table later by making a query whose
+    ``coordinates_path`` item is a file with the coordinates: the condition
+    is not evaluated and the file is removed once the query is done.
+
+    The query result is added in a way that doesn't interfer with the
     lazy population of the tree of databases view: the query results table is
-    stored under a hidden group of the temporary database until the query
-    finishes. Then it is moved to the root node and becomes visible to the
-    world. This way, while the query results table is partially filled it
-    is not seen by the lazy population algorithm so it is not added to the
-    tree of databases view and neither the user nor ViTables will try to read
-    it. So no problems can occur trying to read a partially filled table.
+    merged under a hidden group of the temporary database. Then it is moved
+    to the root node and becomes visible to the world. This way a partially
+    merged table is not seen by the lazy population algorithm so it is not
+    added to the tree of databases view and neither the user nor ViTables will
+    try to read it.
 
     :Parameters:
 
+    - `tmp_h5file`: the temporary database
     - `table_uid`: UID of the tables.Table instance being queried
     - `table`: the table being queried
     - `qdescr`: dictionary description of the query
+    - `workers`: the maximum number of worker processes (the Preferences
+      setting by default)
     """
 
 
     query_completed = QtCore.Signal(bool, str, name="queryCompleted")
+    # The scanned and the matched rows
+    progress = QtCore.Signal(object, object)
 
 
-    def __init__(self, tmp_h5file, table_uid, table, qdescr):
+    def __init__(self, tmp_h5file, table_uid, table, qdescr, workers=None):
         """Initialises the query."""
 
         super(Query, self).__init__()
 
         self.completed = False
+        self.cancelled = False
         self.tmp_h5file = tmp_h5file
         self.table_uid = table_uid
         self.table = table
         self.qdescr = qdescr
+        self.coordinates_only = qdescr.get('coordinates_only', False)
+        self.workers = workerCount() if workers is None else workers
+        (start, stop, step) = (int(value) for value in qdescr['rows_range'])
+        self.nrows = len(range(start, stop, step))
+
+        # The worker processes, their result files and their progress by
+        # partition number
+        self.processes = []
+        self.result_paths = []
+        self.part_progress = []
+        self.part_results = {}
+        # The key of the query in the cache and its cached result (if any)
+        self.cache_key = None
+        self.cached_path = None
+        self.messages = None
+        self.cancel_event = None
+        self.poll_timer = QtCore.QTimer(self)
+        self.poll_timer.setInterval(POLL_INTERVAL)
+        self.poll_timer.timeout.connect(self.pollWorkers)
+
+
+    def partitions(self):
+        """The ranges of rows scanned by the worker processes.
+
+        Small scans are not split because starting a process takes a while.
+        """
+
+        (start, stop, step) = (int(value)
+                               for value in self.qdescr['rows_range'])
+        parts = min(self.workers,
+                    -(-self.nrows // queryworker.MIN_PARTITION_ROWS))
+        chunkshape = self.table.chunkshape
+        align = chunkshape[0] if chunkshape else 1
+        # Empty ranges are scanned too so the result table is created
+        return queryworker.partitionRange(start, stop, step, parts, align) \
+            or [(start, start)]
+
+
+    def workerDescription(self, rows_range):
+        """The description of the query passed to a worker process.
+
+        Columns cannot be passed to other processes so condition variables
+        are mapped to the pathnames of the columns.
+
+        :Parameter rows_range: the ``(start, stop)`` range of the partition
+          scanned by the worker
+        """
+
+        qdescr = dict(self.qdescr)
+        qdescr['rows_range'] = tuple(rows_range) + (
+            int(qdescr['rows_range'][2]),)
+        qdescr['condvars'] = dict(
+            (name, column.pathname)
+            for (name, column) in qdescr['condvars'].items())
+        if self.cached_path is not None:
+            qdescr['coordinates_path'] = self.cached_path
+        # Coordinates are collected only if they are needed
+        qdescr['keep_coordinates'] = self.coordinates_only or \
+            self.cache_key is not None
+        return qdescr
 
 
     def run(self):
         """
-        Query a table and add a the result to the temporary database.
+        Start querying the table in worker processes.
         """
 
-        self.queryTable()
-        self.query_completed.emit(self.completed, self.table_uid)
+        # The workers read the source file from disk
+        h5file = self.table._v_file
+        if h5file.mode != 'r':
+            h5file.flush()
+        if 'coordinates_path' in self.qdescr:
+            # The rows have been selected already
+            self.cached_path = self.qdescr['coordinates_path']
+        elif h5file.mode == 'r':
+            self.cache_key = querycache.queryKey(
+                self.workerDescription(self.qdescr['rows_range'][:2]))
+            self.cached_path = \
+                querycache.getQueryCache().lookup(self.cache_key)
+            if self.cached_path is not None:
+                log.info(translate('Query',
+                                   'Reusing the cached result of query {0}.',
+                                   'Info message for users').format(
+                                       self.qdescr['title']))
+        if self.coordinates_only and self.cached_path is not None:
+            # There is nothing to scan. The result is added once the
+            # caller is ready to handle the completion signal
+            QtCore.QTimer.singleShot(0, self.workersFinished)
+            return
+
+        self.messages = MP_CONTEXT.Queue()
+        self.cancel_event = MP_CONTEXT.Event()
+        with unlockedFiles():
+            for (part, rows_range) in enumerate(self.partitions()):
+                (handle, result_path) = tempfile.mkstemp(
+                    suffix='.h5', prefix='query_',
+                    dir=os.path.dirname(self.tmp_h5file.filename))
+                os.close(handle)
+                process = MP_CONTEXT.Process(
+                    target=queryworker.runQuery,
+                    args=(self.workerDescription(rows_range), result_path,
+                          part, self.messages, self.cancel_event),
+                    daemon=True)
+                self.result_paths.append(result_path)
+                self.processes.append(process)
+                self.part_progress.append((0, 0))
+                process.start()
+        self.poll_timer.start()
+
+
+    def cancel(self):
+        """Stop the query as soon as the current chunks of rows are scanned."""
+
+        self.cancelled = True
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
+
+    def abort(self):
+        """Kill the worker processes without waiting for their results."""
+
+        self.poll_timer.stop()
+        for process in self.processes:
+            process.terminate()
+            process.join()
+        self.cleanup()
+
+
+    def pollWorkers(self):
+        """Process the messages sent by the worker processes."""
+
+        # Messages are sent before the workers exit
+        alive = [process.is_alive() for process in self.processes]
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == 'progress':
+                self.part_progress[message[1]] = message[2:]
+            else:
+                self.partFinished(*message[1:])
+        for (part, process) in enumerate(self.processes):
+            if not alive[part] and part not in self.part_results:
+                # The worker died without saying goodbye
+                self.partFinished(part, False, translate(
+                    'Query', 'The query process exited with code {0}',
+                    'A query error').format(process.exitcode))
+
+        if len(self.part_results) == len(self.processes):
+            self.workersFinished()
+        else:
+            self.progress.emit(
+                sum(scanned for (scanned, _) in self.part_progress),
+                sum(matched for (_, matched) in self.part_progress))
 
 
-    def flushTable(self, ftable):
-        """Flush the filtered table and setup some user attributes.
+    def partFinished(self, part, completed, error):
+        """Register a worker process that is done.
+
+        The rest of workers are stopped if a worker fails.
 
         :Parameters:
 
-        - `ftable`: the filtered table being flushed
+        - `part`: the partition scanned by the worker
+        - `completed`: whether the worker has completed its scan or not
+        - `error`: the error message of a failed worker
         """
 
-        ftable.flush()
-        # Set some user attributes that define this filtered table
-        asi = ftable.attrs
-        asi.query_path = self.qdescr['src_filepath']
-        asi.query_table = self.qdescr['src_path']
-        asi.query_condition = self.qdescr['title']
+        self.part_results[part] = completed
+        if error:
+            log.error(error)
+        if not completed:
+            self.cancel_event.set()
 
 
-    def queryWithIndex(self, src_dict):
-        """Do the query (`PyTables` level).
+    def workersFinished(self):
+        """Add the result to the temporary database once the workers are
+        done.
         """
 
-        # The query range is made of numpy scalars with dtype int64
-        (start, stop, step) = self.qdescr['rows_range']
-        chunk_size = 10000
-        div = int((stop - start) // chunk_size)
-
-        # Create the destination table: its first column will contain
-        # the indices of the rows selected in the source table so a new
-        # description dictionary is needed. Int64 values are necessary
-        # to keep full 64-bit indices
-        ft_dict = {self.qdescr['indices_field_name']: tables.Int64Col(pos=-1)}
-        ft_dict.update(src_dict)
-        f_table = self.tmp_h5file.create_table(
-            '/_p_query_results',
-            self.qdescr['ft_name'],
-            ft_dict,
-            self.qdescr['title'])
-
-        # Get the array of rows that fulfill the condition
-        # Selection is done in several steps. It saves a *huge*
-        # amount of memory when querying large tables
-        for i in np.arange(0, div+1):
-            QtWidgets.QApplication.processEvents()
-            lstart = start + chunk_size*i
-            lstart = min(lstart, stop)
-            lstop = lstart + chunk_size
-            lstop = min(lstop, stop)
-            coordinates = self.table.get_where_list(
-                self.qdescr['condition'],
-                self.qdescr['condvars'],
-                start=lstart, stop=lstop, step=step)
-            selection = self.table.read_coordinates(coordinates)
-            if selection.shape == (0, ):
-                continue
-
-            coord_dtype = np.dtype(
-                [(str(self.qdescr['indices_field_name']), '<i8')])
-            new_dtype = np.dtype(
-                coord_dtype.descr + selection.dtype.descr)
-
-            new_buffer = np.empty(selection.shape, dtype=new_dtype)
-            for field in selection.dtype.fields:
-                new_buffer[field] = selection[field]
-            new_buffer[str(self.qdescr['indices_field_name'])] = \
-                coordinates
-            f_table.append(new_buffer)
-            self.flushTable(f_table)
-
-        # Move the intermediate table to its final destination
-        self.tmp_h5file.move_node(
-            '/_p_query_results/' + self.qdescr['ft_name'],
-            '/', newname=self.qdescr['ft_name'],
-            overwrite=True)
-        self.completed = True
+        self.poll_timer.stop()
+        for process in self.processes:
+            process.join()
+        if all(self.part_results.values()):
+            try:
+                self.addResult()
+            except (tables.NodeError, tables.HDF5ExtError, OSError):
+                vitables.utils.formatExceptionInfo()
+            else:
+                self.completed = True
+                if self.cached_path is None and self.cache_key is not None:
+                    self.cacheResult()
+        self.cleanup()
+        self.query_completed.emit(self.completed, self.table_uid)
+
 
+    def addResult(self):
+        """Merge the result tables in the temporary database.
 
-    def queryWithNoIndex(self, src_dict):
-        """Do the query (`PyTables` level).
+        The result table of the first partition is copied and the rest of
+        result tables are appended to it in row order.
         """
 
-        # The query range is made of numpy scalars with dtype int64
-        (start, stop, step) = self.qdescr['rows_range']
-        chunk_size = 10000
-        div = int((stop - start) // chunk_size)
-
-        # Create the destination table
-        f_table = self.tmp_h5file.create_table(
-            '/_p_query_results',
-            self.qdescr['ft_name'],
-            src_dict,
-            self.qdescr['title'])
-
-        # Get the array of rows that fulfill the condition
-        # Selection is done in several steps. It saves a *huge*
-        # amount of memory when querying large tables
-        for i in np.arange(0, div+1):
-            QtWidgets.QApplication.processEvents()
-            lstart = start + chunk_size*i
-            lstart = min(lstart, stop)
-            lstop = lstart + chunk_size
-            lstop = min(lstop, stop)
-            selection = self.table.read_where(
-                self.qdescr['condition'],
-                self.qdescr['condvars'],
-                start=lstart, stop=lstop, step=step)
-            f_table.append(selection)
-            self.flushTable(f_table)
-
-        # Move the intermediate table to its final destination
+        ft_name = self.qdescr['ft_name']
+        hidden_group = self.tmp_h5file.get_node('/_p_query_results')
+        if self.coordinates_only:
+            self.addCoordinates(hidden_group)
+            return
+        f_table = None
+        for result_path in self.result_paths:
+            with tables.open_file(result_path, 'r') as result_file:
+                part_table = result_file.get_node('/', ft_name)
+                if f_table is None:
+                    f_table = part_table.copy(hidden_group, ft_name,
+                                              overwrite=True)
+                    continue
+                for start in range(0, part_table.nrows,
+                                   queryworker.CHUNK_ROWS):
+                    f_table.append(part_table.read(
+                        start, start + queryworker.CHUNK_ROWS))
+        f_table.flush()
+        self.publishResult()
+
+
+    def addCoordinates(self, hidden_group):
+        """Store the coordinates of the selected rows in the temporary
+        database.
+
+        :Parameter hidden_group: the group where the result is stored
+          until it is complete
+        """
+
+        ft_name = self.qdescr['ft_name']
+        if ft_name in hidden_group:
+            self.tmp_h5file.remove_node(hidden_group, ft_name)
+        selected = self.tmp_h5file.create_earray(
+            hidden_group, ft_name, tables.Int64Atom(), (0,),
+            self.qdescr['title'], expectedrows=max(self.nrows // 100, 1))
+        for chunk in self.coordinateChunks():
+            selected.append(chunk)
+        queryworker.setQueryAttributes(selected, self.qdescr)
+        selected.attrs.query_coordinates = True
+        # The name of the column of indices used when the rows are stored
+        selected.attrs.query_indices_field = \
+            self.qdescr['indices_field_name']
+        selected.flush()
+        self.publishResult()
+
+
+    def publishResult(self):
+        """Move the complete result to the root of the temporary database.
+        """
+
+        ft_name = self.qdescr['ft_name']
         self.tmp_h5file.move_node(
-            '/_p_query_results/' + self.qdescr['ft_name'],
-            '/', newname=self.qdescr['ft_name'],
+            '/_p_query_results/' + ft_name, '/', newname=ft_name,
             overwrite=True)
-        self.completed = True
+        self.tmp_h5file.flush()
+
 
+    def coordinateChunks(self):
+        """The coordinates of the selected rows in row order.
 
-    def queryTable(self):
-        """Do the query (`PyTables` level).
+        They are read from the cached result (if any) or from the files of
+        the workers.
         """
 
+        if self.cached_path is not None:
+            cached = np.load(self.cached_path, mmap_mode='r')
+            for start in range(0, len(cached), queryworker.CHUNK_ROWS):
+                yield np.array(cached[start:start + queryworker.CHUNK_ROWS])
+            return
+        for result_path in self.result_paths:
+            with tables.open_file(result_path, 'r') as result_file:
+                selected = result_file.get_node('/_p_coordinates')
+                for start in range(0, selected.nrows,
+                                   queryworker.CHUNK_ROWS):
+                    yield selected.read(start,
+                                        start + queryworker.CHUNK_ROWS)
+
+
+    def cacheResult(self):
+        """Save the coordinates of the selected rows in the cache."""
+
+        nrows = self.tmp_h5file.get_node('/', self.qdescr['ft_name']).nrows
         try:
-            src_dict = self.table.description._v_colobjects
-            # Add an `indexes` column to the result table
-            if self.qdescr['indices_field_name']:
-                self.queryWithIndex(src_dict)
-            # Do no add an `indexes` column to the result table
-            else:
-                self.queryWithNoIndex(src_dict)
-        except KeyError:
+            querycache.getQueryCache().save(self.cache_key, nrows,
+                                            self.coordinateChunks())
+        except (tables.NoSuchNodeError, tables.HDF5ExtError):
             vitables.utils.formatExceptionInfo()
-            self.tmp_h5file.remove_node(
-                '/_p_query_results/' + self.qdescr['ft_name'])
-        else:
-            self.tmp_h5file.flush()
+
+
+    def cleanup(self):
+        """Remove the files of the worker processes and the coordinates
+        given by the caller (if any).
+        """
+
+        if self.messages is not None:
+            self.messages.close()
+            self.messages = None
+        if 'coordinates_path' in self.qdescr:
+            self.result_paths.append(self.qdescr.pop('coordinates_path'))
+        for result_path in self.result_paths:
+            try:
+                os.remove(result_path)
+            except OSError:
+                pass
+        self.result_paths = []
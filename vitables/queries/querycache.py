@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module caches the results of queries on disk.
+
+The coordinates of the rows selected by a query are saved in a `numpy` file
+whose name is derived from the query key: the state of the source file
+(size and modification time), the queried table, the condition, the
+condition variables and the range of rows. Queries made again on an
+unchanged file just read the selected rows instead of scanning the table.
+
+Cached results are evicted, least recently used first, when the cache
+grows beyond its disk budget.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+from qtpy import QtCore
+
+__docformat__ = 'restructuredtext'
+
+log = logging.getLogger(__name__)
+
+#: The disk space (in bytes) used by the cached results.
+CACHE_MAX_BYTES = 2**30
+
+
+def queryKey(qdescr):
+    """The key of a query in the cache.
+
+    :Parameter qdescr: the description of the query with condition
+      variables mapped to the pathnames of the table columns (see
+      `query.Query.workerDescription`)
+
+    :Returns: a string or None if the source file cannot be found
+    """
+
+    filepath = os.path.abspath(qdescr['src_filepath'])
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return json.dumps([
+        filepath, stat.st_size, stat.st_mtime_ns, qdescr['src_path'],
+        qdescr['condition'], sorted(qdescr['condvars'].items()),
+        [int(value) for value in qdescr['rows_range']]])
+
+
+class QueryCache:
+    """A disk cache of the coordinates selected by queries.
+
+    :Parameters:
+
+    - `directory`: the directory where results are saved
+    - `max_bytes`: the disk space used by the cached results
+    """
+
+    def __init__(self, directory, max_bytes=CACHE_MAX_BYTES):
+        """Setup the cache."""
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entryPath(self, key):
+        """The file where the result of a query is saved.
+
+        :Parameter key: the query key
+        """
+
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.npy')
+
+    def lookup(self, key):
+        """Find the cached result of a query.
+
+        The result becomes the most recently used one.
+
+        :Parameter key: the query key (None for queries never cached)
+
+        :Returns: the path of the cached coordinates or None if missing
+        """
+
+        if key is None:
+            return None
+        path = self.entryPath(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def save(self, key, nrows, chunks):
+        """Save the result of a query.
+
+        Errors are logged but not raised because queries can always be
+        made again.
+
+        :Parameters:
+
+        - `key`: the query key (None for queries never cached)
+        - `nrows`: the number of selected rows
+        - `chunks`: an iterable of arrays with the coordinates of the
+          selected rows in row order
+        """
+
+        if key is None or nrows * 8 > self.max_bytes:
+            return
+        path = self.entryPath(key)
+        tmp_path = f'{path}.part'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            coordinates = np.lib.format.open_memmap(
+                tmp_path, mode='w+', dtype=np.int64, shape=(int(nrows),))
+            first = 0
+            for chunk in chunks:
+                coordinates[first:first + len(chunk)] = chunk
+                first += len(chunk)
+            coordinates.flush()
+            del coordinates
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.error(f'The query result cannot be cached: {e}')
+            return
+        finally:
+            # Interrupted saves leave no partial results behind
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used results beyond the disk budget."""
+
+        try:
+            entries = sorted(
+                (entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith('.npy'))
+        except OSError:
+            return
+        used = sum(size for (_, size, _) in entries)
+        for (_, size, path) in entries:
+            if used <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            used -= size
+
+
+_cache = None
+
+
+def getQueryCache():
+    """Return the query result cache, creating it if needed.
+
+    Results are saved in the cache directory of the application.
+    """
+
+    global _cache
+    if _cache is None:
+        cache_dir = QtCore.QStandardPaths.writableLocation(
+            QtCore.QStandardPaths.CacheLocation)
+        _cache = QueryCache(os.path.join(cache_dir, 'queries'))
+    return _cache
@@ -22,7 +22,12 @@
 This module provides a dialog for querying (filtering) `tables.Table` nodes.
 The result of the query is stored in other `tables.Table` node, referred as a
 filtered table, which will live in the temporary database (labeled as `Query
-results` in the databases tree).
+results` in the databases tree). Optionally only the coordinates of the
+selected rows are stored.
+
+The dialog shows the plan of the query, i.e. whether column indexes will be
+used or the range of rows will be scanned, and offers to index the columns
+used by the condition.
 """
 
 import logging
@@ -33,6 +38,8 @@ from qtpy import QtCore, QtGui, QtWidgets
 from qtpy.uic import loadUiType
 
 import vitables.utils
+from vitables.queries import indexing
+from vitables.vttables import readahead, sorting
 
 __docformat__ = 'restructuredtext'
 
@@ -61,7 +68,9 @@ class QueryDlg(QtWidgets.QDialog, Ui_QueryDialog):
         root
             label + textbox
             checkbox + label + textbox
+            checkbox
             text box
+            label + button
             combobox + combobox + combobox
             label + textbox
             label + textbox
@@ -93,6 +102,11 @@ class QueryDlg(QtWidgets.QDialog, Ui_QueryDialog):
         self.condvars = info['condvars']
         self.source_table = table
         self.num_rows = info['nrows']
+        # The plan of the current condition and the job indexing its
+        # columns (if any)
+        self.plan = None
+        self.index_job = None
+        self.index_progress = None
 
         #
         # Attributes used by slot composeQuery
@@ -105,6 +119,7 @@ class QueryDlg(QtWidgets.QDialog, Ui_QueryDialog):
         self.query_info['rows_range'] = ()
         self.query_info['ft_name'] = ''
         self.query_info['indices_field_name'] = ''
+        self.query_info['coordinates_only'] = False
         self.query_info['condvars'] = self.condvars
         self.query_info['src_filepath'] = info['src_filepath']
         self.query_info['src_path'] = info['src_path']
@@ -158,6 +173,17 @@ class QueryDlg(QtWidgets.QDialog, Ui_QueryDialog):
         #
         self.buttonBox.helpRequested.connect(
             QtWidgets.QWhatsThis.enterWhatsThisMode)
+        index_menu = QtWidgets.QMenu(self.indexButton)
+        index_menu.addAction(
+            translate('QueryDlg', 'Completely sorted index (CSI)',
+                      'A kind of index'), lambda: self.indexColumns('csi'))
+        index_menu.addAction(
+            translate('QueryDlg', 'Full index', 'A kind of index'),
+            lambda: self.indexColumns('full'))
+        self.indexButton.setMenu(index_menu)
+        for editor in (self.queryLE, self.rstartLE, self.rstopLE, self.rstep):
+            editor.textChanged.connect(self.updatePlan)
+        self.updatePlan()
         # Ensure that if the condition line edit is initialised with an
         # initial condition then the OK button will be enabled
         self.nameLE.textChanged.emit(self.nameLE.text())
@@ -338,6 +364,10 @@ class QueryDlg(QtWidgets.QDialog, Ui_QueryDialog):
                               """stop value.""",
                               'A logger info message'))
 
+        # Queries wait until the columns are indexed
+        if self.index_job is not None:
+            status_ok = False
+
         # Enable/disable the OK button
         ok_button = self.buttonBox.button(QtWidgets.QDialogButtonBox.Ok)
         if status_ok:
@@ -345,6 +375,143 @@ class QueryDlg(QtWidgets.QDialog, Ui_QueryDialog):
         else:
             ok_button.setEnabled(0)
 
+    def updatePlan(self):
+        """Describe how the query will be made.
+
+        The plan is updated every time the condition or the range of rows
+        change. Conditions being typed are usually incomplete, in which
+        case no plan is shown.
+        """
+
+        self.plan = None
+        self.indexButton.setEnabled(False)
+        if self.index_job is not None:
+            self.planLabel.setText(translate(
+                'QueryDlg', 'Indexing columns...', 'The query plan'))
+            return
+        condition = self.queryLE.text().strip()
+        if not condition:
+            self.planLabel.setText('')
+            return
+        try:
+            rows_range = (int(self.rstartLE.text()),
+                          int(self.rstopLE.text()),
+                          max(int(self.rstep.text() or 1), 1))
+        except ValueError:
+            rows_range = None
+
+        # The file is not read while indexes are being built
+        if not readahead.HDF5_LOCK.acquire(blocking=False):
+            self.planLabel.setText(translate(
+                'QueryDlg', 'The file is busy, the query plan is not '
+                'available.', 'The query plan'))
+            return
+        try:
+            self.plan = indexing.queryPlan(self.source_table, condition,
+                                           self.condvars, rows_range)
+        except Exception:
+            self.planLabel.setText('')
+            return
+        finally:
+            readahead.HDF5_LOCK.release()
+
+        plan = self.plan
+        if plan.indexed:
+            text = translate(
+                'QueryDlg', 'Indexed query: the indexes of {0} are used and '
+                'just the selected rows are read.', 'The query plan').format(
+                    ', '.join(plan.indexed))
+        else:
+            text = translate(
+                'QueryDlg', 'Full scan: {0} rows ({1:.1f} MB) are read.',
+                'The query plan').format(plan.nrows, plan.nbytes / 2**20)
+        if plan.unindexed:
+            text = ' '.join([text, translate(
+                'QueryDlg', 'Columns with no index: {0}.',
+                'The query plan').format(', '.join(plan.unindexed))])
+            if all(sorting.canIndex(self.source_table, name)
+                   for name in plan.unindexed):
+                self.indexButton.setEnabled(True)
+            else:
+                text = ' '.join([text, translate(
+                    'QueryDlg', 'They cannot be indexed because the file is '
+                    'read-only.', 'The query plan')])
+        self.planLabel.setText(text)
+
+    def indexColumns(self, kind):
+        """Index in background the columns of the condition with no index.
+
+        :Parameter kind: 'csi' for completely sorted indexes, 'full' for
+          full indexes
+        """
+
+        if self.plan is None or not self.plan.unindexed:
+            return
+        columns = self.plan.unindexed
+        if kind == 'csi':
+            job = indexing.createIndexJob(self.source_table, columns, 'csi')
+        else:
+            job = indexing.createIndexJob(self.source_table, columns,
+                                          'create', kind=kind)
+        if job is None:
+            return
+        self.index_job = job
+        self.index_progress = QtWidgets.QProgressDialog(
+            translate('QueryDlg', 'Indexing columns...',
+                      'The indexing progress label'),
+            translate('QueryDlg', 'Cancel', 'Button text'),
+            0, len(columns), self)
+        self.index_progress.setWindowTitle(translate(
+            'QueryDlg', 'Indexing {0}', 'The indexing progress title').format(
+                self.source_table._v_pathname))
+        self.index_progress.setWindowModality(QtCore.Qt.WindowModal)
+        self.index_progress.setAutoClose(False)
+        self.index_progress.setAutoReset(False)
+        self.index_progress.setMinimumDuration(0)
+        self.index_progress.canceled.connect(job.cancel)
+        job.progress.connect(self.indexingProgress)
+        job.job_finished.connect(self.columnsIndexed)
+        job.start()
+        self.updatePlan()
+        self.updateOKState()
+
+    def indexingProgress(self, done, colname):
+        """Show the progress of the indexing job.
+
+        :Parameters:
+
+        - `done`: the number of indexed columns
+        - `colname`: the column being indexed
+        """
+
+        if self.index_progress is None or \
+                self.index_progress.wasCanceled():
+            return
+        self.index_progress.setValue(done)
+        if colname:
+            self.index_progress.setLabelText(translate(
+                'QueryDlg', 'Indexing column {0} ({1} of {2})...',
+                'The indexing progress label').format(
+                    colname, done + 1, self.index_progress.maximum()))
+
+    def columnsIndexed(self, error):
+        """Update the query plan once the indexing job is done.
+
+        :Parameter error: the error raised by the job (if any)
+        """
+
+        if error:
+            log.error(translate(
+                'QueryDlg', 'The columns cannot be indexed: {0}',
+                'An indexing error').format(error))
+        self.index_job = None
+        if self.index_progress is not None:
+            self.index_progress.reset()
+            self.index_progress.deleteLater()
+            self.index_progress = None
+        self.updatePlan()
+        self.updateOKState()
+
     def checkConditionSyntax(self, condition):
         """Check the condition syntax.
 
@@ -353,7 +520,9 @@ class QueryDlg(QtWidgets.QDialog, Ui_QueryDialog):
 
         syntax_ok = True
         try:
-            self.source_table.will_query_use_indexing(condition, self.condvars)
+            with readahead.HDF5_LOCK:
+                self.source_table.will_query_use_indexing(condition,
+                                                          self.condvars)
         except SyntaxError as error:
             syntax_ok = False
             log.error(error.__doc__)
@@ -393,6 +562,8 @@ class QueryDlg(QtWidgets.QDialog, Ui_QueryDialog):
         if self.indicesColumnLE.isEnabled():
             self.query_info['indices_field_name'] = \
                 self.indicesColumnLE.text()
+        self.query_info['coordinates_only'] = \
+            self.coordinatesCheckBox.isChecked()
 
         # Get the range and convert it into a Python range
         self.query_info['rows_range'] = (
@@ -25,15 +25,24 @@ The manager tracks the existing filtered tables and their names, launches the
 Query dialog and executes the queries at low level (i.e. `PyTables` level).
 It also keeps a description of the last executed query and tracks the tables
 currently being queried, in order to ensure that no more than 1 query at a time
-is executed on a given table.
+is executed on a given table. The progress of every running query is shown
+in a dialog from where the query can be cancelled.
+
+Query results made of the coordinates of the selected rows are displayed by
+reading the rows from the queried table. They can be materialized i.e. the
+selected rows can be stored in a new table.
 """
 
 import logging
+import os
+import tempfile
 
+import numpy as np
+import tables
 from qtpy import QtCore, QtWidgets
 
 import vitables.utils
-from vitables.queries import query, querydlg
+from vitables.queries import query, querydlg, queryworker
 
 __docformat__ = 'restructuredtext'
 
@@ -123,10 +132,10 @@ def getTableInfo(table):
 class QueriesManager(QtCore.QObject):
     """This is the class in charge of the execution of queries.
 
-    `PyTables` doesn't support threaded queries. So when several queries are
-    requested to ``ViTables`` they will be executed sequentially.
+    Queries are executed in worker processes (see `query.Query`) so several
+    queries can run at the same time while the GUI keeps responsive.
 
-    Also no more than one query can be made at the same time on a given table.
+    No more than one query can be made at the same time on a given table.
     This goal is achieved in a very simple way: tracking the tables currently
     being queried in a data structure (a dictionary at present).
 
@@ -154,6 +163,8 @@ class QueriesManager(QtCore.QObject):
         self.counter = 0
         # The list of query names currently in use
         self.ft_names = []
+        # The running queries and their progress dialogs by table UID
+        self.running = {}
 
         self.vtapp = vitables.utils.getVTApp()
         self.vtgui = self.vtapp.gui
@@ -171,6 +182,12 @@ class QueriesManager(QtCore.QObject):
         node = self.dbt_model.nodeFromIndex(current)
         table_uid = node.as_record
         table = node.node
+        if table_uid in self.running:
+            log.info(
+                translate('QueriesManager',
+                          "Table {0} is already being queried.",
+                          'Info message for users').format(table_uid))
+            return
 
         table_info = getTableInfo(table)
         if table_info is None:
@@ -189,14 +206,168 @@ class QueriesManager(QtCore.QObject):
                            query_description['src_path'],
                            query_description['condition']]
 
-        # Run the query
+        self.startQuery(table_uid, table, query_description)
+
+    def startQuery(self, table_uid, table, query_description):
+        """Run a query showing its progress.
+
+        :Parameters:
+
+        - `table_uid`: the UID of the table being queried
+        - `table`: the `tables.Table` being queried
+        - `query_description`: the description of the query
+        """
+
         tmp_h5file = self.dbt_model.tmp_dbdoc.h5file
         new_query = query.Query(tmp_h5file, table_uid, table,
                                 query_description)
         new_query.query_completed.connect(self.addQueryResult)
-        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        progress_dlg = QtWidgets.QProgressDialog(
+            translate('QueriesManager', 'Querying {0}...',
+                      'The query progress label').format(
+                          query_description['title']),
+            translate('QueriesManager', 'Cancel', 'Button text'),
+            0, 100, self.vtgui)
+        progress_dlg.setWindowTitle(
+            translate('QueriesManager', 'Query {0}',
+                      'The query progress title').format(
+                          query_description['ft_name']))
+        progress_dlg.setAutoClose(False)
+        progress_dlg.setAutoReset(False)
+        progress_dlg.setMinimumDuration(500)
+        progress_dlg.canceled.connect(new_query.cancel)
+        new_query.progress.connect(self.updateProgress)
+        self.running[table_uid] = (new_query, progress_dlg)
         new_query.run()
 
+    def sourceTable(self, coordinates):
+        """The table queried for a result made of row coordinates.
+
+        :Parameter coordinates: the `tables.EArray` with the coordinates of
+          the selected rows
+
+        :Returns: the queried `tables.Table` or None if it is not available
+        """
+
+        asi = coordinates.attrs
+        db_doc = self.dbt_model.getDBDoc(asi.query_path)
+        table = None
+        if db_doc is not None:
+            try:
+                table = db_doc.h5file.get_node(asi.query_table)
+            except tables.NoSuchNodeError:
+                pass
+        if not isinstance(table, tables.Table):
+            log.error(
+                translate('QueriesManager',
+                          'The table {0} of file {1} queried by {2} is not '
+                          'available. Open the file, please.',
+                          'A logger error message').format(
+                              asi.query_table, asi.query_path,
+                              coordinates._v_name))
+            return None
+        if coordinates.nrows and coordinates[-1] >= table.nrows:
+            log.error(
+                translate('QueriesManager',
+                          'The table {0} has changed since it was queried '
+                          'by {1}.', 'A logger error message').format(
+                              asi.query_table, coordinates._v_name))
+            return None
+        return table
+
+    def materializeQuery(self):
+        """Store the rows selected by a query in a new table.
+
+        The current node is a query result made of the coordinates of the
+        selected rows. They are saved in a file read by the worker
+        processes so the query condition is not evaluated again.
+        """
+
+        current = self.dbt_view.currentIndex()
+        coordinates = self.dbt_model.nodeFromIndex(current).node
+        table = self.sourceTable(coordinates)
+        if table is None:
+            return
+        table_uid = f'{table._v_file.filename}->{table._v_pathname}'
+        if table_uid in self.running:
+            log.info(
+                translate('QueriesManager',
+                          "Table {0} is already being queried.",
+                          'Info message for users').format(table_uid))
+            return
+
+        tmp_h5file = self.dbt_model.tmp_dbdoc.h5file
+        (handle, coordinates_path) = tempfile.mkstemp(
+            suffix='.npy', prefix='coordinates_',
+            dir=os.path.dirname(tmp_h5file.filename))
+        os.close(handle)
+        nrows = coordinates.nrows
+        try:
+            selected = np.lib.format.open_memmap(
+                coordinates_path, mode='w+', dtype=np.int64,
+                shape=(int(nrows),))
+            for start in range(0, nrows, queryworker.CHUNK_ROWS):
+                selected[start:start + queryworker.CHUNK_ROWS] = \
+                    coordinates.read(start, start + queryworker.CHUNK_ROWS)
+            selected.flush()
+            del selected
+        except (OSError, tables.HDF5ExtError):
+            os.remove(coordinates_path)
+            vitables.utils.formatExceptionInfo()
+            return
+
+        # The rows are stored in a table with the default name of queries
+        self.counter = self.counter + 1
+        while f'FilteredTable_{self.counter}' in self.ft_names:
+            self.counter = self.counter + 1
+        asi = coordinates.attrs
+        rows_range = (0, 0, 1)
+        if nrows:
+            rows_range = (int(coordinates[0]), int(coordinates[-1]) + 1, 1)
+        query_description = {
+            'condition': asi.query_condition, 'rows_range': rows_range,
+            'ft_name': f'FilteredTable_{self.counter}',
+            'indices_field_name': getattr(asi, 'query_indices_field', ''),
+            'condvars': {}, 'src_filepath': asi.query_path,
+            'src_path': asi.query_table, 'title': asi.query_condition,
+            'coordinates_path': coordinates_path}
+        self.ft_names.append(query_description['ft_name'])
+        self.startQuery(table_uid, table, query_description)
+
+    def updateProgress(self, scanned, matched):
+        """Show the progress of a running query.
+
+        :Parameters:
+
+        - `scanned`: the number of rows scanned so far
+        - `matched`: the number of rows matched so far
+        """
+
+        running_query = self.sender()
+        progress_dlg = self.running[running_query.table_uid][1]
+        if progress_dlg.wasCanceled():
+            return
+        progress_dlg.setValue(
+            100 * scanned // max(running_query.nrows, 1))
+        progress_dlg.setLabelText(
+            translate('QueriesManager',
+                      'Querying {0}...\n{1} of {2} rows scanned, '
+                      '{3} rows selected',
+                      'The query progress label').format(
+                          running_query.qdescr['title'], scanned,
+                          running_query.nrows, matched))
+
+    def cancelAllQueries(self):
+        """Stop the running queries without adding their results."""
+
+        for (running_query, progress_dlg) in self.running.values():
+            running_query.query_completed.disconnect(self.addQueryResult)
+            running_query.abort()
+            progress_dlg.reset()
+            progress_dlg.deleteLater()
+            self.ft_names.remove(running_query.qdescr['ft_name'])
+        self.running = {}
+
     def getQueryInfo(self, info, table):
         """Retrieves useful info about the query.
 
@@ -277,9 +448,10 @@ class QueriesManager(QtCore.QObject):
             index = self.dbt_model.index(row, 0, tmp_index)
             self.vtapp.nodeDelete(index, force=True)
 
-        # Reset the queries manager
+        # Reset the queries manager. Running queries keep their names
         self.counter = 0
-        self.ft_names = []
+        self.ft_names = [running_query.qdescr['ft_name']
+                         for (running_query, _) in self.running.values()]
 
     def addQueryResult(self, completed, table_uid):
         """Update the GUI once the query has finished.
@@ -293,8 +465,18 @@ class QueriesManager(QtCore.QObject):
         - `table_uid`: the UID of the table just queried
         """
 
-        QtWidgets.QApplication.restoreOverrideCursor()
+        (finished_query, progress_dlg) = self.running.pop(table_uid)
+        progress_dlg.reset()
+        progress_dlg.deleteLater()
         if not completed:
+            # The query name can be used again
+            self.ft_names.remove(finished_query.qdescr['ft_name'])
+            if finished_query.cancelled:
+                log.info(translate('QueriesManager',
+                                   'Query on table {0} cancelled.',
+                                   'Info message for users').format(
+                                       table_uid))
+                return
             log.error(translate('QueriesManager',
                                 'Query on table {0} failed!',
                                 'Warning log message about a failed '
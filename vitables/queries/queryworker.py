@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module scans queried tables in a worker process.
+
+The range of queried rows is split in partitions (see `partitionRange`)
+scanned in parallel by several worker processes. Every worker opens the
+source file read-only and writes the query results of its partition to a
+file of its own, so it never shares a `PyTables` file with the GUI process
+or with other workers. Progress is reported through a queue of messages:
+
+- ``('progress', part, scanned, matched)`` after every chunk of rows
+- ``('finished', part, completed, error)`` when the worker is done
+
+When the result is cached (see `querycache`) or is just the coordinates of
+the selected rows, workers also save those coordinates. Otherwise the
+selected rows of tables whose indexes are not used by the query are appended
+to the result table as they are found, without collecting their coordinates.
+The rows selected by cached results are read without evaluating the
+condition. Queries whose result are just the coordinates of the selected
+rows store no rows at all.
+
+This module doesn't depend on Qt so worker processes start quickly.
+"""
+
+import os
+import traceback
+
+import numpy as np
+import tables
+
+__docformat__ = 'restructuredtext'
+
+#: The number of selected rows scanned at once.
+CHUNK_ROWS = 100000
+
+#: The minimum number of selected rows scanned by a worker process. Smaller
+#: scans don't pay off the start of a process.
+MIN_PARTITION_ROWS = 2**20
+
+#: The default number of worker processes of a query.
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def rangeChunks(start, stop, step, rows):
+    """Split a range of rows in chunks.
+
+    Every chunk starts on a row of the range so chunks can be scanned with
+    the step of the range.
+
+    :Parameters:
+
+    - `start`: the first row of the range
+    - `stop`: the row where the range stops (not included)
+    - `step`: the step of the range
+    - `rows`: the number of rows of the range in every chunk
+
+    :Returns: an iterator of ``(start, stop)`` ranges
+    """
+
+    size = rows * step
+    for lstart in range(start, stop, size):
+        yield lstart, min(lstart + size, stop)
+
+
+def partitionRange(start, stop, step, parts, align=1):
+    """Split a range of rows in partitions scanned by different workers.
+
+    Every partition starts on a row of the range. All the partitions but
+    the last one contain the same number of rows of the range, a multiple
+    of `align`.
+
+    :Parameters:
+
+    - `start`: the first row of the range
+    - `stop`: the row where the range stops (not included)
+    - `step`: the step of the range
+    - `parts`: the maximum number of partitions
+    - `align`: the number of rows of the range partitions are aligned to,
+      usually the rows of a chunk of the table
+
+    :Returns: a list of ``(start, stop)`` ranges in row order
+    """
+
+    nrows = len(range(start, stop, step))
+    size = -(-nrows // max(parts, 1))
+    size = max(-(-size // align) * align, 1)
+    return [(start + first * step, min(start + (first + size) * step, stop))
+            for first in range(0, nrows, size)]
+
+
+def scanTable(table, result_file, qdescr, report, cancelled):
+    """Query a table and store the result in a new table.
+
+    :Parameters:
+
+    - `table`: the `tables.Table` being queried
+    - `result_file`: the `tables.File` where the result table is created
+    - `qdescr`: the description of the query. Condition variables are
+      mapped to the pathnames of the table columns. If the result is cached
+      ``coordinates_path`` is the file with the selected coordinates. If
+      ``coordinates_only`` is True no result table is created, just the
+      coordinates of the selected rows are stored. They are stored too if
+      ``keep_coordinates`` is True
+    - `report`: a callable called with the rows scanned and matched so far
+    - `cancelled`: a callable that returns True if the query is cancelled
+
+    :Returns: True if the query has been completed
+    """
+
+    (start, stop, step) = (int(value) for value in qdescr['rows_range'])
+    condition = qdescr['condition']
+    condvars = dict((name, table.cols._f_col(path))
+                    for (name, path) in qdescr['condvars'].items())
+    indices_name = qdescr['indices_field_name']
+
+    f_table = None
+    if not qdescr.get('coordinates_only', False):
+        # The first column of the result table can contain the indices of
+        # the rows selected in the source table. Int64 values are necessary
+        # to keep full 64-bit indices
+        ft_dict = {}
+        if indices_name:
+            ft_dict[indices_name] = tables.Int64Col(pos=-1)
+        ft_dict.update(table.description._v_colobjects)
+        f_table = result_file.create_table('/', qdescr['ft_name'], ft_dict,
+                                           qdescr['title'])
+    cached = qdescr.get('coordinates_path')
+    selected = None
+    if cached is not None:
+        cached = np.load(cached, mmap_mode='r')
+    elif f_table is None or qdescr.get('keep_coordinates', False):
+        selected = result_file.create_earray(
+            '/', '_p_coordinates', tables.Int64Atom(), (0,),
+            expectedrows=max(len(range(start, stop, step)) // 100, 1))
+    # Rows can be copied without their coordinates as they are found
+    streamed = cached is None and selected is None and not indices_name \
+        and not table.will_query_use_indexing(condition, condvars)
+
+    # Selection is done in several steps. It saves a *huge* amount of
+    # memory when querying large tables
+    scanned = matched = 0
+    for (lstart, lstop) in rangeChunks(start, stop, step, CHUNK_ROWS):
+        if cancelled():
+            return False
+        scanned += len(range(lstart, lstop, step))
+        if streamed:
+            matched += table.append_where(f_table, condition, condvars,
+                                          start=lstart, stop=lstop,
+                                          step=step)
+            report(scanned, matched)
+            continue
+        if cached is None:
+            coordinates = table.get_where_list(
+                condition, condvars, start=lstart, stop=lstop, step=step,
+                sort=True)
+            if selected is not None:
+                selected.append(coordinates)
+        else:
+            coordinates = np.array(cached[
+                np.searchsorted(cached, lstart):
+                np.searchsorted(cached, lstop)])
+        if f_table is not None and coordinates.size:
+            selection = table.read_coordinates(coordinates)
+            if indices_name:
+                new_buffer = np.empty(selection.shape, dtype=f_table.dtype)
+                for field in selection.dtype.names:
+                    new_buffer[field] = selection[field]
+                new_buffer[indices_name] = coordinates
+                f_table.append(new_buffer)
+            else:
+                f_table.append(selection)
+        matched += len(coordinates)
+        report(scanned, matched)
+
+    if f_table is not None:
+        # Set some user attributes that define this filtered table
+        setQueryAttributes(f_table, qdescr)
+        f_table.flush()
+    return True
+
+
+def setQueryAttributes(node, qdescr):
+    """Set the user attributes that define the result of a query.
+
+    :Parameters:
+
+    - `node`: the node where the query result is stored
+    - `qdescr`: the description of the query
+    """
+
+    asi = node.attrs
+    asi.query_path = qdescr['src_filepath']
+    asi.query_table = qdescr['src_path']
+    asi.query_condition = qdescr['title']
+
+
+def runQuery(qdescr, result_path, part, messages, cancel_event):
+    """Run a query in a worker process.
+
+    :Parameters:
+
+    - `qdescr`: the description of the query (see `scanTable`) with the
+      range of rows of the partition scanned by this worker
+    - `result_path`: the path of the file where the result table is stored
+    - `part`: the number of the partition scanned by this worker
+    - `messages`: the queue where progress messages are put
+    - `cancel_event`: the event set when the query is cancelled
+    """
+
+    def report(scanned, matched):
+        """Report the progress of the worker."""
+        messages.put(('progress', part, scanned, matched))
+
+    try:
+        with tables.open_file(qdescr['src_filepath'], 'r') as h5file, \
+                tables.open_file(result_path, 'w') as result_file:
+            table = h5file.get_node(qdescr['src_path'])
+            completed = scanTable(table, result_file, qdescr, report,
+                                  cancel_event.is_set)
+    except Exception:
+        messages.put(('finished', part, False, traceback.format_exc()))
+    else:
+        messages.put(('finished', part, completed, ''))
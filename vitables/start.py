@@ -22,6 +22,7 @@ import argparse
 import atexit
 import locale
 import logging
+import multiprocessing
 import os.path
 import sys
 import traceback
@@ -207,6 +208,8 @@ def gui():
     the events loop is started.
 
     """
+    # Query worker processes of frozen executables start here
+    multiprocessing.freeze_support()
     _check_versions()
     app = QtWidgets.QApplication(sys.argv)
     _set_credentials(app)
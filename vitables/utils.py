@@ -470,6 +470,61 @@ def formatArrayContent(content):
     return ret
 
 
+def formatFloat(value):
+    """
+    Format a float number exactly as `np.array2string` does for 0-d arrays.
+
+    :Parameter value: the float number being formatted
+    """
+
+    magnitude = abs(value)
+    if magnitude >= 1.e8 or 0. < magnitude < 1.e-4:
+        return np.format_float_scientific(value, precision=8, unique=True,
+                                          trim='.')
+    return np.format_float_positional(value, precision=8, unique=True,
+                                      fractional=True, trim='.')
+
+
+def formatArrayColumn(column):
+    """
+    Nicely format the contents of a column of view (table widget) cells.
+
+    This is a vectorised version of :func:`formatArrayContent`: every cell
+    of the column is formatted in the same way but `np.array2string` is not
+    called for every cell. Columns whose kind of contents cannot be
+    vectorised are formatted cell by cell.
+
+    :Parameter column: the ``numpy`` array with the column cells
+
+    :Returns: a list with the formatted cells
+    """
+
+    if not isinstance(column, np.ndarray):
+        return [formatArrayContent(content) for content in column]
+
+    kind = column.dtype.kind
+    strings = None
+    if column.ndim != 1 or not len(column) or column.dtype.names:
+        pass
+    elif kind in 'iub':
+        strings = column.astype(str).tolist()
+    elif kind == 'f':
+        # Comparing half precision floats with 1.e8 overflows harmlessly
+        with np.errstate(over='ignore'):
+            strings = [formatFloat(value) for value in column]
+    elif kind == 'S':
+        try:
+            strings = np.char.decode(column, DEFAULT_ENCODING).tolist()
+        except UnicodeDecodeError:
+            pass
+
+    # If the print options of numpy have been customised the vectorised
+    # formatting may differ from array2string
+    if strings is None or strings[0] != formatArrayContent(column[0]):
+        strings = [formatArrayContent(content) for content in column]
+    return strings
+
+
 def formatObjectContent(content):
     """
     Nicely format the contents of a view (table widget) cell.
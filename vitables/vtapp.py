@@ -42,7 +42,9 @@ import vitables.vtcsv.import_csv as importcsv
 import vitables.vtsplash
 from vitables import vtgui
 from vitables.docbrowser import helpbrowser
+from vitables.nodeprops import statsdlg
 from vitables.preferences import preferences, vtconfig
+from vitables.queries import indexdlg, indexing
 from vitables.vtsite import ICONDIR
 from vitables.vttables import datasheet
 from vitables.vtwidgets import nodenamedlg, renamedlg
@@ -692,11 +694,17 @@ class VTApp(QtCore.QObject):
                 position = row
                 break
 
-        # If some leaf of this database has an open view then close it
+        # If some leaf of this database has an open view then close it.
+        # Views of query results made of coordinates read the queried table
+        # so they are closed too
         for window in self.gui.workspace.subWindowList():
             if hasattr(window, 'dbt_leaf'):
                 if window.dbt_leaf and window.dbt_leaf.filepath == filepath:
                     window.close()
+                elif getattr(getattr(window, 'leaf_model', None),
+                             'coordinates', None) is not None and \
+                        window.leaf_model.leaf._v_file.filename == filepath:
+                    window.close()
 
         # The tree model closes the file and delete its root item
         # from the tree view
@@ -733,6 +741,10 @@ class VTApp(QtCore.QObject):
             self.doc_browser.exitBrowser()
         # Save current configuration
         self.config.saveConfiguration()
+        # Stop the running queries
+        self.queries_mgr.cancelAllQueries()
+        # Stop the index jobs once their current column is processed
+        indexing.cancelJobs()
         # Close every user opened file
         self.fileCloseAll()
         # Close the temporary database
@@ -789,11 +801,15 @@ class VTApp(QtCore.QObject):
         if not vitables.utils.isDataSourceReadable(leaf):
             return
 
+        # Query results made of coordinates are read from the queried table
+        node = self.gui.dbs_tree_model.nodeFromIndex(index)
+        if node.node_kind == 'table (coordinates)' and \
+                self.queries_mgr.sourceTable(leaf) is None:
+            return
+
         # Track filenodes
         if fnutils.isFilenode(leaf) and (leaf not in self.filenodes_map):
-            temp_filenode = fnutils.filenodeToFile(leaf)
-            self.filenodes_map[leaf] = (temp_filenode,
-                                        fnutils.filenodeTotalRows(leaf))
+            self.filenodes_map[leaf] = fnutils.filenodeLineIndex(leaf)
 
         # Create a view
         subwindow = datasheet.DataSheet(index)
@@ -1132,6 +1148,72 @@ class VTApp(QtCore.QObject):
         """Slot for querying tables."""
         self.queries_mgr.newQuery()
 
+    def materializeQuery(self):
+        """Slot for storing the rows selected by a query in a table."""
+        self.queries_mgr.materializeQuery()
+
+    def currentDataSheet(self):
+        """The data sheet of the node selected in the tree of databases.
+
+        :Returns: the data sheet or None if the node has no view
+        """
+
+        pcurrent = QtCore.QPersistentModelIndex(
+            self.gui.dbs_tree_view.currentIndex())
+        for data_sheet in self.gui.workspace.subWindowList():
+            if pcurrent == data_sheet.pindex:
+                return data_sheet
+        return None
+
+    def sliceDataset(self):
+        """Slot for browsing the selected array by 2-D slices."""
+
+        data_sheet = self.currentDataSheet()
+        if data_sheet is not None:
+            data_sheet.showSliceNavigator()
+
+    def goToRow(self):
+        """Slot for making current a given row of the selected dataset."""
+
+        data_sheet = self.currentDataSheet()
+        if data_sheet is not None:
+            data_sheet.goToRow()
+
+    def find(self):
+        """Slot for finding cells of the selected dataset."""
+
+        data_sheet = self.currentDataSheet()
+        if data_sheet is not None:
+            data_sheet.find()
+
+    def findNext(self):
+        """Slot for finding the next cell matching the last search."""
+
+        data_sheet = self.currentDataSheet()
+        if data_sheet is not None:
+            data_sheet.findNext()
+
+    def findPrevious(self):
+        """Slot for finding the previous cell matching the last search."""
+
+        data_sheet = self.currentDataSheet()
+        if data_sheet is not None:
+            data_sheet.findNext(backward=True)
+
+    def datasetStatistics(self):
+        """Slot for displaying the statistics of the selected dataset."""
+
+        current = self.gui.dbs_tree_view.currentIndex()
+        node = self.gui.dbs_tree_model.nodeFromIndex(current)
+        statsdlg.StatsDlg(node.node, self.gui).show()
+
+    def datasetIndexes(self):
+        """Slot for managing the column indexes of the selected table."""
+
+        current = self.gui.dbs_tree_view.currentIndex()
+        node = self.gui.dbs_tree_model.nodeFromIndex(current)
+        indexdlg.IndexDlg(node.node, self.gui).show()
+
     def deleteAllQueries(self):
         """Slot for emptying the `Query results` node."""
         self.queries_mgr.deleteAllQueries()
@@ -32,6 +32,7 @@ import tables
 from vitables import logger
 from vitables.calculator import calculator
 from vitables.h5db import dbstreemodel, dbstreeview, dbdoc
+from vitables.vtwidgets import metrics_panel
 from vitables.common.qcustompyqtconsole import QCustomPyQtConsole
 
 __docformat__ = 'restructuredtext'
@@ -74,6 +75,8 @@ class VTGUI(QtWidgets.QMainWindow):
         self.logger = None
         self.console = None
         self.setup_logger_window()
+        self.metrics_dock = None
+        self.setupMetricsWindow()
         self.setup(vtapp)
 
     def setup(self, vtapp):
@@ -122,6 +125,16 @@ class VTGUI(QtWidgets.QMainWindow):
         stream_handler.setFormatter(logging.Formatter(_GUI_LOG_FORMAT))
         vitables_logger.addHandler(stream_handler)
 
+    def setupMetricsWindow(self):
+        """Add the panel with the performance metrics of views.
+
+        The panel is docked to the right region and hidden by default.
+        """
+
+        self.metrics_dock = metrics_panel.MetricsDock(self)
+        self.addDockWidget(QtCore.Qt.RightDockWidgetArea, self.metrics_dock)
+        self.metrics_dock.hide()
+
     def add_locals(self, data: dict):
         self.console.add_locals(data)
 
@@ -337,6 +350,79 @@ class VTGUI(QtWidgets.QMainWindow):
                 'Status bar text for the Query -> New... action'))
         actions['queryNew'].setObjectName('queryNew')
 
+        actions['queryMaterialize'] = QtWidgets.QAction(
+            translate('VTGUI', '&Materialize', 'Dataset -> Materialize'),
+            self,
+            triggered=self.vtapp.materializeQuery,
+            statusTip=translate(
+                'VTGUI', 'Store the rows selected by a query in a new table',
+                'Status bar text for the Dataset -> Materialize action'))
+        actions['queryMaterialize'].setObjectName('queryMaterialize')
+
+        actions['datasetSlice'] = QtWidgets.QAction(
+            translate('VTGUI', '&Slice...', 'Dataset -> Slice...'), self,
+            triggered=self.vtapp.sliceDataset,
+            statusTip=translate(
+                'VTGUI', 'Browse the selected N-dimensional array by 2-D '
+                'slices', 'Status bar text for the Dataset -> Slice... action'))
+        actions['datasetSlice'].setObjectName('datasetSlice')
+
+        actions['datasetGoToRow'] = QtWidgets.QAction(
+            translate('VTGUI', '&Go to Row...', 'Dataset -> Go to Row...'),
+            self,
+            shortcut=QtGui.QKeySequence('Ctrl+G'),
+            triggered=self.vtapp.goToRow,
+            statusTip=translate(
+                'VTGUI', 'Make current a given row of the selected dataset',
+                'Status bar text for the Dataset -> Go to Row... action'))
+        actions['datasetGoToRow'].setObjectName('datasetGoToRow')
+
+        actions['datasetFind'] = QtWidgets.QAction(
+            translate('VTGUI', '&Find...', 'Dataset -> Find...'), self,
+            shortcut=QtGui.QKeySequence.Find,
+            triggered=self.vtapp.find,
+            statusTip=translate(
+                'VTGUI', 'Find cells of the selected dataset',
+                'Status bar text for the Dataset -> Find... action'))
+        actions['datasetFind'].setObjectName('datasetFind')
+
+        actions['datasetFindNext'] = QtWidgets.QAction(
+            translate('VTGUI', 'Find &Next', 'Dataset -> Find Next'), self,
+            shortcut=QtGui.QKeySequence.FindNext,
+            triggered=self.vtapp.findNext,
+            statusTip=translate(
+                'VTGUI', 'Find the next cell matching the last search',
+                'Status bar text for the Dataset -> Find Next action'))
+        actions['datasetFindNext'].setObjectName('datasetFindNext')
+
+        actions['datasetFindPrevious'] = QtWidgets.QAction(
+            translate('VTGUI', 'Find &Previous', 'Dataset -> Find Previous'),
+            self,
+            shortcut=QtGui.QKeySequence.FindPrevious,
+            triggered=self.vtapp.findPrevious,
+            statusTip=translate(
+                'VTGUI', 'Find the previous cell matching the last search',
+                'Status bar text for the Dataset -> Find Previous action'))
+        actions['datasetFindPrevious'].setObjectName('datasetFindPrevious')
+
+        actions['datasetStatistics'] = QtWidgets.QAction(
+            translate('VTGUI', 'S&tatistics...', 'Dataset -> Statistics...'),
+            self,
+            triggered=self.vtapp.datasetStatistics,
+            statusTip=translate(
+                'VTGUI', 'Display the statistics of the selected dataset',
+                'Status bar text for the Dataset -> Statistics... action'))
+        actions['datasetStatistics'].setObjectName('datasetStatistics')
+
+        actions['datasetIndexes'] = QtWidgets.QAction(
+            translate('VTGUI', '&Indexes...', 'Dataset -> Indexes...'),
+            self,
+            triggered=self.vtapp.datasetIndexes,
+            statusTip=translate(
+                'VTGUI', 'Manage the column indexes of the selected table',
+                'Status bar text for the Dataset -> Indexes... action'))
+        actions['datasetIndexes'].setObjectName('datasetIndexes')
+
         actions['queryDeleteAll'] = QtWidgets.QAction(
             translate('VTGUI', 'Delete &All', 'Query -> Delete All'), self,
             triggered=self.vtapp.deleteAllQueries,
@@ -532,6 +618,9 @@ class VTGUI(QtWidgets.QMainWindow):
         self.sb_node_info.setSizePolicy(QtWidgets.QSizePolicy.MinimumExpanding,
                                         QtWidgets.QSizePolicy.Minimum)
         status_bar.addPermanentWidget(self.sb_node_info)
+        self.sb_metrics = metrics_panel.MetricsLabel(status_bar,
+                                                     self.metrics_dock)
+        status_bar.addPermanentWidget(self.sb_metrics)
         self.sb_node_info.setToolTip(translate(
             'VTGUI', 'The node currently selected in the Tree of '
             'databases pane', 'The Selected node box startup message'))
@@ -587,7 +676,10 @@ class VTGUI(QtWidgets.QMainWindow):
         self.dataset_menu = self.menuBar().addMenu(
             translate('VTGUI', "&Dataset", 'The Dataset menu entry'))
         self.dataset_menu.setObjectName('dataset_menu')
-        dataset_actions = ['queryNew', 'calculate']
+        dataset_actions = ['queryNew', 'queryMaterialize', 'datasetFind', 'datasetFindNext',
+                           'datasetFindPrevious', 'datasetGoToRow',
+                           'datasetSlice', 'datasetStatistics',
+                           'datasetIndexes', 'calculate']
         vitables.utils.addActions(self.dataset_menu, dataset_actions,
                                   self.gui_actions)
 
@@ -663,7 +755,8 @@ class VTGUI(QtWidgets.QMainWindow):
         self.leaf_node_cm.setObjectName('leaf_node_cm')
         actions = ['nodeOpen', 'nodeClose', None, 'nodeProperties', None,
                    'nodeRename', 'nodeCut', 'nodeCopy', 'nodePaste',
-                   'nodeDelete', None, 'queryNew']
+                   'nodeDelete', None, 'queryNew', 'queryMaterialize',
+                   'datasetIndexes']
         vitables.utils.addActions(self.leaf_node_cm, actions, self.gui_actions)
 
         self.mdi_cm = QtWidgets.QMenu(self)
@@ -761,7 +854,12 @@ class VTGUI(QtWidgets.QMainWindow):
                              'nodeOpen', 'nodeClose', 'nodeProperties',
                              'nodeNew', 'nodeRename', 'nodeCut', 'nodeCopy',
                              'nodePaste', 'nodeDelete',
-                             'queryNew', 'queryDeleteAll'])
+                             'queryNew', 'queryMaterialize',
+                             'queryDeleteAll', 'datasetSlice',
+                             'datasetGoToRow', 'datasetStatistics',
+                             'datasetIndexes',
+                             'datasetFind', 'datasetFindNext',
+                             'datasetFindPrevious'])
         enabled = set([])
 
         model_rows = self.dbs_tree_model.rowCount(QtCore.QModelIndex())
@@ -793,7 +891,14 @@ class VTGUI(QtWidgets.QMainWindow):
             kind = node.node_kind
             # If the node is a table --> queryNew is enabled
             if kind == 'table':
-                enabled = enabled.union(['queryNew'])
+                enabled = enabled.union(['queryNew', 'datasetIndexes'])
+            # Rows selected by queries can be stored in a table
+            elif kind == 'table (coordinates)':
+                enabled = enabled.union(['queryMaterialize'])
+
+            # Statistics are computed for tables and homogeneous arrays
+            if kind in ('table', 'array', 'carray', 'earray'):
+                enabled = enabled.union(['datasetStatistics'])
 
             # If the file is not open in read-only mode
             mode = self.dbs_tree_model.getDBDoc(node.filepath).mode
@@ -813,7 +918,17 @@ class VTGUI(QtWidgets.QMainWindow):
 
             if kind not in ('group', 'root group'):
                 if node.has_view:
-                    enabled = enabled.union(['nodeClose'])
+                    enabled = enabled.union(['nodeClose', 'datasetGoToRow'])
+                    # Cells of datasets (but filenodes) can be found
+                    if kind != 'earray (filenode)':
+                        enabled = enabled.union(['datasetFind',
+                                                 'datasetFindNext',
+                                                 'datasetFindPrevious'])
+                    # Opened arrays with more than two dimensions can be
+                    # browsed by slices
+                    if kind in ('array', 'carray', 'earray') and \
+                            len(node.node.shape) > 2:
+                        enabled = enabled.union(['datasetSlice'])
                 else:
                     enabled = enabled.union(['nodeOpen'])
 
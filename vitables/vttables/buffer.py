@@ -24,9 +24,44 @@ This module implements a buffer used to access the real data contained in
 By using this buffer we speed up the access to the stored data. As a
 consequence, views (widgets showing a tabular representation of the dataset)
 are painted much faster too.
+
+Data are read in pages aligned to multiples of their size. Page sizes are
+multiples of the dataset chunkshape (when possible) so reading a page never
+decompresses a chunk that is not fully used, and they depend on the row size
+so that every page holds about `PAGE_BYTES` bytes. Recently read pages are
+kept in a LRU cache shared by every buffer so moving back to an already
+visited region of the dataset (or opening it in other view) doesn't require
+reading it again. If the read-ahead is enabled then the pages around the
+displayed chunk are read in background (see module `readahead`).
+
+Tables with more than `MAX_FIELDS` fields are read by projection: only the
+fields displayed by the view (plus some margin) are kept in the buffer, the
+remaining ones are fetched when they become visible. Arrays with two or more
+dimensions are paged along columns too (in pages of `COLUMN_PAGE_SIZE`
+columns) and only the columns in a given range are kept in the buffer.
+Their rows run along the main dimension, which is moved to the front of the
+pages (as a view) once per read, so `EArrays` enlarged along any axis are
+displayed like any other array and cells are accessed without copies.
+
+Arrays with more than two dimensions can be sliced: two of their axes are
+displayed as rows and columns and the remaining ones are fixed to a given
+index, so only 2-D hyperslabs of the array are read (see `setSlice`).
+
+Pages of `VLArrays` are sized from the average size of a sample of their
+rows and hold raw rows. Rows of pseudo atoms (pickled objects and strings)
+are decoded when they are displayed and the most recently decoded rows are
+kept (see `vlarrayCell`).
+
+Buffers can display the rows of a table selected by a query whose result is
+made of the coordinates of the rows: only the coordinates of the pages being
+read are loaded and the rows are read via `tables.Table.read_coordinates`.
 """
 
+import collections
+import itertools
 import logging
+import sys
+import time
 import warnings
 
 import numpy as np
@@ -34,6 +69,7 @@ import tables
 from qtpy import QtWidgets
 
 from .. import utils as vtutils
+from . import metrics, pagecache, readahead, sorting
 
 __docformat__ = 'restructuredtext'
 
@@ -48,6 +84,50 @@ warnings.filterwarnings('ignore', category=tables.NaturalNameWarning)
 
 log = logging.getLogger(__name__)
 
+#: The maximum number of rows of the pages read from the dataset.
+PAGE_SIZE = 8192
+
+#: The number of columns of the pages read from arrays.
+COLUMN_PAGE_SIZE = 128
+
+#: The amount of memory (in bytes) that pages are sized for.
+PAGE_BYTES = 2 * 2**20
+
+#: Tables with more fields than this are read by projection.
+MAX_FIELDS = 32
+
+#: The number of rows of `VLArrays` read for estimating their row size.
+VL_SAMPLE_ROWS = 64
+
+#: The maximum number of decoded `VLArray` rows kept by a buffer.
+MAX_DECODED_ROWS = 1024
+
+
+def alignSize(size, chunk, limit):
+    """Align a page size to the size of the dataset chunks.
+
+    The size is rounded down to a multiple of the chunk size. If a single
+    chunk is bigger than the page then a whole chunk is used as page unless
+    it is bigger than `limit`.
+
+    :Parameters:
+
+    - `size`: the wanted page size
+    - `chunk`: the chunk size along the same axis
+    - `limit`: the maximum page size
+
+    :Returns: the aligned page size
+    """
+
+    chunk = int(chunk)
+    if chunk <= 1:
+        return size
+    if chunk <= size:
+        return size // chunk * chunk
+    if chunk <= limit:
+        return chunk
+    return size
+
 
 class Buffer:
     """Buffer used to access the real data contained in `PyTables` datasets.
@@ -69,46 +149,399 @@ class Buffer:
     *much* faster than a global reader method that has to decide
     which block of code must be executed at every cell painting time.
 
-    :Parameter leaf:
-        the data source (`tables.Leaf` instance) from which data are
-        going to be read.
+    :Parameters:
+
+    - `leaf`: the data source (`tables.Leaf` instance) from which data are
+      going to be read.
+    - `page_size`: the number of rows of the pages read from the data source
+      (if None it is computed from the dataset row size and chunkshape)
+    - `cache`: the `PageCache` where pages are kept (if None the cache
+      shared by every buffer)
+    - `coordinates`: an `EArray` with the coordinates of the displayed rows
+      of a table (if None every row is displayed)
     """
 
-    def __init__(self, leaf):
+    def __init__(self, leaf, page_size=None, cache=None, coordinates=None):
         """
         Initializes the buffer.
         """
 
         self.leaf = leaf
-        # The structure where read data will be stored.
+        self.coordinates = coordinates
+        # The structure where read data will be stored and if it has been
+        # joined from several pages (instead of being a view of a page)
         self.chunk = np.array([])
+        self.joined_chunk = False
+        # The axis along which rows are read
+        self.maindim = getattr(leaf, 'maindim', 0)
+        self.fixed_page_size = page_size
+        self.page_size = PAGE_SIZE
+        self.col_page_size = COLUMN_PAGE_SIZE
+        if cache is None:
+            cache = pagecache.getCache()
+        self.cache = pagecache.LeafCache(cache, self.cachePrefix)
+        metrics.getMetrics().register(self)
+        # The read-ahead manager (if read-ahead is enabled), the pages
+        # requested to it and the first row of the last chunk read (used for
+        # guessing the browsing direction)
+        self.read_ahead = None
+        self.pending = set()
+        self.last_start = None
+        # The range of rows of the current chunk
+        self.window = (0, 0)
+
+        # Tables are read field by field so they need to know which fields
+        # must be kept in the buffer (None for arrays)
+        self.fields = None
+        # Arrays with two or more dimensions are paged along columns too so
+        # they need to know the range of columns of the chunk (None for
+        # leaves displayed in one column and for tables)
+        self.col_window = None
+        # The axes displayed as rows and columns by arrays paged along
+        # columns and the indices of the remaining axes (if the array is
+        # sliced)
+        self.axes = None
+        self.indices = None
+        # The column whose completely sorted index gives the order of the
+        # rows of tables (None for the storage order)
+        self.sortby = None
+        self.descending = False
+        if isinstance(leaf, tables.Table):
+            self.colnames = leaf.colnames
+            self.fields = self.colnames[:MAX_FIELDS]
+            self.chunk = {}
 
         # The method used for reading data depends on the kind of node.
         # Setting the reader method at initialization time increases the
         # speed of reading several orders of magnitude
         if isinstance(leaf, tables.Table):
-            # Dataset elements will be read like a[row][column]
-            self.getCell = self.arrayCell
-        elif isinstance(leaf, tables.EArray):
-            self.getCell = self.EArrayCell
+            # Dataset elements will be read like a[column][row]
+            self.getCell = self.tableCell
+            self.getColumn = self.tableColumn
         elif isinstance(leaf, tables.VLArray):
-            # Array elements will be read like a[row]
-            self.getCell = self.vectorCell
+            # Array elements will be read like a[row] and decoded on demand
+            self.getCell = self.vlarrayCell
+            self.getColumn = self.vlarrayColumn
+            self.decoded = collections.OrderedDict()
+            self.vl_row_bytes = self.sampleRowBytes()
         elif leaf.shape == ():
             # Array element will be read like a[()]
             self.getCell = self.scalarCell
+            self.getColumn = self.scalarColumn
         elif len(leaf.shape) == 1:
             # Array elements will be read like a[row]
             self.getCell = self.vectorCell
+            self.getColumn = self.vectorColumn
         elif len(leaf.shape) > 1:
-            # Dataset elements will be read like a[row][column]
+            # Dataset elements will be read like a[row][column]. Arrays
+            # whose main dimension is not the first one (i.e. EArrays
+            # enlarged along other axis) are paged with the main dimension
+            # moved to the front
             self.getCell = self.arrayCell
+            self.getColumn = self.arrayColumn
+            self.axes = self.defaultAxes()
+            self.col_window = (0, leaf.shape[self.axes[1]])
+        self.setPageSize()
+
+    def defaultAxes(self):
+        """The axes displayed as rows and columns by unsliced arrays.
+
+        Rows run along the main dimension of the array and columns along
+        the first of the remaining axes.
+        """
+
+        return (self.maindim, 1 if self.maindim == 0 else 0)
+
+    def setPageSize(self):
+        """Compute the size of the pages read from the data source.
+
+        Pages are sized so that they use about `PAGE_BYTES` bytes and are
+        aligned to the dataset chunks along the displayed axes, so reading
+        a page decompresses only chunks whose data are fully kept.
+        """
+
+        leaf = self.leaf
+        shape = leaf.shape
+        if not shape:
+            return
+        chunkshape = getattr(leaf, 'chunkshape', None)
+        row_axis = self.maindim if self.axes is None else self.axes[0]
+
+        row_bytes = self.rowBytes(1)
+        if self.axes is not None:
+            chunk = chunkshape[self.axes[1]] if chunkshape else 1
+            self.col_page_size = alignSize(
+                COLUMN_PAGE_SIZE, chunk,
+                max(COLUMN_PAGE_SIZE, PAGE_BYTES // max(row_bytes, 1)))
+            row_bytes = self.rowBytes(min(self.col_page_size,
+                                          shape[self.axes[1]]))
+
+        if self.fixed_page_size is not None:
+            self.page_size = max(1, self.fixed_page_size)
+            return
+        size = PAGE_SIZE
+        if row_bytes:
+            size = max(1, min(PAGE_SIZE, PAGE_BYTES // row_bytes))
+        chunk = chunkshape[row_axis] if chunkshape else 1
+        limit = size if not row_bytes else \
+            max(size, 4 * PAGE_BYTES // row_bytes)
+        self.page_size = alignSize(size, chunk, limit)
+
+    def cachePrefix(self):
+        """The prefix of the keys of the dataset pages in the page cache.
+
+        It identifies the dataset and the geometry of its pages, so buffers
+        of the same dataset share the pages with the same geometry. Rows
+        selected by coordinates are identified by the node with the
+        coordinates, so their pages are forgotten when it is deleted.
+        """
+
+        prefix = (self.leaf._v_file.filename, self.leaf._v_pathname)
+        if self.coordinates is not None:
+            prefix = (self.coordinates._v_file.filename,
+                      self.coordinates._v_pathname) + prefix
+        return prefix + (self.page_size, self.col_page_size, self.axes,
+                         self.indices, self.sortby, self.descending)
+
+    def rowBytes(self, ncols=None):
+        """Estimate the size (in bytes) of a displayed row.
+
+        :Parameter ncols: the number of displayed columns of arrays paged
+          along columns (all the columns of the window if None)
+
+        :Returns: the row size or None if it is unknown (rows of `VLArrays`
+          are variable length so their average size is estimated)
+        """
+
+        leaf = self.leaf
+        if isinstance(leaf, tables.Table):
+            return leaf.rowsize
+        if isinstance(leaf, tables.VLArray):
+            return self.vl_row_bytes
+        if not leaf.shape:
+            return None
+
+        # The size of a cell (the elements of the not displayed axes)
+        row_axis = self.maindim if self.axes is None else self.axes[0]
+        cell_bytes = leaf.atom.size
+        if self.indices is None:
+            for axis, size in enumerate(leaf.shape):
+                if axis != row_axis and (self.axes is None or
+                                         axis != self.axes[1]):
+                    cell_bytes *= size
+        if self.axes is None:
+            return cell_bytes
+        if ncols is None:
+            ncols = self.col_window[1] - self.col_window[0]
+        return cell_bytes * ncols
+
+    def sampleRowBytes(self):
+        """Estimate the average size (in bytes) of the rows of a `VLArray`.
+
+        The estimate is based on the raw size of the first rows.
+
+        :Returns: the row size or None if it cannot be estimated
+        """
+
+        try:
+            with readahead.HDF5_LOCK:
+                rows = pagecache.readRawRows(self.leaf, 0, VL_SAMPLE_ROWS)
+        except tables.HDF5ExtError:
+            return None
+        if not rows:
+            return None
+        return max(pagecache.pageSize(rows) // len(rows), 1)
 
     def __del__(self):
         """Release resources before destroying the buffer.
         """
         # FIXME: PY3.5+ leaks resources (use finalizer instead).
         self.chunk = None
+        self.cache = None
+
+    def privateMemory(self):
+        """Estimate the memory (in bytes) held by the chunk on its own.
+
+        Chunks made of a single page are views of the cached page, so just
+        the memory of chunks joined from several pages is private.
+        """
+
+        chunk = self.chunk
+        if chunk is None:
+            return 0
+        if isinstance(chunk, list):
+            # Rows of VLArrays are shared with the cached pages
+            return sys.getsizeof(chunk)
+        if self.joined_chunk:
+            return pagecache.pageSize(chunk)
+        return sys.getsizeof(chunk) if isinstance(chunk, dict) else 0
+
+    def enableReadAhead(self):
+        """Read in background the pages around the chunk being displayed.
+
+        The read-ahead is not available for scalar arrays and for files
+        that cannot be opened twice (i.e. opened in ``w`` mode).
+        """
+
+        if self.leaf.shape in (None, ()):
+            return
+        manager = readahead.getReadAhead()
+        if manager.register(self):
+            self.read_ahead = manager
+
+    def close(self):
+        """Release the resources used by the buffer.
+
+        Cached pages are kept because they can be used by other buffers of
+        the same dataset. They will be evicted when needed.
+        """
+
+        if self.read_ahead is not None:
+            self.read_ahead.unregister(self)
+            self.read_ahead = None
+        self.pending.clear()
+
+    def setVisibleColumns(self, first, last):
+        """Keep in the buffer the fields of the columns visible in the view.
+
+        Columns at both sides of the visible ones are kept too, so that
+        scrolling horizontally doesn't read the table at every step. Fields
+        not kept anymore are dropped from the buffer.
+
+        :Parameters:
+
+        - `first`: the first visible column
+        - `last`: the last visible column
+        """
+
+        if self.fields is None or len(self.colnames) <= MAX_FIELDS:
+            return
+        margin = max(last - first + 1, MAX_FIELDS // 2)
+        fields = self.colnames[max(first - margin, 0):last + margin + 1]
+        if fields == self.fields:
+            return
+        self.fields = fields
+        self.chunk = {name: self.chunk[name] for name in fields
+                      if name in self.chunk}
+        self.loadFields()
+
+    def loadFields(self):
+        """Add to the current chunk the kept fields it is missing.
+
+        The missing fields are read (if not cached) in one pass per page.
+        """
+
+        missing = [name for name in self.fields if name not in self.chunk]
+        start, stop = self.window
+        if not missing or stop <= start:
+            return
+        grid = self.readPages(start, stop)
+        if grid is None:
+            return
+        offset = start - (start // self.page_size) * self.page_size
+        for name in missing:
+            self.chunk[name] = self.sliceRows(
+                self.joinPages([pages[0][name] for pages in grid]), offset,
+                offset + stop - start)
+
+    def setColumnWindow(self, start, stop):
+        """Set the range of columns of the chunks read from arrays.
+
+        Arrays with two or more dimensions are paged along both rows and
+        columns so that arrays with a huge number of columns can be read.
+        The current chunk is updated accordingly.
+
+        :Parameters:
+
+        - `start`: the first column of the range
+        - `stop`: the column where the range stops (not included)
+        """
+
+        if self.col_window is None or self.col_window == (start, stop):
+            return
+        self.col_window = (start, stop)
+        if self.window[1] > self.window[0]:
+            self.readBuffer(*self.window)
+
+    def canSlice(self):
+        """Find out if the data source can be sliced.
+
+        Only arrays with more than two dimensions can be sliced.
+        """
+
+        return self.axes is not None and len(self.leaf.shape) > 2
+
+    def setSlice(self, axes=None, indices=None):
+        """Display a 2-D hyperslab of an array with more than two dimensions.
+
+        The axes in `axes` are displayed as rows and columns and the
+        remaining axes are fixed to the values given in `indices`. Every
+        cell of the hyperslab is a scalar, so pages hold just the displayed
+        elements instead of whole sub-arrays. Calling this method with no
+        arguments displays the whole array again.
+
+        Sliced pages are cached with their own keys. The chunk must be read
+        again by the caller.
+
+        :Parameters:
+
+        - `axes`: a ``(row axis, column axis)`` tuple
+        - `indices`: a sequence with the index of every axis of the array
+          (values of the displayed axes are ignored)
+        """
+
+        shape = self.leaf.shape
+        if axes is None:
+            self.axes = self.defaultAxes()
+            self.indices = None
+        else:
+            row_axis, col_axis = axes
+            if not self.canSlice() or row_axis == col_axis or \
+                    not (0 <= row_axis < len(shape)) or \
+                    not (0 <= col_axis < len(shape)):
+                raise ValueError(f'Invalid slice axes: {axes}')
+            indices = tuple(indices)
+            if len(indices) != len(shape) or \
+                    any(not (0 <= index < size) for axis, (index, size)
+                        in enumerate(zip(indices, shape))
+                        if axis not in axes):
+                raise ValueError(f'Invalid slice indices: {indices}')
+            self.axes = (row_axis, col_axis)
+            self.indices = indices
+        self.col_window = (0, shape[self.axes[1]])
+        self.setPageSize()
+        self.window = (0, 0)
+        self.last_start = None
+        self.pending.clear()
+
+    def setSortOrder(self, sortby=None, descending=False):
+        """Read the rows of a table in the order of one of its columns.
+
+        Rows are read page by page via `tables.Table.read_sorted`, so the
+        column must have a completely sorted index and the table is never
+        loaded in memory. Calling this method with no arguments restores
+        the storage order.
+
+        Sorted pages are cached with their own keys. The chunk must be read
+        again by the caller.
+
+        :Parameters:
+
+        - `sortby`: the name of the column giving the order of the rows
+        - `descending`: True for sorting rows in descending order
+        """
+
+        if sortby is not None and self.coordinates is not None:
+            raise ValueError('Rows selected by coordinates cannot be sorted')
+        if sortby is not None and \
+                (self.fields is None or
+                 not sorting.hasSortedIndex(self.leaf, sortby)):
+            raise ValueError(f'Column {sortby} has no completely sorted index')
+        self.sortby = sortby
+        self.descending = bool(descending) and sortby is not None
+        self.window = (0, 0)
+        self.last_start = None
+        self.pending.clear()
 
     def total_nrows(self):
         """Estimates the number of rows of the dataset being read.
@@ -131,6 +564,11 @@ class Buffer:
         elif shape == ():
             # Node is a rank 0 array (e.g. numpy.array(5))
             nrows = 1
+        elif self.indices is not None:
+            # Sliced arrays display their row axis
+            nrows = shape[self.axes[0]]
+        elif self.coordinates is not None:
+            nrows = self.coordinates.nrows
         else:
             nrows = self.leaf.nrows
 
@@ -144,14 +582,301 @@ class Buffer:
         be smaller than the requested one if the beginning/end of the
         document is reached when reading.
 
-        Data read from `VLArrays` are returned as a Python list of objects of
-        the current flavor (usually ``numpy`` arrays). Any
+        The chunk is assembled from the cached pages overlapping the
+        requested range. Only the pages that are not cached are read from
+        the data source.
+
+        Data read from `VLArrays` are kept as a Python list of raw rows
+        that are decoded on demand (see `vlarrayCell`). Any
         other kind of `tables.Leaf` returns a ``numpy`` array (see comments on
         restricted_flavors above)
 
         :Parameters:
         :param start: the document row that is the first row of the chunk.
-        :param stop: the last row to read, inclusive.
+        :param stop: the row where the chunk stops (not included).
+        """
+
+        if self.leaf.shape == ():
+            # Scalar arrays have no pages
+            data = self.readRange(())
+            if data is not None:
+                self.chunk = data
+                self.joined_chunk = False
+            return
+
+        start = max(0, start)
+        stop = min(stop, self.total_nrows())
+        if stop <= start:
+            return
+        grid = self.readPages(start, stop)
+        if grid is None:
+            return
+
+        # Update the buffer contents
+        self.joined_chunk = len(grid) > 1 or len(grid[0]) > 1
+        first_page = start // self.page_size
+        offset = start - first_page * self.page_size
+        if self.fields is not None:
+            self.chunk = {
+                name: self.sliceRows(
+                    self.joinPages([pages[0][name] for pages in grid]),
+                    offset, offset + stop - start)
+                for name in self.fields}
+        elif self.col_window is not None:
+            grid = [[self.orientPage(page) for page in pages]
+                    for pages in grid]
+            data = self.joinGrid(grid)
+            col_start, col_stop = self.col_window
+            col_offset = col_start - \
+                (col_start // self.col_page_size) * self.col_page_size
+            self.chunk = data[offset:offset + stop - start,
+                              col_offset:col_offset + col_stop - col_start]
+        else:
+            self.chunk = self.sliceRows(
+                self.joinPages([pages[0] for pages in grid]), offset,
+                offset + stop - start)
+        self.window = (start, stop)
+        self.readAhead(first_page, first_page + len(grid) - 1, start)
+
+    def orientPage(self, page):
+        """Move the row and column axes of an array page to the front.
+
+        Pages keep the order of the array axes. The returned page is a
+        view so cells can be indexed as ``page[row][column]`` without
+        copying data.
+
+        :Parameter page: the page being oriented
+        """
+
+        row_axis, col_axis = self.axes
+        if self.indices is not None:
+            # Hyperslabs have just the displayed axes
+            return page.T if row_axis > col_axis else page
+        if (row_axis, col_axis) == (0, 1):
+            return page
+        return np.moveaxis(page, (row_axis, col_axis), (0, 1))
+
+    def joinGrid(self, grid):
+        """Join a grid of oriented array pages.
+
+        :Parameter grid: a list with the pages of every row page
+
+        :Returns: the pages contents as a whole (a view if the grid has a
+          single page)
+        """
+
+        if len(grid) == 1 and len(grid[0]) == 1:
+            return grid[0][0]
+        return np.concatenate(
+            [np.concatenate(pages, axis=1) if len(pages) > 1 else pages[0]
+             for pages in grid], axis=0)
+
+    def columnPages(self):
+        """The column pages overlapping the current range of columns.
+
+        Leaves not paged along columns have a single column page.
+        """
+
+        if self.col_window is None:
+            return [0]
+        col_start, col_stop = self.col_window
+        col_stop = max(col_stop, col_start + 1)
+        return list(range(col_start // self.col_page_size,
+                          (col_stop - 1) // self.col_page_size + 1))
+
+    def pageSelection(self, key):
+        """The selection of the dataset read for a given page.
+
+        :Parameter key: the page key, a ``(row page, column page)`` tuple
+
+        :Returns: a tuple of slices in the dataset axes (a `SortedRows`
+          range for sorted tables)
+        """
+
+        row_page, col_page = key
+        start = row_page * self.page_size
+        col_start = col_stop = None
+        if self.col_window is not None:
+            col_start = col_page * self.col_page_size
+            col_stop = col_start + self.col_page_size
+        return self.rangeSelection(start, start + self.page_size, col_start,
+                                   col_stop)
+
+    def rangeSelection(self, start, stop, col_start=None, col_stop=None):
+        """The selection of the dataset read for a range of rows.
+
+        Ranges are clipped to the dataset limits.
+
+        :Parameters:
+
+        - `start`: the first row of the range
+        - `stop`: the row where the range stops (not included)
+        - `col_start`: the first column of arrays paged along columns (all
+          the columns are selected if None)
+        - `col_stop`: the column where the range stops (not included)
+
+        :Returns: a tuple of slices in the dataset axes (a `SortedRows`
+          range for sorted tables, a `CoordinateRows` range for rows
+          selected by coordinates)
+        """
+
+        stop = min(stop, self.total_nrows())
+        if self.coordinates is not None:
+            return pagecache.CoordinateRows(self.coordinates, start, stop)
+        if self.sortby is not None:
+            return pagecache.SortedRows(self.sortby, start, stop,
+                                        self.descending)
+        if self.indices is None:
+            selection = [slice(None)] * len(self.leaf.shape)
+        else:
+            selection = list(self.indices)
+        row_axis = self.maindim if self.axes is None else self.axes[0]
+        selection[row_axis] = slice(start, stop)
+        if self.col_window is not None:
+            col_axis = self.axes[1]
+            if col_start is None:
+                selection[col_axis] = slice(0, self.leaf.shape[col_axis])
+            else:
+                selection[col_axis] = slice(
+                    col_start, min(col_stop, self.leaf.shape[col_axis]))
+        return tuple(selection)
+
+    def readPages(self, start, stop):
+        """Return the pages overlapping a range of rows.
+
+        :Parameters:
+
+        - `start`: the first row of the range
+        - `stop`: the row where the range stops (not included)
+
+        :Returns: a list with the pages of every row page or None if some
+          page cannot be read
+        """
+
+        col_pages = self.columnPages()
+        grid = []
+        for row_page in range(start // self.page_size,
+                              (stop - 1) // self.page_size + 1):
+            pages = []
+            for col_page in col_pages:
+                data = self.readPage((row_page, col_page))
+                if data is None:
+                    return None
+                pages.append(data)
+            grid.append(pages)
+        return grid
+
+    def readAhead(self, first_page, last_page, start):
+        """Request the pages around the current chunk to the read-ahead.
+
+        As many row pages as those of the current chunk are requested before
+        and after it, starting with the browsing direction. Arrays paged
+        along columns request the column pages at both sides of the chunk
+        too. Pages already cached or requested are skipped.
+
+        :Parameters:
+
+        - `first_page`: the first row page of the current chunk
+        - `last_page`: the last row page of the current chunk
+        - `start`: the first row of the current chunk
+        """
+
+        forward = self.last_start is None or start >= self.last_start
+        self.last_start = start
+        if self.read_ahead is None:
+            return
+
+        npages = last_page - first_page + 1
+        max_page = (self.total_nrows() - 1) // self.page_size
+        following = list(range(last_page + 1,
+                               min(last_page + npages, max_page) + 1))
+        preceding = list(range(first_page - 1,
+                               max(first_page - npages, 0) - 1, -1))
+        if forward:
+            row_pages = following + preceding
+        else:
+            row_pages = preceding + following
+        col_pages = self.columnPages()
+        candidates = [(row_page, col_page) for row_page in row_pages
+                      for col_page in col_pages]
+        if self.col_window is not None:
+            max_col_page = \
+                (self.leaf.shape[self.axes[1]] - 1) // self.col_page_size
+            for col_page in (col_pages[-1] + 1, col_pages[0] - 1):
+                if 0 <= col_page <= max_col_page:
+                    candidates.extend((row_page, col_page) for row_page
+                                      in range(first_page, last_page + 1))
+        # Don't request more pages than the cache can hold along with the
+        # pages of the current chunk
+        candidates = candidates[
+            :max(self.cache.max_pages - npages * len(col_pages), 0)]
+
+        ranges = []
+        for key in candidates:
+            if key in self.cache or key in self.pending:
+                continue
+            self.pending.add(key)
+            ranges.append((key, self.pageSelection(key)))
+        if ranges:
+            self.read_ahead.requestPages(self, ranges, self.fields)
+
+    def storePage(self, key, data):
+        """Store in the cache a page read in background.
+
+        :Parameters:
+
+        - `key`: the page key
+        - `data`: the page contents
+        """
+
+        self.pending.discard(key)
+        if self.cache is None:
+            return
+        cached = self.cache.peek(key)
+        if self.fields is not None and cached is not None:
+            # Add the read fields to the cached ones
+            data = {**data, **cached}
+        elif cached is not None:
+            return
+        self.cache.put(key, data)
+
+    def readPage(self, key):
+        """Return a page of the data source, reading it only if not cached.
+
+        :Parameter key: the page key, a ``(row page, column page)`` tuple
+
+        :Returns: the page data or None if it cannot be read
+        """
+
+        data = self.cache.get(key)
+        missing = None
+        if self.fields is not None:
+            missing = [name for name in self.fields
+                       if data is None or name not in data]
+            if not missing:
+                return data
+        elif data is not None:
+            return data
+
+        read = self.readRange(self.pageSelection(key), missing)
+        if read is None:
+            return None
+        if data is not None:
+            # Add the missing fields to the cached ones
+            read = {**data, **read}
+        self.pending.discard(key)
+        self.cache.put(key, read)
+        return read
+
+    def readRange(self, selection, fields=None):
+        """Read a selection of the data source.
+
+        :Parameters:
+
+        - `selection`: a tuple of slices in the dataset axes
+        - `fields`: the table fields being read (None for arrays)
+
+        :Returns: the read data or None if they cannot be read
         """
 
         try:
@@ -160,7 +885,12 @@ class Buffer:
             # Warning: in a EArray with shape (2,3,3) and extdim attribute
             # being 1, the read method will have 3 rows. However, the numpy
             # array returned by EArray.read() will have only 2 rows
-            data = self.leaf.read(start, stop)
+            with readahead.HDF5_LOCK:
+                started = time.perf_counter()
+                data = pagecache.readSelection(self.leaf, selection, fields)
+                metrics.getMetrics().recordRead(
+                    time.perf_counter() - started, pagecache.pageSize(data))
+                return data
         except tables.HDF5ExtError as e:
             log.error(
                 translate('Buffer', """\nError: problems reading records. """
@@ -168,9 +898,50 @@ class Buffer:
                           'A dataset readability error').format(e.message))
         except:
             vtutils.formatExceptionInfo()
-        else:
-            # Update the buffer contents and its start position
-            self.chunk = data
+        return None
+
+    def joinPages(self, pages):
+        """Join a sequence of consecutive pages.
+
+        :Parameter pages: the list of pages being joined
+
+        :Returns: the pages contents as a whole
+        """
+
+        if len(pages) == 1:
+            return pages[0]
+        if isinstance(pages[0], list):
+            # VLArrays pages
+            return list(itertools.chain.from_iterable(pages))
+        return np.concatenate(pages, axis=self.maindim)
+
+    def sliceRows(self, data, start, stop):
+        """Slice a range of rows of the data read from the data source.
+
+        :Parameters:
+
+        - `data`: the data being sliced
+        - `start`: the first row of the slice
+        - `stop`: the row where the slice stops (not included)
+
+        :Returns: the sliced data
+        """
+
+        if isinstance(data, list):
+            return data[start:stop]
+        slicer = [slice(None)] * data.ndim
+        slicer[self.maindim] = slice(start, stop)
+        return data[tuple(slicer)]
+
+    def clearCache(self):
+        """Forget every cached page of the data source.
+
+        Must be called if the data source changes.
+        """
+
+        self.cache.clear()
+        if isinstance(self.leaf, tables.VLArray):
+            self.decoded.clear()
 
     def scalarCell(self, row, col):
         """
@@ -213,12 +984,12 @@ class Buffer:
         # and columns can be read from a given row using indexing notation
         return self.chunk[row]
 
-    def EArrayCell(self, row, col):
+    def vlarrayCell(self, row, col):
         """
-        Returns a cell of a EArray view.
+        Returns a cell of a `VLArray` view.
 
-        The indices values are not checked (and could not be in the
-        buffer) so they should be checked by the caller methods.
+        Rows of pseudo atoms are decoded the first time they are requested
+        and the most recently decoded rows are kept.
 
         :Parameters:
         - `row`: the row to which the cell belongs.
@@ -227,15 +998,36 @@ class Buffer:
         :Returns: the cell at position `(row, col)` of the document
         """
 
-        # The row-coordinate must be shifted by model.start units in order to
-        # get the right chunk element.
-        # chunk = [row0, row1, row2, ..., rowN]
-        # and columns can be read from a given row using indexing notation
-        # Get data for cell
-        cell_data = np.take(self.chunk, [row], axis=self.leaf.maindim)
-        # Remove extra dimension
-        cell_data = np.squeeze(cell_data, axis=self.leaf.maindim)
-        return cell_data
+        raw = self.chunk[row]
+        if not pagecache.isPseudoAtom(self.leaf.atom):
+            return raw
+        key = self.window[0] + row
+        value = self.decoded.get(key)
+        if value is None:
+            value = pagecache.decodeRow(self.leaf, raw)
+            self.decoded[key] = value
+            if len(self.decoded) > MAX_DECODED_ROWS:
+                self.decoded.popitem(last=False)
+        else:
+            self.decoded.move_to_end(key)
+        return value
+
+    def rowSummary(self, row):
+        """A short description of a row of a `VLArray` view.
+
+        It is built from the raw row so the row doesn't need to be decoded.
+
+        :Parameter row: the row of the chunk being described
+
+        :Returns: the length and type of the row
+        """
+
+        raw = self.chunk[row]
+        atom = self.leaf.atom
+        if pagecache.isPseudoAtom(atom):
+            return f'<{raw.nbytes} bytes {atom.type}>'
+        dims = ' x '.join(str(length) for length in raw.shape)
+        return f'<{dims} {atom.type}>'
 
     def arrayCell(self, row, col):
         """
@@ -260,3 +1052,108 @@ class Buffer:
         # chunk = [nestedrecord0, nestedrecord1, ..., nestedrecordN]
         # and fields can be read from nestedrecordJ using indexing notation
         return self.chunk[row][col]
+
+    def scalarColumn(self, col, start, stop):
+        """
+        Returns a range of cells of a column of a scalar array view.
+
+        As it happens with the cell readers, the indices values are not
+        checked.
+
+        :Parameters:
+        - `col`: the column to which the cells belong
+        - `start`: the first row of the range
+        - `stop`: the row where the range stops (not included)
+
+        :Returns: the list of cells in the given range
+        """
+        return [self.chunk[()]]
+
+    def vectorColumn(self, col, start, stop):
+        """
+        Returns a range of cells of a column of a 1D-array view.
+
+        :Parameters:
+        - `col`: the column to which the cells belong
+        - `start`: the first row of the range
+        - `stop`: the row where the range stops (not included)
+
+        :Returns: the array (or list for VLArrays) of cells in the range
+        """
+        return self.chunk[start:stop]
+
+    def vlarrayColumn(self, col, start, stop):
+        """
+        Returns a range of cells of a column of a `VLArray` view.
+
+        :Parameters:
+        - `col`: the column to which the cells belong
+        - `start`: the first row of the range
+        - `stop`: the row where the range stops (not included)
+
+        :Returns: the list of (decoded) cells in the range
+        """
+        return [self.vlarrayCell(row, col)
+                for row in range(start, min(stop, len(self.chunk)))]
+
+    def arrayColumn(self, col, start, stop):
+        """
+        Returns a range of cells of a column of a ND-array view.
+
+        :Parameters:
+        - `col`: the column to which the cells belong
+        - `start`: the first row of the range
+        - `stop`: the row where the range stops (not included)
+
+        :Returns: an array whose first dimension runs along the cells
+        """
+        return self.chunk[start:stop, col]
+
+    def tableCell(self, row, col):
+        """
+        Returns a cell of a table view.
+
+        Fields not kept in the buffer are read the first time one of their
+        cells is requested.
+
+        :Parameters:
+        - `row`: the row to which the cell belongs.
+        - `col`: the column to wich the cell belongs
+
+        :Returns: the cell at position `(row, col)` of the document
+        """
+
+        # chunk = {field0: column0, ..., fieldN: columnN}
+        return self.tableField(col)[row]
+
+    def tableColumn(self, col, start, stop):
+        """
+        Returns a range of cells of a column of a table view.
+
+        :Parameters:
+        - `col`: the column to which the cells belong
+        - `start`: the first row of the range
+        - `stop`: the row where the range stops (not included)
+
+        :Returns: an array whose first dimension runs along the cells
+        """
+        return self.tableField(col)[start:stop]
+
+    def tableField(self, col):
+        """
+        Returns the current chunk of a table field.
+
+        :Parameter col: the column of the field in the table view
+
+        :Returns: the array of cells of the field in the current chunk
+        """
+
+        name = self.colnames[col]
+        field = self.chunk.get(name)
+        if field is None:
+            if name not in self.fields:
+                self.fields = self.fields + [name]
+            self.loadFields()
+            # An empty field if it cannot be read
+            field = self.chunk.get(name, [])
+        return field
@@ -25,15 +25,21 @@ When a leaf node is opened in the tree of databases view the data stored in
 that leaf will be displayed in the workspace using this wrapper widget.
 """
 
+import logging
+
+import tables
 from qtpy import QtCore, QtWidgets
 
 from .. import utils as vtutils
 from ..nodeprops import nodeinfo
-from ..vtwidgets import zoom_cell
-from . import df_model, leaf_model, leaf_view
+from ..vtwidgets import find_dlg, slice_navigator, zoom_cell
+from . import df_model, finder, leaf_model, leaf_view
 
 __docformat__ = 'restructuredtext'
 
+translate = QtWidgets.QApplication.translate
+log = logging.getLogger(__name__)
+
 
 class DataSheet(QtWidgets.QMdiSubWindow):
     """
@@ -63,9 +69,15 @@ class DataSheet(QtWidgets.QMdiSubWindow):
         else:
             leaf = pt_node
 
-        self.leaf_model = df_model.try_opening_as_dataframe(leaf)
-        if not self.leaf_model:
-            self.leaf_model = leaf_model.LeafModel(leaf)
+        if self.dbt_leaf.node_kind == 'table (coordinates)':
+            # The rows selected by a query are read from the queried table
+            # (whose availability is checked by VTApp.nodeOpen)
+            source = vtutils.getVTApp().queries_mgr.sourceTable(leaf)
+            self.leaf_model = leaf_model.LeafModel(source, coordinates=leaf)
+        else:
+            self.leaf_model = df_model.try_opening_as_dataframe(leaf)
+            if not self.leaf_model:
+                self.leaf_model = leaf_model.LeafModel(leaf)
 
         self.leaf_view = leaf_view.LeafView(self.leaf_model)
 
@@ -89,6 +101,16 @@ class DataSheet(QtWidgets.QMdiSubWindow):
 
         self.pindex = QtCore.QPersistentModelIndex(index)
 
+        # The navigator used for slicing N-dimensional arrays (if any)
+        self.slice_navigator = None
+
+        # The last find request, the ``(row, column)`` of its last match
+        # and the running search (if any)
+        self.last_find = None
+        self.last_match = None
+        self.find_worker = None
+        self.find_progress = None
+
         # Connect signals to slots
         self.aboutToActivate.connect(self.syncTreeView)
         self.leaf_view.doubleClicked.connect(self.zoomCell)
@@ -103,6 +125,12 @@ class DataSheet(QtWidgets.QMdiSubWindow):
         self.dbt_leaf.has_view = False
         self.vtgui.updateActions()
 
+        self.cancelFind()
+
+        # Release the resources (cached pages, read-ahead) of the model
+        if hasattr(self.leaf_model, 'close'):
+            self.leaf_model.close()
+
         # Propagate the event. In the process, self.widget().closeEvent
         # will be called
         QtWidgets.QMdiSubWindow.closeEvent(self, event)
@@ -139,6 +167,205 @@ class DataSheet(QtWidgets.QMdiSubWindow):
         self.vtgui.dbs_tree_view.setCurrentIndex(
             QtCore.QModelIndex(self.pindex))
 
+    def canSlice(self):
+        """Find out if the displayed dataset can be browsed by 2-D slices."""
+
+        return hasattr(self.leaf_model, 'canSlice') and \
+            self.leaf_model.canSlice()
+
+    def showSliceNavigator(self):
+        """Show the navigator for slicing the displayed array.
+        """
+
+        if not self.canSlice():
+            return
+        if self.slice_navigator is None:
+            self.slice_navigator = slice_navigator.SliceNavigator(self)
+            self.slice_navigator.slice_changed.connect(self.setSlice)
+            self.slice_navigator.destroyed.connect(self.forgetSliceNavigator)
+        self.slice_navigator.show()
+        self.slice_navigator.raise_()
+
+    def forgetSliceNavigator(self):
+        """Forget the slice navigator once it has been closed."""
+
+        self.slice_navigator = None
+
+    def setSlice(self, axes, indices):
+        """Display a 2-D slice of the displayed array.
+
+        If the model is reset then the view is replaced by a new one
+        because the navigation machinery of views depends on the dataset
+        dimensions.
+
+        :Parameters:
+
+        - `axes`: a ``(row axis, column axis)`` tuple (None for displaying
+          the whole array)
+        - `indices`: a sequence with the index of every axis of the array
+        """
+
+        if not self.leaf_model.setSlice(axes, indices):
+            self.leaf_view.viewport().update()
+            return
+        old_view = self.leaf_view
+        self.leaf_view = leaf_view.LeafView(self.leaf_model)
+        self.setWidget(self.leaf_view)
+        self.leaf_view.doubleClicked.connect(self.zoomCell)
+        old_view.deleteLater()
+
+    def goToRow(self):
+        """Ask for a row of the displayed dataset and make it current.
+
+        Rows are entered as text because they can exceed the range of
+        integer spin boxes. Digits can be grouped with commas or
+        underscores.
+        """
+
+        last_row = self.leaf_view.leaf_numrows - 1
+        text, accepted = QtWidgets.QInputDialog.getText(
+            self, translate('DataSheet', 'Go to row',
+                            'Caption of the Go to row dialog'),
+            translate('DataSheet', 'Row (0 - {0}):',
+                      'Label of the Go to row dialog').format(last_row))
+        if not accepted or not text.strip():
+            return
+        try:
+            row = int(text.strip().replace(',', ''))
+            self.leaf_view.goToRow(row)
+        except ValueError:
+            log.error(translate(
+                'DataSheet', 'Cannot go to row {0}: rows range from 0 to {1}.',
+                'A Go to row error').format(text.strip(), last_row))
+            return
+        self.leaf_view.setFocus()
+
+    def canFind(self):
+        """Find out if cells of the displayed dataset can be found."""
+
+        return hasattr(self.leaf_model, 'rbuffer') and \
+            not self.leaf_model.is_filenode
+
+    def find(self):
+        """Ask for the cells being found and find the first one.
+
+        The search starts at the current cell.
+        """
+
+        if not self.canFind():
+            log.error(translate(
+                'DataSheet', 'Cells of this dataset cannot be searched.',
+                'A Find error'))
+            return
+        leaf = self.leaf_model.leaf
+        colnames = getattr(leaf, 'colnames', None)
+        query, backward = self.last_find or (None, False)
+        dialog = find_dlg.FindDlg(self, colnames, query, backward)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        query, backward = dialog.query()
+        model = self.leaf_model
+        current = self.leaf_view.currentIndex()
+        row = model.start + max(current.row(), 0)
+        column = model.col_start + max(current.column(), 0)
+        self.startFind(query, backward, row, column, inclusive=True)
+
+    def findNext(self, backward=False):
+        """Find the next (or previous) cell matching the last request.
+
+        The search starts after the last match.
+
+        :Parameter backward: True for finding the previous matching cell
+        """
+
+        if self.last_find is None or self.last_match is None:
+            self.find()
+            return
+        self.startFind(self.last_find[0], backward, *self.last_match)
+
+    def startFind(self, query, backward, row, column, inclusive=False):
+        """Start finding a cell in background.
+
+        A progress dialog is shown if the search takes a while.
+
+        :Parameters:
+
+        - `query`: the `FindQuery` being found
+        - `backward`: True for searching towards the first row
+        - `row`: the row of the cell where the search starts
+        - `column`: the column of the cell where the search starts
+        - `inclusive`: True if the cell where the search starts can match
+        """
+
+        self.cancelFind()
+        try:
+            cell_finder = finder.Finder(self.leaf_model.rbuffer, query)
+        except ValueError as e:
+            log.error(translate('DataSheet', 'Cannot find {0!r}: {1}',
+                                'A Find error').format(query.text, e))
+            return
+        self.last_find = (query, backward)
+        self.last_match = (row, column)
+        self.find_worker = finder.FindWorker(cell_finder, row, column,
+                                             backward, inclusive)
+        self.find_progress = QtWidgets.QProgressDialog(
+            translate('DataSheet', 'Finding {0!r}...',
+                      'The Find progress label').format(query.text),
+            translate('DataSheet', 'Cancel', 'The Find progress button'),
+            0, 100, self)
+        self.find_progress.setWindowModality(QtCore.Qt.WindowModal)
+        self.find_progress.setMinimumDuration(500)
+        self.find_progress.canceled.connect(self.find_worker.cancel)
+        self.find_worker.progress.connect(self.find_progress.setValue)
+        self.find_worker.find_finished.connect(self.findFinished)
+        self.find_worker.start()
+
+    def cancelFind(self):
+        """Stop the running search (if any) and wait for it."""
+
+        if self.find_worker is None:
+            return
+        worker, self.find_worker = self.find_worker, None
+        worker.find_finished.disconnect(self.findFinished)
+        worker.cancel()
+        worker.wait()
+        self.closeFindProgress()
+
+    def closeFindProgress(self):
+        """Close the progress dialog of the last search."""
+
+        if self.find_progress is not None:
+            self.find_progress.reset()
+            self.find_progress.deleteLater()
+            self.find_progress = None
+
+    def findFinished(self, match, error):
+        """Select the cell found by the last search.
+
+        :Parameters:
+
+        - `match`: the ``(row, column)`` of the matching cell (None if no
+          cell matches or the search has been cancelled)
+        - `error`: the error message of a failed search
+        """
+
+        worker, self.find_worker = self.find_worker, None
+        # The worker thread is about to finish
+        worker.wait()
+        self.closeFindProgress()
+        text = self.last_find[0].text
+        if error:
+            log.error(translate('DataSheet', 'Cannot find {0!r}: {1}',
+                                'A Find error').format(text, error))
+        elif match is not None:
+            self.last_match = match
+            self.leaf_view.goToRow(*match)
+            self.leaf_view.setFocus()
+        elif not worker.isCancelled():
+            self.vtgui.statusBar().showMessage(translate(
+                'DataSheet', 'No more cells match {0!r}',
+                'A Find status message').format(text), 5000)
+
     def zoomCell(self, index):
         """Display the inner dimensions of a cell.
 
@@ -158,8 +385,53 @@ class DataSheet(QtWidgets.QMdiSubWindow):
         if node.node_kind == 'table':
             col = info.columns_names[column]
             title = f'{node.name}: {col}[{tmodel.start + row}]'
+        elif node.node_kind == 'table (coordinates)':
+            col = tmodel.leaf.colnames[column]
+            title = f'{node.name}: {col}[{tmodel.row_labels[row]}]'
+        elif hasattr(tmodel, 'cellCoordinates'):
+            coordinates = ','.join(
+                str(index) for index in tmodel.cellCoordinates(row, column))
+            title = f'{node.name}: ({coordinates})'
         else:
-            title = f'{node.name}: ({tmodel.start + row},{column})'
+            title = (f'{node.name}: ({tmodel.start + row},'
+                     f'{tmodel.col_start + column})')
+
+        zoom_cell.ZoomCell(self.cellSource(tmodel, row, column, data),
+                           title, self.vtgui.workspace, self.dbt_leaf)
+
+    def cellSource(self, tmodel, row, column, data):
+        """The source of a zoomed cell.
+
+        Users can choose to read big cells directly from disk instead of
+        zooming the copy held by the page buffer.
+
+        :Parameters:
+
+        - `tmodel`: the model of the view
+        - `row`: the row of the cell in the current chunk
+        - `column`: the column of the cell
+        - `data`: the content of the cell read from the page buffer
+        """
 
-        zoom_cell.ZoomCell(data, title, self.vtgui.workspace,
-                           self.dbt_leaf)
+        rbuffer = getattr(tmodel, 'rbuffer', None)
+        nbytes = getattr(data, 'nbytes', 0)
+        if rbuffer is None or nbytes < zoom_cell.DISK_READ_BYTES \
+                or not zoom_cell.canReadCell(rbuffer):
+            return data
+        answer = QtWidgets.QMessageBox.question(
+            self, translate('DataSheet', 'Zoom cell',
+                            'Caption of the zoom cell dialog'),
+            translate('DataSheet', 'The cell takes {0} MB. Read it directly '
+                      'from disk instead of through the page buffer?',
+                      'Text of the zoom cell dialog').format(
+                          nbytes // 2**20))
+        if answer != QtWidgets.QMessageBox.Yes:
+            return data
+        try:
+            return zoom_cell.diskCell(rbuffer, tmodel.start + row,
+                                      tmodel.col_start + column)
+        except tables.HDF5ExtError as e:
+            log.error(translate(
+                'DataSheet', 'The cell cannot be read from disk: {0}',
+                'A zoom cell error').format(e))
+            return data
@@ -19,19 +19,28 @@
 """
 This module implements a model (in the `MVC` sense) for the real data stored
 in a Pandas HDFStore.
+
+Pages of frames are kept as per-column `numpy` arrays. Just the columns
+around the visible ones are read from `frame_table` stores, and every column
+of a page is formatted at once the first time it is displayed.
 """
 
 __docformat__ = 'restructuredtext'
 
 import logging
+import time
+import weakref
 
 from qtpy import QtCore, QtGui
 from qtpy.QtCore import Qt
 
-from . import leaf_model
+from . import buffer, leaf_model, metrics
 
 log = logging.getLogger(__name__)
 
+#: The stores of the files whose frames are displayed, keyed by file name.
+_hstores = weakref.WeakValueDictionary()
+
 _axis_font = QtGui.QFont()
 _axis_font.setBold(True)
 
@@ -63,7 +72,12 @@ def try_opening_as_dataframe(leaf):
 
     pandas_attr = getattr(pgroup._v_attrs, 'pandas_type', None)
     if pandas_attr in ['frame', 'frame_table']:
-        hstore = HDFStoreWrapper(leaf._v_file)
+        # Views of frames of the same file share a store
+        h5file = leaf._v_file
+        hstore = _hstores.get(h5file.filename)
+        if hstore is None or hstore._handle is not h5file:
+            hstore = HDFStoreWrapper(h5file)
+            _hstores[h5file.filename] = hstore
 
         return DataFrameModel(leaf, hstore)
 
@@ -84,6 +98,19 @@ def get_index_name(index, i, fallback_pattern):
     return val
 
 
+def formatColumn(values):
+    """Format the cells of a frame column as `str` does.
+
+    :Parameter values: the ``numpy`` array with the column cells
+
+    :Returns: a list with the formatted cells
+    """
+
+    if values.dtype.kind in 'biufc':
+        return values.astype(str).tolist()
+    return [str(value) for value in values]
+
+
 class DataFrameModel(QtCore.QAbstractTableModel):
     """
     The model for data contained in pandas DataFrame chunks.
@@ -104,6 +131,9 @@ class DataFrameModel(QtCore.QAbstractTableModel):
         A tuple ``(row_span, col_span)`` for the number of *columns/indices*
         headers respectively, in case they are pandas multi-index, or
         just ``(1, 1)``.
+    :attribute _values:
+        the ``numpy`` arrays of the columns of the page read so far, keyed
+        by column position.
     """
 
     def __init__(self, leaf, hstore, parent=None):
@@ -115,20 +145,26 @@ class DataFrameModel(QtCore.QAbstractTableModel):
         self._hstore = hstore
         self.start = 0
 
+        # Fixed format frames cannot be read by columns
+        self._projection = hstore.get_storer(self._pgroup).is_table
+
+        # The labels of the frame axes (an empty selection reads no rows)
+        labels = hstore.select(self._pgroup, start=0, stop=0)
+        self._columns = labels.columns
+
         # The dataset number of rows is potentially huge but tables are
         #  kept small: just the data returned by a read operation of the
         #  buffer are displayed
         self.leaf_numrows = leaf.shape[0]
-        self.numrows = min(self.leaf_numrows, leaf_model.CHUNK_SIZE)
+        self.numrows = min(self.leaf_numrows,
+                           leaf_model.chunkSize(self.rowBytes()))
+        self.numcols = len(self._columns)
+        self.leaf_numcols = self.numcols
+        self.col_start = 0
 
         # Track selected cell.
         self.selected_cell = {'index': QtCore.QModelIndex(), 'buffer_start': 0}
 
-        # Populate the model with the first chunk of data.
-        self.loadData(0, self.numrows)
-        chunk = self._chunk
-        self.numcols = len(chunk.columns)
-
         def count_multiindex(index):
             try:
                 return index.nlevels
@@ -138,9 +174,46 @@ class DataFrameModel(QtCore.QAbstractTableModel):
         # Number of levels in the index/columns indexes
         self._nheaders = tuple(count_multiindex(idx)
                                for idx
-                               in (chunk.columns, chunk.index))
+                               in (labels.columns, labels.index))
+
+        # Header labels are formatted once
+        n_columns = self._nheaders[0]
+        self._column_names = [get_index_name(self._columns, i, 'C%s')
+                              for i in range(n_columns)]
+        self._column_labels = [
+            [str(level) for level in label] if n_columns > 1
+            else [str(label)] for label in self._columns]
+
+        # The columns kept in the page
+        self._col_window = (0, min(self.numcols, buffer.MAX_FIELDS))
+
+        # Populate the model with the first chunk of data.
+        self.loadData(0, self.numrows)
 
         super(DataFrameModel, self).__init__(parent)
+        metrics.getMetrics().registerModel(self)
+
+    def privateMemory(self):
+        """Estimate the memory (in bytes) held by the page and its display
+        strings.
+        """
+
+        nbytes = sum(values.nbytes for values in self._values.values())
+        for strings in list(self._strings.values()) + \
+                list(self._index_strings.values()):
+            nbytes += metrics.stringsSize(strings)
+        return nbytes
+
+    def rowBytes(self):
+        """Estimate the size (in bytes) of a row of the underlying leaf."""
+
+        leaf = self._leaf
+        if hasattr(leaf, 'rowsize'):
+            return leaf.rowsize
+        row_bytes = leaf.atom.size
+        for size in leaf.shape[1:]:
+            row_bytes *= size
+        return row_bytes
 
     def columnCount(self, parent=None):
         """
@@ -173,6 +246,8 @@ class DataFrameModel(QtCore.QAbstractTableModel):
     def loadData(self, start, length):
         """Load the model with fresh chunk from the underlying leaf.
 
+        Just the columns of the current column window are read.
+
         :param start:
             The first row (within the total nrows) of the chunk to read.
         :param length:
@@ -192,9 +267,191 @@ class DataFrameModel(QtCore.QAbstractTableModel):
         actual_start = stop - self.numrows
         start = max(min(actual_start, start), 0)
 
-        self._chunk = self._hstore.select(self._pgroup,
-                                          start=start, stop=stop)
         self.start = start
+        self._stop = stop
+        self._values = {}
+        self._strings = {}
+        self._page_index = None
+        self._index_strings = {}
+
+        started = time.perf_counter()
+        self.readColumns(*self._col_window)
+        metrics.getMetrics().recordFault(time.perf_counter() - started,
+                                         stop - start)
+
+    def readColumns(self, first, last):
+        """Read the columns of the page that have not been read yet.
+
+        Fixed format frames are always read as a whole.
+
+        :param first:
+            the first column being read.
+        :param last:
+            the column where the range stops (not included).
+        """
+
+        missing = [col for col in range(first, last)
+                   if col not in self._values]
+        if not missing and self._page_index is not None:
+            return
+
+        started = time.perf_counter()
+        frame = None
+        if self._projection:
+            frame = self._hstore.select(
+                self._pgroup, start=self.start, stop=self._stop,
+                columns=[self._columns[col] for col in missing])
+        # Duplicated labels select more columns than requested
+        if frame is None or len(frame.columns) != len(missing):
+            frame = self._hstore.select(self._pgroup, start=self.start,
+                                        stop=self._stop)
+            missing = range(self.numcols)
+
+        nbytes = 0
+        for position, col in enumerate(missing):
+            series = frame.iloc[:, position]
+            if series.dtype.kind in 'Mm':
+                # Keep pandas timestamps (as returned by DataFrame.iat)
+                series = series.astype(object)
+            values = series.to_numpy()
+            self._values[col] = values
+            nbytes += values.nbytes
+        if self._page_index is None:
+            self._page_index = frame.index
+            self._index_names = [get_index_name(frame.index, i, 'I%s')
+                                 for i in range(self._nheaders[1])]
+        metrics.getMetrics().recordRead(time.perf_counter() - started, nbytes)
+
+    def setVisibleColumns(self, first, last):
+        """Keep in the page the columns visible in the view.
+
+        Columns at both sides of the visible ones are kept too, so that
+        scrolling horizontally doesn't read the frame at every step.
+
+        :param first:
+            the first visible column of the view.
+        :param last:
+            the last visible column of the view.
+        """
+
+        n_index = self._nheaders[1]
+        first = max(first - n_index, 0)
+        last = max(last - n_index, 0)
+        window_start, window_stop = self._col_window
+        if window_start <= first and last < window_stop:
+            return
+        margin = max(last - first + 1, buffer.MAX_FIELDS // 2)
+        window_start = max(first - margin, 0)
+        window_stop = min(last + margin + 1, self.numcols)
+        self._col_window = (window_start, window_stop)
+        if self._projection:
+            self._values = {col: values for col, values in self._values.items()
+                            if window_start <= col < window_stop}
+            self._strings = {col: strings
+                             for col, strings in self._strings.items()
+                             if col in self._values}
+        self.readColumns(window_start, window_stop)
+
+    def columnValues(self, col):
+        """The cells of a column of the page.
+
+        :param col:
+            the frame column.
+
+        :return:
+            a ``numpy`` array with the column cells.
+        """
+
+        values = self._values.get(col)
+        if values is None:
+            self.readColumns(col, col + 1)
+            values = self._values[col]
+        return values
+
+    def columnStrings(self, col):
+        """The formatted cells of a column of the page.
+
+        :param col:
+            the frame column.
+        """
+
+        strings = self._strings.get(col)
+        if strings is None:
+            values = self.columnValues(col)
+            started = time.perf_counter()
+            strings = formatColumn(values)
+            metrics.getMetrics().recordFormat(time.perf_counter() - started,
+                                              len(strings))
+            self._strings[col] = strings
+        return strings
+
+    def indexStrings(self, level):
+        """The formatted labels of a level of the page index.
+
+        :param level:
+            the index level.
+        """
+
+        strings = self._index_strings.get(level)
+        if strings is None:
+            index = self._page_index
+            if self._nheaders[1] > 1:
+                index = index.get_level_values(level)
+            strings = [str(label) for label in index]
+            self._index_strings[level] = strings
+        return strings
+
+    def columnLabels(self, col):
+        """The formatted labels of a frame column, one per column level.
+
+        :param col:
+            the frame column.
+        """
+        return self._column_labels[col]
+
+    def cellValue(self, row, col):
+        """The value of a cell of the page.
+
+        :param row:
+            the row of the cell in the page.
+        :param col:
+            the frame column of the cell.
+        """
+        return self.columnValues(col)[row]
+
+    def indexValue(self, row):
+        """The index label of a row of the page.
+
+        :param row:
+            the row in the page.
+        """
+        return self._page_index[row]
+
+    def loadColumns(self, start):
+        """Load a range of columns.
+
+        Frames are not paged along columns so there is nothing to do.
+
+        :param start:
+            the document column that is the first column of the range.
+        """
+
+    def locateRow(self, row):
+        """Load the chunk containing a given row of the frame.
+
+        :param row:
+            the frame row.
+
+        :return:
+            the row of the chunk that holds the frame row.
+        """
+
+        row = int(row)
+        if not 0 <= row < self.leaf_numrows:
+            raise ValueError(f'Row {row} out of range [0, {self.leaf_numrows})')
+        if not self.start <= row < self.start + self.numrows:
+            self.loadData(row - self.numrows // 2, self.numrows)
+        return row - self.start
 
     def get_corner_span(self):
         """Must return ``(row_span, col_span)`` tuple for the top-left cell."""
@@ -225,12 +482,12 @@ class DataFrameModel(QtCore.QAbstractTableModel):
         if role == Qt.DisplayRole:
             if orientation == Qt.Horizontal:
                 if is_header:
-                    return get_index_name(self._chunk.index, section, 'I%s')
+                    return self._index_names[section]
                 return str(section)
 
             if orientation == Qt.Vertical:
                 if is_header:
-                    return get_index_name(self._chunk.columns, section, 'C%s')
+                    return self._column_names[section]
                 return str(self.start + section)
 
         if role == Qt.FontRole and is_header:
@@ -249,7 +506,6 @@ class DataFrameModel(QtCore.QAbstractTableModel):
         """
         row, col = index.row(), index.column()
         n_columns, n_index = self._nheaders
-        df = self._chunk
 
         if not index.isValid() or not (0 <= row < (self.numrows + n_columns)):
             return None
@@ -262,10 +518,7 @@ class DataFrameModel(QtCore.QAbstractTableModel):
 
         if is_index:
             if role == Qt.DisplayRole:
-                val = df.index[row - n_columns]
-                if n_index > 1:
-                    val = val[col]
-                return str(val)
+                return self.indexStrings(col)[row - n_columns]
             if role == Qt.FontRole:
                 return _axis_font
             if role == Qt.TextAlignmentRole:
@@ -274,10 +527,7 @@ class DataFrameModel(QtCore.QAbstractTableModel):
 
         if is_columns:
             if role == Qt.DisplayRole:
-                val = df.columns[col - n_index]
-                if n_columns > 1:
-                    val = val[row]
-                return str(val)
+                return self.columnLabels(col - n_index)[row]
             if role == Qt.FontRole:
                 return _axis_font
             if role == Qt.TextAlignmentRole:
@@ -285,7 +535,7 @@ class DataFrameModel(QtCore.QAbstractTableModel):
             return
 
         if role == Qt.DisplayRole:
-            return str(self._chunk.iat[row - n_columns, col - n_index])
+            return self.columnStrings(col - n_index)[row - n_columns]
 
         # if role == Qt.TextAlignmentRole:
         #     return int(Qt.AlignLeft|Qt.AlignTop)
@@ -25,16 +25,21 @@ This module implements a buffer used to access the real data contained in
 By using this buffer we speed up the access to the stored data. As a
 consequence, views (widgets showing a tabular representation of the dataset)
 are painted much faster too.
+
+Rows are the lines of the filenode. They are located with the line index of
+the filenode (see :func:`vitables.filenodeutils.lineOffsets`) and read by
+seeking inside the filenode.
 """
 
-import linecache
 import logging
 import warnings
 
 import numpy as np
 import tables
+from tables.nodes import filenode
 
 from .. import utils as vtutils
+from . import readahead
 
 __docformat__ = 'restructuredtext'
 
@@ -75,7 +80,8 @@ class FilenodeBuffer:
         self.chunk = np.array([])
 
         vtapp = vtutils.getApp()
-        self.temp_filenode, self.total_rows = vtapp.filenodes_map[leaf]
+        self.offsets = vtapp.filenodes_map[leaf]
+        self.total_rows = len(self.offsets) - 1
 
     def __del__(self):
         """Release resources before destroying the buffer.
@@ -88,25 +94,29 @@ class FilenodeBuffer:
 
     def readBuffer(self, start, stop):
         """
-        Read the whole filenode in memory using the linecache module.
-        Data is returned as a Python list of byte strings.
+        Read a range of lines of the filenode.
+        Data is returned as a Python list of strings.
 
         :Parameters:
         :param start: the document row that is the first row of the chunk.
-        :param stop: the last row to read, inclusive.
+        :param stop: the row where the chunk stops (not included).
         """
 
-        # The line numbers of files read by linecache start with 1
-        if start == 0:
-            start += 1
+        start = max(start, 0)
         stop = min(stop, self.total_rows)
-
-        data = []
-        counter = start
-        while counter <= stop:
-            data.append(linecache.getline(self.temp_filenode, counter))
-            counter += 1
-        self.chunk = data
+        if start >= stop:
+            self.chunk = []
+            return
+
+        offsets = self.offsets[start:stop + 1]
+        with readahead.HDF5_LOCK:
+            with filenode.open_node(self.leaf, 'r') as f:
+                f.seek(int(offsets[0]))
+                data = f.read(int(offsets[-1] - offsets[0]))
+        bounds = (offsets - offsets[0]).tolist()
+        self.chunk = [
+            data[first:last].decode('utf-8', errors='replace')
+            for first, last in zip(bounds[:-1], bounds[1:])]
 
     def getCell(self, row, col):
         """
@@ -123,3 +133,17 @@ class FilenodeBuffer:
         # chunk = [row0, row1, row2, ..., rowN]
         # and columns can be read from a given row using indexing notation
         return self.chunk[row]
+
+    def getColumn(self, col, start, stop):
+        """
+        Returns a range of cells of a column of a 1D-array view.
+
+        :Parameters:
+        - `col`: the column to which the cells belong
+        - `start`: the first row of the range
+        - `stop`: the row where the range stops (not included)
+
+        :Returns: the list of cells in the given range
+        """
+
+        return self.chunk[start:stop]
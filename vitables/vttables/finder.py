@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module finds cells of the datasets displayed by views.
+
+Cells can be found by value, by substring (string cells only) or by a
+condition. Conditions are `numexpr` expressions: the columns of tables are
+referred to by their names and the cells of arrays by ``x``.
+
+Conditions on tables select whole rows: a matching row is found in the column
+of the cell where the search started. Column names are the only variables of
+conditions (nested columns are referred to by their ``parent/child`` paths) so
+conditions are evaluated the same way whatever the scan path.
+
+Datasets are scanned forward or backward from a given cell in blocks of rows
+aligned to the buffer pages, and every block is matched with vectorised
+operations. Blocks are bounded by `pagecache.BLOCK_BYTES`: they are smaller
+than a page if pages are bigger than that, and arrays wider than a block are
+read by windows of columns. Conditions on tables displayed in storage order
+are evaluated by `tables.Table.get_where_list` so column indexes are used.
+Scans run in a worker thread (see `FindWorker`) and can be cancelled.
+"""
+
+import collections
+import copy
+import functools
+import threading
+import weakref
+
+import numexpr
+import numpy as np
+import tables
+from qtpy import QtCore
+
+from . import pagecache, readahead
+
+__docformat__ = 'restructuredtext'
+
+#: The ways of matching cells.
+FIND_MODES = ('value', 'substring', 'condition')
+
+#: A find request. `column` is the dataset column searched by value or
+#: substring (None for searching every column).
+FindQuery = collections.namedtuple('FindQuery', ['text', 'mode', 'column'])
+
+
+def parseValue(text, dtype):
+    """Convert the searched text to the type of a column.
+
+    :Parameters:
+
+    - `text`: the searched text
+    - `dtype`: the `numpy` data type of the column
+
+    :Returns: the searched value
+    :Raises ValueError: if the text is not a value of the given type
+    """
+
+    kind = dtype.kind
+    text = text.strip() if kind not in 'SUO' else text
+    if kind == 'S':
+        return text.encode('utf-8')
+    if kind in 'UO':
+        return text
+    if kind == 'b':
+        booleans = {'true': True, '1': True, 'false': False, '0': False}
+        if text.lower() not in booleans:
+            raise ValueError(f'{text} is not a boolean')
+        return booleans[text.lower()]
+    if kind in 'iu':
+        return int(text.replace(',', '').replace('_', ''))
+    if kind == 'f':
+        return float(text)
+    if kind == 'c':
+        return complex(text.replace(' ', ''))
+    raise ValueError(f'cells of type {dtype} cannot be searched')
+
+
+def matchElements(values, query):
+    """Match the elements of an array with a value or a substring.
+
+    :Parameters:
+
+    - `values`: the array being matched
+    - `query`: the `FindQuery` being matched
+
+    :Returns: a boolean array with the shape of `values` (None if the
+      elements cannot match the query)
+    """
+
+    dtype = values.dtype
+    if dtype.names is not None:
+        # Nested columns are not searched
+        return None
+    if query.mode == 'substring':
+        if dtype.kind not in 'SU':
+            return None
+        return np.char.find(values, parseValue(query.text, dtype)) >= 0
+    try:
+        needle = parseValue(query.text, dtype)
+    except ValueError:
+        return None
+    if dtype.kind in 'fc' and np.isnan(needle):
+        return np.isnan(values)
+    return values == needle
+
+
+def matchValues(values, query):
+    """Match the cells of a table column with a value or a substring.
+
+    Cells with several elements match if any of their elements matches.
+
+    :Parameters:
+
+    - `values`: the cells being matched, an array of shape ``(rows, ...)``
+    - `query`: the `FindQuery` being matched
+
+    :Returns: a boolean vector with the matching rows (None if the cells
+      cannot match the query)
+    """
+
+    mask = matchElements(values, query)
+    if mask is not None and mask.ndim > 1:
+        mask = mask.reshape(mask.shape[0], -1).any(axis=1)
+    return mask
+
+
+def conditionVariables(table):
+    """The variables of conditions on the rows of a table.
+
+    :Parameter table: the `tables.Table` instance
+
+    :Returns: a dictionary mapping column paths to `tables.Column` instances
+    """
+
+    return {name: column for (name, column) in table.colinstances.items()
+            if isinstance(column, tables.Column)}
+
+
+class Finder:
+    """Find cells of a dataset displayed by a buffer.
+
+    Rows and columns are those of the view i.e. they follow the sort order
+    of tables and the displayed axes of arrays.
+
+    :Parameters:
+
+    - `rbuffer`: the `Buffer` of the view
+    - `query`: the `FindQuery` being found
+
+    :Raises ValueError: if the dataset cannot be searched with the query
+    """
+
+    def __init__(self, rbuffer, query):
+        """Setup the finder."""
+
+        self.rbuffer = rbuffer
+        self.leaf = rbuffer.leaf
+        self.query = query
+        self.nrows = rbuffer.total_nrows()
+        if query.mode not in FIND_MODES:
+            raise ValueError(f'Unknown find mode {query.mode}')
+        if not query.text:
+            raise ValueError('Nothing to find')
+
+        leaf = self.leaf
+        if isinstance(leaf, tables.Table):
+            self.ncols = len(leaf.colnames)
+        elif rbuffer.axes is not None:
+            self.ncols = int(leaf.shape[rbuffer.axes[1]])
+        else:
+            self.ncols = 1
+        if isinstance(leaf, tables.VLArray) and query.mode == 'condition':
+            raise ValueError('Conditions cannot be evaluated on VLArrays')
+
+        # Blocks are made of whole pages unless a page doesn't fit in a block
+        block_bytes = pagecache.BLOCK_BYTES
+        page_size = rbuffer.page_size
+        row_bytes = rbuffer.rowBytes(self.ncols) or 1
+        if row_bytes * page_size <= block_bytes:
+            self.block_rows = block_bytes // (row_bytes * page_size) * \
+                page_size
+        else:
+            self.block_rows = max(block_bytes // row_bytes, 1)
+
+        # Rows of arrays wider than a block are read by windows made of
+        # whole column pages
+        self.block_cols = self.ncols
+        if rbuffer.col_window is not None and row_bytes > block_bytes:
+            cell_bytes = rbuffer.rowBytes(1) or 1
+            col_page_size = rbuffer.col_page_size
+            self.block_cols = min(
+                max(block_bytes // (cell_bytes * col_page_size), 1) *
+                col_page_size, self.ncols)
+
+    def blocks(self, row, backward=False):
+        """The blocks of rows scanned from a given row.
+
+        :Parameters:
+
+        - `row`: the row where the scan starts (included)
+        - `backward`: True for scanning towards the first row
+
+        :Returns: an iterator of ``(start, stop)`` ranges
+        """
+
+        size = self.block_rows
+        if backward:
+            stop = row + 1
+            while stop > 0:
+                start = max((stop - 1) // size * size, 0)
+                yield start, stop
+                stop = start
+        else:
+            start = row
+            while start < self.nrows:
+                stop = min((start // size + 1) * size, self.nrows)
+                yield start, stop
+                start = stop
+
+    def readBlock(self, start, stop, col_start=None, col_stop=None):
+        """Read a block of rows as displayed by the view.
+
+        :Parameters:
+
+        - `start`: the first row of the block
+        - `stop`: the row where the block stops (not included)
+        - `col_start`: the first column read from arrays paged along columns
+          (every column is read if None)
+        - `col_stop`: the column where the read stops (not included)
+        """
+
+        rbuffer = self.rbuffer
+        with readahead.HDF5_LOCK:
+            if not self.leaf.shape:
+                return np.asarray(self.leaf.read()).reshape(1, 1)
+            data = pagecache.readSelection(
+                self.leaf,
+                rbuffer.rangeSelection(start, stop, col_start, col_stop))
+        if rbuffer.axes is not None:
+            data = rbuffer.orientPage(data)
+        return data
+
+    def matchBlock(self, start, stop):
+        """Match the cells of a block of rows.
+
+        :Parameters:
+
+        - `start`: the first row of the block
+        - `stop`: the row where the block stops (not included)
+
+        :Returns: a boolean matrix with the matching cells of the block or a
+          boolean vector with its matching rows (conditions on tables select
+          whole rows)
+        """
+
+        leaf = self.leaf
+        query = self.query
+        nrows = stop - start
+        if isinstance(leaf, tables.Table) and query.mode == 'condition' \
+                and self.rbuffer.sortby is None \
+                and self.rbuffer.coordinates is None:
+            with readahead.HDF5_LOCK:
+                coordinates = leaf.get_where_list(
+                    query.text, conditionVariables(leaf), start=start,
+                    stop=stop)
+            mask = np.zeros(nrows, dtype=bool)
+            mask[coordinates - start] = True
+            return mask
+
+        if self.block_cols < self.ncols:
+            mask = np.zeros((nrows, self.ncols), dtype=bool)
+            for col_start in range(0, self.ncols, self.block_cols):
+                col_stop = min(col_start + self.block_cols, self.ncols)
+                mask[:, col_start:col_stop] = self.matchCells(
+                    self.readBlock(start, stop, col_start, col_stop), nrows,
+                    col_stop - col_start)
+            return mask
+
+        data = self.readBlock(start, stop)
+        if isinstance(leaf, tables.Table):
+            if query.mode == 'condition':
+                # The same variables as get_where_list, read from the block
+                return numexpr.evaluate(
+                    query.text,
+                    local_dict={name: functools.reduce(
+                        lambda field, part: field[part], name.split('/'),
+                        data) for name in conditionVariables(leaf)},
+                    global_dict={})
+            mask = np.zeros((nrows, self.ncols), dtype=bool)
+            columns = range(self.ncols) if query.column is None \
+                else [query.column]
+            for column in columns:
+                matches = matchValues(data[leaf.colnames[column]], query)
+                if matches is not None:
+                    mask[:, column] = matches
+            return mask
+        if isinstance(leaf, tables.VLArray):
+            return np.array(
+                [self.matchRow(pagecache.decodeRow(leaf, row)) for row in data],
+                dtype=bool).reshape(nrows, 1)
+        return self.matchCells(data, nrows, self.ncols)
+
+    def matchCells(self, data, nrows, ncols):
+        """Match the cells of a block of an array.
+
+        :Parameters:
+
+        - `data`: the block as displayed by the view
+        - `nrows`: the number of rows of the block
+        - `ncols`: the number of columns of the block
+
+        :Returns: a boolean matrix with the matching cells of the block
+        """
+
+        query = self.query
+        # The elements of every cell are laid out along the last axis
+        cells = data.reshape(nrows, ncols, -1)
+        if query.mode == 'condition':
+            mask = numexpr.evaluate(query.text, local_dict={'x': cells})
+        else:
+            mask = matchElements(cells, query)
+            if mask is None:
+                raise ValueError(f'Cells of type {data.dtype} cannot match '
+                                 f'{query.text!r}')
+        return np.broadcast_to(mask, cells.shape).any(axis=2)
+
+    def matchRow(self, row):
+        """Match a row of a `VLArray`.
+
+        :Parameter row: the row being matched (an array or a Python object
+          for pseudo atoms)
+        """
+
+        query = self.query
+        if isinstance(row, np.ndarray):
+            mask = matchElements(row, query)
+            return mask is not None and bool(mask.any())
+        if query.mode == 'substring':
+            if isinstance(row, bytes):
+                return query.text.encode('utf-8') in row
+            return query.text in str(row)
+        return str(row) == query.text
+
+    def find(self, row, column, backward=False, inclusive=False,
+             progress=None, cancelled=None):
+        """Find the next matching cell.
+
+        Cells are scanned by rows, the columns of every row from left to
+        right.
+
+        :Parameters:
+
+        - `row`: the row of the cell where the scan starts
+        - `column`: the column of the cell where the scan starts
+        - `backward`: True for scanning towards the first row
+        - `inclusive`: True if the cell where the scan starts can match
+        - `progress`: a callable called with the percentage of scanned rows
+        - `cancelled`: a callable that returns True if the scan is cancelled
+
+        :Returns: the ``(row, column)`` of the matching cell or None if no
+          cell matches (or the scan is cancelled)
+        """
+
+        row = min(max(int(row), 0), max(self.nrows - 1, 0))
+        ncols = self.ncols
+        current = row * ncols + column
+        scanned = 0
+        total = row + 1 if backward else self.nrows - row
+        for start, stop in self.blocks(row, backward):
+            if cancelled is not None and cancelled():
+                return None
+            mask = self.matchBlock(start, stop)
+            if mask.ndim == 1:
+                # Matching rows are found in the current column
+                positions = (start + np.flatnonzero(mask)) * ncols + column
+            else:
+                positions = start * ncols + np.flatnonzero(mask)
+            if backward:
+                positions = positions[positions <= current if inclusive
+                                      else positions < current]
+                if positions.size:
+                    return divmod(int(positions[-1]), ncols)
+            else:
+                positions = positions[positions >= current if inclusive
+                                      else positions > current]
+                if positions.size:
+                    return divmod(int(positions[0]), ncols)
+            scanned += stop - start
+            if progress is not None:
+                progress(100 * scanned // max(total, 1))
+        return None
+
+
+class FindWorker(QtCore.QThread):
+    """Find a cell of a dataset in background.
+
+    Like the read-ahead worker, the search reads the dataset through its own
+    handle of the file. Files opened in a writable mode cannot be opened
+    twice so they are searched through the GUI handle.
+
+    :Parameters:
+
+    - `finder`: the `Finder` of the dataset
+    - `row`: the row of the cell where the scan starts
+    - `column`: the column of the cell where the scan starts
+    - `backward`: True for scanning towards the first row
+    - `inclusive`: True if the cell where the scan starts can match
+    """
+
+    progress = QtCore.Signal(int)
+    find_finished = QtCore.Signal(object, str)
+
+    def __init__(self, finder, row, column, backward=False, inclusive=False):
+        """Setup the worker."""
+
+        super(FindWorker, self).__init__()
+        self.finder = finder
+        self.start_cell = (row, column)
+        self.backward = backward
+        self.inclusive = inclusive
+        self.filename = finder.leaf._v_file.filename
+        self.nodepath = finder.leaf._v_pathname
+        self.mode = readahead.workerMode(finder.leaf._v_file)
+        self.cancel_event = threading.Event()
+        _workers.add(self)
+
+    def cancel(self):
+        """Stop the scan as soon as the current block is matched."""
+        self.cancel_event.set()
+
+    def isCancelled(self):
+        """Find out if the scan has been cancelled."""
+        return self.cancel_event.is_set()
+
+    def run(self):
+        """Scan the dataset and emit the matching cell (None if no cell
+        matches) and an error message (empty if the scan succeeded).
+        """
+
+        match, error = None, ''
+        h5file = None
+        try:
+            cell_finder = self.finder
+            if self.mode is not None:
+                with readahead.HDF5_LOCK:
+                    h5file = tables.open_file(self.filename, self.mode)
+                    cell_finder = copy.copy(self.finder)
+                    cell_finder.leaf = h5file.get_node(self.nodepath)
+            match = cell_finder.find(*self.start_cell, backward=self.backward,
+                                     inclusive=self.inclusive,
+                                     progress=self.progress.emit,
+                                     cancelled=self.cancel_event.is_set)
+        except Exception as e:
+            # Errors of the searched condition are reported like any other
+            error = str(e) or type(e).__name__
+        finally:
+            try:
+                if h5file is not None:
+                    with readahead.HDF5_LOCK:
+                        h5file.close()
+            finally:
+                self.find_finished.emit(match, error)
+
+
+# The workers of the searches. Running workers are referenced by the views
+# that started them
+_workers = weakref.WeakSet()
+
+
+def cancelWorkers(filename):
+    """Stop the searches of a file and wait for them.
+
+    :Parameter filename: the name of the file
+    """
+
+    for worker in list(_workers):
+        if worker.filename == filename and worker.isRunning():
+            worker.cancel()
+            worker.wait()
@@ -66,8 +66,10 @@ class LeafDelegate(QtWidgets.QStyledItemDelegate):
             model = index.model()
             buffer_start = model.start
             cell = index.model().selected_cell
+            col_start = getattr(model, 'col_start', 0)
             if ((index == cell['index']) and \
-                    (buffer_start != cell['buffer_start'])):
+                    ((buffer_start != cell['buffer_start']) or
+                     (col_start != cell.get('col_start', 0)))):
                 painter.save()
                 self.initStyleOption(option, index)
                 background = option.palette.color(QtGui.QPalette.Base)
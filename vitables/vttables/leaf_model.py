@@ -23,22 +23,85 @@ This module implements a model (in the `MVC` sense) for the real data stored
 in a `tables.Leaf`.
 """
 
+import collections
 import logging
+import time
 
 import tables
 from qtpy import QtCore
 
 import vitables.utils
-from vitables.vttables import buffer, filenodebuffer
+from vitables.vttables import buffer, filenodebuffer, metrics, pagecache, \
+    readahead, sorting
 
 __docformat__ = 'restructuredtext'
 
-#: The maximum number of rows to be read from the data source.
+#: The number of rows read from data sources whose row size is unknown.
 CHUNK_SIZE = 10000
 
+#: The minimum number of rows read from the data source. It is enough for
+#: filling the tallest views.
+MIN_CHUNK_SIZE = 256
+
+#: The maximum number of rows read from the data source.
+MAX_CHUNK_SIZE = 100000
+
+#: The fraction of the memory budget of a view used by the rows it displays.
+#: Chunks are copied from the cached pages and navigating around a chunk
+#: needs the pages of several chunks, so a chunk uses a fraction of it.
+CHUNK_FRACTION = 8
+
+#: The maximum number of columns of arrays to be read from the data source.
+COLUMN_CHUNK_SIZE = 256
+
+#: The number of rows of a column whose display strings are built at once.
+DISPLAY_BLOCK_SIZE = 256
+
+#: The number of `VLArray` rows formatted at once.
+VL_BATCH_ROWS = 32
+
+#: The maximum number of formatted `VLArray` rows kept by a model.
+MAX_VL_ROWS = 4096
+
 log = logging.getLogger(__name__)
 
 
+def memoryBudget():
+    """The amount of memory (in bytes) that the rows of every view can use.
+
+    It is set in the Preferences dialog.
+    """
+
+    vtapp = vitables.utils.getVTApp()
+    config = getattr(vtapp, 'config', None)
+    budget = getattr(config, 'view_memory_budget', None)
+    if budget is None:
+        return pagecache.MAX_BYTES
+    return budget * 2**20
+
+
+def chunkSize(row_bytes, budget=None):
+    """The number of rows read at once from a data source.
+
+    The number of rows depends on the row size so that the rows displayed
+    by a view fit in its memory budget.
+
+    :Parameters:
+
+    - `row_bytes`: the size (in bytes) of a row (None if unknown)
+    - `budget`: the memory budget of the view (the preferred one if None)
+
+    :Returns: the number of rows
+    """
+
+    if not row_bytes:
+        return CHUNK_SIZE
+    if budget is None:
+        budget = memoryBudget()
+    nrows = budget // (CHUNK_FRACTION * row_bytes)
+    return int(max(MIN_CHUNK_SIZE, min(nrows, MAX_CHUNK_SIZE)))
+
+
 class LeafModel(QtCore.QAbstractTableModel):
     """
     The model for real data contained in leaves.
@@ -51,6 +114,9 @@ class LeafModel(QtCore.QAbstractTableModel):
 
     :param parent:
         The parent of the model, passed as is in the superclass.
+    :param coordinates:
+        An `EArray` with the coordinates of the displayed rows of a table
+        (i.e. a query result). Rows are labeled with their coordinates.
     :attribute leaf:
         the underlying hdf5 data
     :attribute rbuffer:
@@ -59,14 +125,19 @@ class LeafModel(QtCore.QAbstractTableModel):
         the total number of rows in the underlying data
     :attribute numrows:
         The number of rows visible which equals the chunking-size.
+    :attribute leaf_numcols:
+        the total number of columns in the underlying data
     :attribute numcols:
-        The total number of columnss visible, equal to those visible.
+        The number of columns visible, equal to those visible except for
+        arrays with a huge number of columns.
     :attribute start:
         The zero-based starting index of the chunk within the total rows.
+    :attribute col_start:
+        The zero-based starting index of the chunk within the total columns.
 
     """
 
-    def __init__(self, leaf, parent=None):
+    def __init__(self, leaf, parent=None, coordinates=None):
         """Create the model.
         """
 
@@ -78,29 +149,35 @@ class LeafModel(QtCore.QAbstractTableModel):
             self.is_filenode = True
             self.rbuffer = filenodebuffer.FilenodeBuffer(leaf)
         else:
-            self.rbuffer = buffer.Buffer(leaf)
+            self.rbuffer = buffer.Buffer(leaf, coordinates=coordinates)
+            self.rbuffer.enableReadAhead()
+        self.coordinates = coordinates
+        # The labels of the rows of the current chunk (None if rows are
+        # labeled with their position)
+        self.row_labels = None
 
         self.leaf_numrows = self.rbuffer.total_nrows()
-        self.numrows = min(self.leaf_numrows, CHUNK_SIZE)
         self.start = 0
 
-        # The dataset number of columns doesn't use to be large so, we don't
-        # need set a maximum as we did with rows. The whole set of columns
-        # are displayed
+        # The dataset number of columns doesn't use to be large so, in
+        # general, the whole set of columns is displayed. Arrays can have a
+        # huge number of columns so they are displayed in chunks too
+        self.col_start = 0
         if isinstance(leaf, tables.Table):
             # Leaf is a PyTables table
             self.numcols = len(leaf.colnames)
-        elif isinstance(leaf, tables.EArray):
-            self.numcols = 1
+        elif not self.is_filenode and self.rbuffer.col_window is not None:
+            # The leaf will be displayed as a bidimensional matrix whose
+            # rows run along its main dimension
+            self.numcols = self.rbuffer.col_window[1]
         else:
-            # Leaf is some kind of PyTables array
-            shape = leaf.shape
-            if len(shape) > 1:
-                # The leaf will be displayed as a bidimensional matrix
-                self.numcols = shape[1]
-            else:
-                # The leaf will be displayed as a column vector
-                self.numcols = 1
+            # The leaf will be displayed as a column vector
+            self.numcols = 1
+        self.leaf_numcols = self.numcols
+        if not self.is_filenode and self.rbuffer.col_window is not None:
+            self.numcols = min(self.leaf_numcols, COLUMN_CHUNK_SIZE)
+            self.rbuffer.setColumnWindow(0, self.numcols)
+        self.numrows = min(self.leaf_numrows, self.chunkSize())
 
         #
         # Choose a format for cells
@@ -128,11 +205,37 @@ class LeafModel(QtCore.QAbstractTableModel):
         # Track selected cell
         self.selected_cell = {'index': QtCore.QModelIndex(), 'buffer_start': 0}
 
+        # The display strings of the current chunk. They are built by blocks
+        # of rows of a given column the first time one of its cells is painted
+        self.display_strings = {}
+
+        # Rows of VLArrays can be huge (long vectors, pickled objects) so
+        # they are decoded and formatted lazily, in small batches, after
+        # being painted with a summary. Formatted rows are keyed by their
+        # row in the dataset
+        self.lazy_rows = isinstance(leaf, tables.VLArray) and \
+            not self.is_filenode
+        self.row_strings = collections.OrderedDict()
+        self.pending_rows = set()
+
         # Populate the model with the first chunk of data
         self.loadData(0, self.numrows)
 
         super(LeafModel, self).__init__(parent)
 
+        self.format_timer = QtCore.QTimer(self)
+        self.format_timer.setSingleShot(True)
+        self.format_timer.setInterval(0)
+        self.format_timer.timeout.connect(self.formatPendingRows)
+        metrics.getMetrics().registerModel(self)
+
+    def privateMemory(self):
+        """Estimate the memory (in bytes) held by the display strings."""
+
+        return sum(metrics.stringsSize(strings)
+                   for strings in self.display_strings.values()) + \
+            metrics.stringsSize(list(self.row_strings.values()))
+
     def columnCount(self, parent=None):
         """The number of columns of the given model index.
 
@@ -182,8 +285,208 @@ class LeafModel(QtCore.QAbstractTableModel):
         actual_start = stop - self.numrows
         start = max(min(actual_start, start), 0)
 
+        started = time.perf_counter()
         self.rbuffer.readBuffer(start, stop)
+        metrics.getMetrics().recordFault(time.perf_counter() - started,
+                                         stop - start)
         self.start = start
+        self.display_strings = {}
+        if self.coordinates is not None:
+            with readahead.HDF5_LOCK:
+                self.row_labels = self.coordinates[start:stop]
+
+    def chunkSize(self):
+        """The number of rows read at once from the data source."""
+
+        if self.is_filenode:
+            return CHUNK_SIZE
+        return chunkSize(self.rbuffer.rowBytes())
+
+    def close(self):
+        """Release the resources used by the model buffer."""
+
+        self.format_timer.stop()
+        if not self.is_filenode:
+            self.rbuffer.close()
+
+    def locateRow(self, row):
+        """Load the chunk containing a given row of the dataset.
+
+        The chunk is centred around the row and, when possible, its first
+        row is aligned to the buffer pages, so the chunk is read at once.
+        Rows are Python integers so positions beyond 2**31 are exact.
+
+        :Parameter row: the dataset row
+
+        :Returns: the row of the chunk that holds the dataset row
+        """
+
+        row = int(row)
+        if not 0 <= row < self.leaf_numrows:
+            raise ValueError(f'Row {row} out of range [0, {self.leaf_numrows})')
+        if not self.start <= row < self.start + self.numrows:
+            start = max(row - self.numrows // 2, 0)
+            page_size = getattr(self.rbuffer, 'page_size', 1)
+            if row < start - start % page_size + self.numrows:
+                start -= start % page_size
+            self.loadData(start, self.numrows)
+        return row - self.start
+
+    def loadColumns(self, start):
+        """Load the model with a fresh range of columns from the buffer.
+
+        The range has always `numcols` columns.
+
+        :param start:
+            the document column that is the first column of the range.
+        """
+
+        start = max(min(start, self.leaf_numcols - self.numcols), 0)
+        self.rbuffer.setColumnWindow(start, start + self.numcols)
+        self.col_start = start
+        self.display_strings = {}
+
+    def canSlice(self):
+        """Find out if the dataset can be displayed by 2-D slices."""
+
+        return not self.is_filenode and self.rbuffer.canSlice()
+
+    def canSort(self, col):
+        """Find out if the rows can be sorted by a given column.
+
+        Only tables can be sorted, by their not nested columns. Rows
+        selected by coordinates are not sorted.
+
+        :Parameter col: the column of the model
+        """
+
+        return not self.is_filenode and self.coordinates is None and \
+            isinstance(self.leaf, tables.Table) and \
+            self.leaf.colnames[col] in self.leaf.colpathnames
+
+    def hasSortedIndex(self, col):
+        """Find out if a column has a completely sorted index.
+
+        :Parameter col: the column of the model
+        """
+
+        return self.canSort(col) and \
+            sorting.hasSortedIndex(self.leaf, self.leaf.colnames[col])
+
+    def sortOrder(self):
+        """The current order of the rows.
+
+        :Returns: a ``(column, descending)`` tuple or None if rows are
+          displayed in storage order
+        """
+
+        if self.is_filenode or self.rbuffer.sortby is None:
+            return None
+        return (self.leaf.colnames.index(self.rbuffer.sortby),
+                self.rbuffer.descending)
+
+    def setSortOrder(self, col=None, descending=False):
+        """Display the rows of a table sorted by a given column.
+
+        The column must have a completely sorted index (see
+        :meth:`vitables.vttables.buffer.Buffer.setSortOrder`). The model is
+        reset and the first chunk of rows in the new order is loaded.
+
+        :Parameters:
+
+        - `col`: the column of the model (None for the storage order)
+        - `descending`: True for sorting rows in descending order
+        """
+
+        sortby = None if col is None else self.leaf.colnames[col]
+        self.beginResetModel()
+        try:
+            self.rbuffer.setSortOrder(sortby, descending)
+            self.start = 0
+            self.selected_cell = {'index': QtCore.QModelIndex(),
+                                  'buffer_start': 0}
+            self.loadData(0, self.numrows)
+        finally:
+            self.endResetModel()
+
+    def setSlice(self, axes=None, indices=None):
+        """Display a 2-D slice of an array with more than two dimensions.
+
+        If only the indices of the fixed axes change then the displayed
+        region is kept. Otherwise the model is reset and views must be
+        rebuilt. See :meth:`vitables.vttables.buffer.Buffer.setSlice` for
+        details.
+
+        :Parameters:
+
+        - `axes`: a ``(row axis, column axis)`` tuple (None for displaying
+          the whole array)
+        - `indices`: a sequence with the index of every axis of the array
+
+        :Returns: True if the model has been reset
+        """
+
+        if axes is not None and self.rbuffer.indices is not None and \
+                tuple(axes) == self.rbuffer.axes:
+            self.rbuffer.setSlice(axes, indices)
+            self.rbuffer.setColumnWindow(self.col_start,
+                                         self.col_start + self.numcols)
+            self.loadData(self.start, self.numrows)
+            self.dataChanged.emit(
+                self.index(0, 0),
+                self.index(self.numrows - 1, self.numcols - 1))
+            return False
+
+        self.beginResetModel()
+        try:
+            self.rbuffer.setSlice(axes, indices)
+            self.leaf_numrows = self.rbuffer.total_nrows()
+            self.leaf_numcols = self.rbuffer.col_window[1]
+            self.numcols = min(self.leaf_numcols, COLUMN_CHUNK_SIZE)
+            self.start = 0
+            self.col_start = 0
+            self.rbuffer.setColumnWindow(0, self.numcols)
+            self.numrows = min(self.leaf_numrows, self.chunkSize())
+            self.selected_cell = {'index': QtCore.QModelIndex(),
+                                  'buffer_start': 0}
+            self.loadData(0, self.numrows)
+        finally:
+            self.endResetModel()
+        return True
+
+    def cellCoordinates(self, row, col):
+        """The coordinates in the dataset of a cell of the current chunk.
+
+        :Parameters:
+
+        - `row`: the row of the cell in the current chunk
+        - `col`: the column of the cell
+
+        :Returns: a tuple with the index of the cell in every displayed axis
+          (every axis of the array if it is being sliced)
+        """
+
+        row, col = int(self.start + row), int(self.col_start + col)
+        indices = getattr(self.rbuffer, 'indices', None)
+        if indices is None:
+            return (row, col)
+        coordinates = list(indices)
+        row_axis, col_axis = self.rbuffer.axes
+        coordinates[row_axis] = row
+        coordinates[col_axis] = col
+        return tuple(coordinates)
+
+    def setVisibleColumns(self, first, last):
+        """Tell the buffer which columns are displayed by the view.
+
+        :Parameters:
+
+        - `first`: the first visible column
+        - `last`: the last visible column
+        """
+
+        if not self.is_filenode:
+            self.rbuffer.setVisibleColumns(first, last)
 
     def get_corner_span(self):
         """Must return ``(row_span, col_span)`` tuple for the top-left cell."""
@@ -217,9 +520,11 @@ class LeafModel(QtCore.QAbstractTableModel):
             # the section numbers are used as horizontal labels
             if hasattr(self.leaf, 'description'):
                 return str(self.leaf.colnames[section])
-            return str(section)
+            return str(self.col_start + section)
 
         # Rows-labels
+        if self.row_labels is not None:
+            return str(self.row_labels[section])
         return str(self.start + section)
 
     def data(self, index, role=QtCore.Qt.DisplayRole):
@@ -239,14 +544,121 @@ class LeafModel(QtCore.QAbstractTableModel):
             return None
 
         if role == QtCore.Qt.DisplayRole:
-            cell = self.cell(row, col)
-            return self.formatContent(cell)
+            return self.displayString(row, col)
 
         if role == QtCore.Qt.TextAlignmentRole:
             return QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop
 
         return None
 
+    def displayString(self, row, col):
+        """Returns the formatted contents of a cell.
+
+        Qt repaints cells very often (on hovering, selecting, resizing...) so
+        the display strings are cached until new data are loaded.
+
+        :Parameters:
+
+        - `row`: the row of the cell in the current chunk
+        - `col`: the column of the cell
+        """
+
+        if self.lazy_rows:
+            return self.rowString(row)
+        block = row // DISPLAY_BLOCK_SIZE
+        strings = self.display_strings.get((col, block))
+        if strings is None:
+            strings = self.formatBlock(col, block)
+            self.display_strings[(col, block)] = strings
+        try:
+            return strings[row - block * DISPLAY_BLOCK_SIZE]
+        except IndexError:
+            return None
+
+    def rowString(self, row):
+        """Returns the formatted contents of a `VLArray` row.
+
+        Rows not formatted yet are displayed as a summary and formatted
+        as soon as the event loop is idle.
+
+        :Parameter row: the row of the cell in the current chunk
+        """
+
+        key = self.start + row
+        string = self.row_strings.get(key)
+        if string is not None:
+            self.row_strings.move_to_end(key)
+            return string
+        try:
+            summary = self.rbuffer.rowSummary(row)
+        except IndexError:
+            return None
+        self.pending_rows.add(key)
+        if not self.format_timer.isActive():
+            self.format_timer.start()
+        return summary
+
+    def formatPendingRows(self):
+        """Format a batch of the `VLArray` rows painted as a summary.
+
+        Rows that are not in the current chunk anymore are forgotten.
+        """
+
+        first, last = self.start, self.start + self.numrows
+        rows = sorted(key for key in self.pending_rows if first <= key < last)
+        batch = rows[:VL_BATCH_ROWS]
+        self.pending_rows = set(rows[VL_BATCH_ROWS:])
+        if not batch:
+            return
+        started = time.perf_counter()
+        for key in batch:
+            try:
+                string = self.formatContent(
+                    self.rbuffer.getCell(key - first, 0))
+            except Exception:
+                # Rows of pseudo atoms may not be decodable
+                vitables.utils.formatExceptionInfo()
+                string = self.rbuffer.rowSummary(key - first)
+            self.row_strings[key] = string
+            if len(self.row_strings) > MAX_VL_ROWS:
+                self.row_strings.popitem(last=False)
+        metrics.getMetrics().recordFormat(time.perf_counter() - started,
+                                          len(batch))
+        self.dataChanged.emit(self.index(batch[0] - first, 0),
+                              self.index(batch[-1] - first, 0))
+        if self.pending_rows:
+            self.format_timer.start()
+
+    def formatBlock(self, col, block):
+        """Format a block of cells of a column.
+
+        Cells of arrays are formatted at once by a vectorised formatter.
+
+        :Parameters:
+
+        - `col`: the column of the cells
+        - `block`: the index of the block of rows being formatted
+
+        :Returns: the list of display strings of the block
+        """
+
+        first = block * DISPLAY_BLOCK_SIZE
+        last = min(first + DISPLAY_BLOCK_SIZE, self.numrows)
+        try:
+            cells = self.rbuffer.getColumn(col, first, last)
+        except IndexError:
+            log.error(f'IndexError! buffer start: {self.start} rows, column: '
+                      f'{first}-{last}, {col}')
+            return []
+        started = time.perf_counter()
+        if self.formatContent is vitables.utils.formatArrayContent:
+            strings = vitables.utils.formatArrayColumn(cells)
+        else:
+            strings = [self.formatContent(cell) for cell in cells]
+        metrics.getMetrics().recordFormat(time.perf_counter() - started,
+                                          len(strings))
+        return strings
+
     def cell(self, row, col):
         """
         Returns the contents of a cell.
@@ -29,16 +29,24 @@ tabular way:
     - KD arrays are displayed in a MxN table.
     - tables are displayed in a MxN table with one field per column
 
+Tables can be displayed sorted by a column with a completely sorted index
+via the context menu of the horizontal header.
 """
 
 __docformat__ = 'restructuredtext'
 
+import logging
+
 from qtpy import QtCore, QtGui, QtWidgets
 
-from vitables.vttables import leaf_delegate, scrollbar
+from vitables.queries import indexing
+from vitables.vttables import leaf_delegate, scrollbar, sorting
 
 _aiv = QtWidgets.QAbstractItemView
 
+translate = QtWidgets.QApplication.translate
+log = logging.getLogger(__name__)
+
 
 class LeafView(QtWidgets.QTableView):
     """
@@ -60,6 +68,7 @@ class LeafView(QtWidgets.QTableView):
         self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
         self.tmodel = tmodel  # This is a MUST
         self.leaf_numrows = leaf_numrows = self.tmodel.leaf_numrows
+        self.leaf_numcols = leaf_numcols = self.tmodel.leaf_numcols
         self.selection_model = self.selectionModel()
         self.setSelectionMode(_aiv.SingleSelection)
         self.setSelectionBehavior(_aiv.SelectItems)
@@ -67,6 +76,7 @@ class LeafView(QtWidgets.QTableView):
         # Setup the actual vertical scrollbar
         self.setVerticalScrollMode(_aiv.ScrollPerItem)
         self.vscrollbar = self.verticalScrollBar()
+        self.hscrollbar = self.horizontalScrollBar()
 
         self.setModel(tmodel)
 
@@ -81,6 +91,22 @@ class LeafView(QtWidgets.QTableView):
             self.tricky_vscrollbar.setMinimum(0)
             self.interval_size = self.mapSlider2Leaf()
 
+        # Arrays with a huge number of columns use a customised horizontal
+        # scrollbar too
+        if leaf_numcols > tmodel.numcols:
+            self.setItemDelegate(leaf_delegate.LeafDelegate())
+            self.setHorizontalScrollMode(_aiv.ScrollPerItem)
+            self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
+            self.tricky_hscrollbar = scrollbar.ScrollBar(
+                self, QtCore.Qt.Horizontal)
+            self.max_col_value = self.tricky_hscrollbar.setMaxValue(
+                leaf_numcols - 1)
+            self.tricky_hscrollbar.setMinimum(0)
+            self.col_interval_size = 1
+            if self.max_col_value < leaf_numcols - 1:
+                self.col_interval_size = round(leaf_numcols /
+                                               self.max_col_value)
+
         # Setup the vertical header width
         self.vheader = QtWidgets.QHeaderView(QtCore.Qt.Vertical)
         self.setVerticalHeader(self.vheader)
@@ -105,6 +131,10 @@ class LeafView(QtWidgets.QTableView):
         if leaf_numrows > tmodel.numrows:
             self.tricky_vscrollbar.actionTriggered.connect(
                 self.navigateWithMouse)
+        if leaf_numcols > tmodel.numcols:
+            self.tricky_hscrollbar.valueChanged.connect(self.navigateColumns)
+            self.hscrollbar.valueChanged.connect(self.syncColumns)
+        self.hscrollbar.valueChanged.connect(self.updateVisibleColumns)
 
         (row_span, col_span) = tmodel.get_corner_span()
         # Check the left corner span to avoid the annoying console message
@@ -112,6 +142,41 @@ class LeafView(QtWidgets.QTableView):
         if (row_span > 1) | (col_span > 1):
             self.setSpan(0, 0, row_span, col_span)
 
+        # Rows of tables can be sorted via the horizontal header. The sort
+        # requested while the index of its column is being built, and the
+        # job building it
+        self.pending_sort = None
+        self.sort_job = None
+        if hasattr(tmodel, 'canSort'):
+            hheader = self.horizontalHeader()
+            hheader.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+            hheader.customContextMenuRequested.connect(self.showHeaderMenu)
+
+    def resizeEvent(self, event):
+        """Keep track of the visible columns when the view is resized.
+
+        :Parameter event: the QResizeEvent being processed
+        """
+
+        QtWidgets.QTableView.resizeEvent(self, event)
+        self.updateVisibleColumns()
+
+    def updateVisibleColumns(self):
+        """Tell the model which columns are visible in the viewport.
+
+        Models of wide tables read only the fields of the visible columns.
+        """
+
+        if not hasattr(self.tmodel, 'setVisibleColumns'):
+            return
+        first = self.columnAt(0)
+        last = self.columnAt(self.viewport().width() - 1)
+        if first < 0:
+            return
+        if last < 0:
+            last = self.tmodel.columnCount() - 1
+        self.tmodel.setVisibleColumns(first, last)
+
     def mapSlider2Leaf(self):
         """Setup the interval size.
 
@@ -163,6 +228,8 @@ class LeafView(QtWidgets.QTableView):
 
         self.vheader.headerDataChanged(
             QtCore.Qt.Vertical, 0, tmodel.numrows - 1)
+        self.horizontalHeader().headerDataChanged(
+            QtCore.Qt.Horizontal, 0, tmodel.numcols - 1)
         top_left = tmodel.index(0, 0)
         bottom_right = tmodel.index(tmodel.numrows - 1,
                                     tmodel.numcols - 1)
@@ -173,6 +240,41 @@ class LeafView(QtWidgets.QTableView):
         if (row_span > 1) | (col_span > 1):
             self.setSpan(0, 0, row_span, col_span)
 
+    def navigateColumns(self, value):
+        """Navigate the columns of arrays with a huge number of columns.
+
+        This slot is connected to the tricky horizontal scrollbar. If the
+        column mapped to the scrollbar value is not in the model then a
+        column fault happens and a new range of columns (centered around
+        that column) is loaded. Then the view is scrolled so that the
+        column becomes the first visible one.
+
+        :Parameter value: the value of the tricky horizontal scrollbar
+        """
+
+        model = self.tmodel
+        column = min(value * self.col_interval_size, self.leaf_numcols - 1)
+        visible = self.columnAt(self.viewport().width() - 1) - \
+            self.columnAt(0) + 1
+        if visible <= 0:
+            visible = model.numcols // 2
+        if (column < model.col_start) or \
+                (column + visible > model.col_start + model.numcols):
+            model.loadColumns(column - (model.numcols - visible) // 2)
+            self.updateView()
+        self.hscrollbar.setValue(column - model.col_start)
+
+    def syncColumns(self, value):
+        """Update the tricky horizontal scrollbar after a columns navigation.
+
+        :Parameter value: the value of the hidden horizontal scrollbar
+        """
+
+        column = self.tmodel.col_start + value
+        self.tricky_hscrollbar.blockSignals(True)
+        self.tricky_hscrollbar.setValue(round(column / self.col_interval_size))
+        self.tricky_hscrollbar.blockSignals(False)
+
     def navigateWithMouse(self, slider_action):
         """Navigate the view with the mouse.
 
@@ -438,7 +540,11 @@ class LeafView(QtWidgets.QTableView):
         :Parameter event: the QWheelEvent being processed
         """
 
-        if self.leaf_numrows > self.tmodel.numrows:
+        if (self.leaf_numcols > self.tmodel.numcols) and \
+                event.angleDelta().x():
+            # Horizontal wheeling is done by the tricky horizontal scrollbar
+            QtCore.QCoreApplication.sendEvent(self.tricky_hscrollbar, event)
+        elif self.leaf_numrows > self.tmodel.numrows:
             height = self.vheader.sectionSize(0)
             # The distance the wheel is rotated in eights of a degree.
             # For example: 120/8 = 15 so if delta is 120 then the wheel
@@ -509,15 +615,22 @@ class LeafView(QtWidgets.QTableView):
         :Parameter event: the key event being processed
         """
 
-        if self.tmodel.numrows < self.leaf_numrows:
-            key = event.key()
+        key = event.key()
+        columns_windowed = self.tmodel.numcols < self.leaf_numcols
+        rows_windowed = self.tmodel.numrows < self.leaf_numrows
+        if columns_windowed and \
+                (key in (QtCore.Qt.Key_Left, QtCore.Qt.Key_Right)):
+            event.accept()
+            self.horizontalKeyPressEvent(event)
+        elif (rows_windowed or columns_windowed) and \
+                (key in (QtCore.Qt.Key_Home, QtCore.Qt.Key_End)):
+            event.accept()
             if key == QtCore.Qt.Key_Home:
-                event.accept()
                 self.homeKeyPressEvent()
-            elif key == QtCore.Qt.Key_End:
-                event.accept()
+            else:
                 self.endKeyPressEvent()
-            elif key == QtCore.Qt.Key_Up:
+        elif rows_windowed:
+            if key == QtCore.Qt.Key_Up:
                 event.accept()
                 self.upKeyPressEvent(event)
             elif key == QtCore.Qt.Key_Down:
@@ -534,6 +647,231 @@ class LeafView(QtWidgets.QTableView):
         else:
             QtWidgets.QTableView.keyPressEvent(self, event)
 
+    def horizontalKeyPressEvent(self, event):
+        """Specialised handler for the cursor left/right key press events.
+
+        Used by arrays with a huge number of columns.
+
+        :Parameter event: the key event being processed
+        """
+
+        model = self.tmodel
+        current_index = self.currentIndex()
+        column = current_index.column()
+        if (event.key() == QtCore.Qt.Key_Right) and \
+                (column == model.numcols - 1) and \
+                (model.col_start + model.numcols < self.leaf_numcols):
+            dataset_column = model.col_start + column + 1
+        elif (event.key() == QtCore.Qt.Key_Left) and (column == 0) and \
+                (model.col_start > 0):
+            dataset_column = model.col_start - 1
+        else:
+            QtWidgets.QTableView.keyPressEvent(self, event)
+            return
+
+        # Column fault. The new range of columns is centered around the
+        # new current column
+        model.loadColumns(dataset_column - model.numcols // 2)
+        self.updateView()
+        index = model.index(current_index.row(),
+                            dataset_column - model.col_start)
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
+
+    def goToRow(self, row, column=None):
+        """Make current a cell of a given row of the dataset.
+
+        If the row is not in the model then the chunk containing it is
+        loaded with a single read, so any row can be reached even if the
+        tricky scrollbar cannot map it exactly.
+
+        :Parameters:
+
+        - `row`: the dataset row
+        - `column`: the dataset column of the cell (by default the column
+          of the current cell)
+
+        :Returns: the model index of the new current cell
+        """
+
+        model = self.tmodel
+        if column is None:
+            column = model.col_start + max(self.currentIndex().column(), 0)
+        column = min(max(int(column), 0), self.leaf_numcols - 1)
+        faulted = False
+        if not model.start <= int(row) < model.start + model.numrows:
+            faulted = True
+        row = model.locateRow(row)
+        if not model.col_start <= column < model.col_start + model.numcols:
+            model.loadColumns(column - model.numcols // 2)
+            faulted = True
+        if faulted:
+            self.updateView()
+        index = model.index(row, column - model.col_start)
+        self.setCurrentIndex(index)
+        self.scrollTo(index, _aiv.PositionAtCenter)
+
+        # Eventually synchronize the position of the visible scrollbars
+        # with the displayed data
+        if self.leaf_numrows > model.numrows:
+            self.syncView()
+        if self.leaf_numcols > model.numcols:
+            self.syncColumns(self.hscrollbar.value())
+        return index
+
+    def showHeaderMenu(self, position):
+        """Show the sorting menu of a column of the horizontal header.
+
+        :Parameter position: the position of the context menu request
+        """
+
+        hheader = self.horizontalHeader()
+        column = hheader.logicalIndexAt(position)
+        if column < 0 or not self.tmodel.canSort(column):
+            return
+        menu = QtWidgets.QMenu(self)
+        ascending = menu.addAction(translate(
+            'LeafView', 'Sort &Ascending', 'A header context menu entry'))
+        descending = menu.addAction(translate(
+            'LeafView', 'Sort &Descending', 'A header context menu entry'))
+        storage = menu.addAction(translate(
+            'LeafView', '&Storage Order', 'A header context menu entry'))
+        storage.setEnabled(self.tmodel.sortOrder() is not None)
+        chosen = menu.exec_(hheader.mapToGlobal(position))
+        if chosen is ascending:
+            self.sortRows(column)
+        elif chosen is descending:
+            self.sortRows(column, True)
+        elif chosen is storage:
+            self.sortRows(None)
+
+    def sortRows(self, column, descending=False):
+        """Display the rows sorted by a given column.
+
+        If the column has no completely sorted index then the user is
+        offered to build it in background. Rows are sorted once the index
+        is built.
+
+        :Parameters:
+
+        - `column`: the column of the model (None for the storage order)
+        - `descending`: True for sorting rows in descending order
+        """
+
+        model = self.tmodel
+        if column is not None and not model.hasSortedIndex(column):
+            self.offerSortedIndex(column, descending)
+            return
+        model.setSortOrder(column, descending)
+        hheader = self.horizontalHeader()
+        hheader.setSortIndicatorShown(column is not None)
+        if column is not None:
+            hheader.setSortIndicator(
+                column, QtCore.Qt.DescendingOrder if descending
+                else QtCore.Qt.AscendingOrder)
+        self.vheader.headerDataChanged(
+            QtCore.Qt.Vertical, 0, model.numrows - 1)
+        self.setCurrentIndex(model.index(0, max(column or 0, 0)))
+        self.scrollToTop()
+        if self.leaf_numrows > model.numrows:
+            self.valid_current_buffer = 0
+            self.tricky_vscrollbar.setValue(0)
+
+    def offerSortedIndex(self, column, descending):
+        """Offer to build the completely sorted index of a column.
+
+        :Parameters:
+
+        - `column`: the column of the model
+        - `descending`: True for sorting rows in descending order once
+          the index is built
+        """
+
+        table = self.tmodel.leaf
+        colname = table.colnames[column]
+        if not sorting.canIndex(table, colname):
+            log.error(translate(
+                'LeafView', 'Rows cannot be sorted by {0}: the column has no '
+                'completely sorted index and the file is read-only.',
+                'A sorting error').format(colname))
+            return
+        answer = QtWidgets.QMessageBox.question(
+            self, translate('LeafView', 'Sort rows',
+                            'Caption of the sorted index dialog'),
+            translate('LeafView', 'Column {0} has no completely sorted index.'
+                      '\nBuilding it can take a while on big tables. Build it '
+                      'in background?', 'Text of the sorted index dialog'
+                      ).format(colname))
+        if answer != QtWidgets.QMessageBox.Yes:
+            return
+        self.buildSortedIndex(column, descending)
+
+    def buildSortedIndex(self, column, descending):
+        """Build in background the completely sorted index of a column.
+
+        Rows are sorted once the index is built. Indexes are built by the
+        jobs of the :mod:`vitables.queries.indexing` module.
+
+        :Parameters:
+
+        - `column`: the column of the model
+        - `descending`: True for sorting rows in descending order
+
+        :Returns: the started `indexing.IndexJob` or None if the indexes of
+          the table are already being processed
+        """
+
+        table = self.tmodel.leaf
+        colname = table.colnames[column]
+        job = indexing.createIndexJob(table, [colname], 'csi')
+        if job is None:
+            log.error(translate(
+                'LeafView', 'Rows cannot be sorted by {0} while the indexes '
+                'of the table are being processed.',
+                'A sorting error').format(colname))
+            return None
+        self.pending_sort = (column, descending)
+        self.sort_job = job
+        job.job_finished.connect(self.sortedIndexBuilt)
+        job.start()
+        return job
+
+    def sortedIndexBuilt(self, error):
+        """Sort the rows once the index of the sorting column is built.
+
+        Rows are not sorted if the table has been closed meanwhile.
+
+        :Parameter error: the error raised by the index job (if any)
+        """
+
+        self.sort_job = None
+        column, descending = self.pending_sort
+        self.pending_sort = None
+        if not self.tmodel.leaf._v_isopen:
+            return
+        if error:
+            log.error(translate(
+                'LeafView', 'The sorted index of {0} cannot be built: {1}',
+                'A sorting error').format(
+                    self.tmodel.leaf.colnames[column], error))
+            return
+        self.sortRows(column, descending)
+
+    def closeEvent(self, event):
+        """Forget the sort pending when the view is closed.
+
+        The index being built is not cancelled, it is still useful for
+        other views of the table.
+
+        :Parameter event: the close event
+        """
+
+        if self.sort_job is not None:
+            self.sort_job.job_finished.disconnect(self.sortedIndexBuilt)
+            self.sort_job = None
+            self.pending_sort = None
+        super(LeafView, self).closeEvent(event)
+
     def homeKeyPressEvent(self):
         """Specialised handler for the `Home` key press event.
 
@@ -544,15 +882,17 @@ class LeafView(QtWidgets.QTableView):
         table_rows = model.numrows
         index = model.index(0, 0)
         # Update buffer if needed
-        if model.start > 0:
+        if model.start > 0 or model.col_start > 0:
             model.loadData(0, table_rows)
+            model.loadColumns(0)
             self.updateView()
         self.setCurrentIndex(index)
         self.scrollToTop()
 
         # Eventually synchronize the position of the visible scrollbar
         # the displayed data
-        self.tricky_vscrollbar.setValue(0)
+        if self.leaf_numrows > model.numrows:
+            self.tricky_vscrollbar.setValue(0)
 
     def endKeyPressEvent(self):
         """Specialised handler for the `End` key press event.
@@ -565,16 +905,19 @@ class LeafView(QtWidgets.QTableView):
         index = model.index(table_rows - 1, model.numcols - 1)
         # Update buffer if needed
         last_row = model.start + table_rows
-        if last_row < self.leaf_numrows:
+        last_column = model.col_start + model.numcols
+        if last_row < self.leaf_numrows or last_column < self.leaf_numcols:
             self.tmodel.loadData(self.leaf_numrows - table_rows,
                                  table_rows)
+            model.loadColumns(self.leaf_numcols - model.numcols)
             self.updateView()
         self.setCurrentIndex(index)
         self.scrollToBottom()
 
         # Eventually synchronize the position of the visible scrollbar
         # the displayed data
-        self.tricky_vscrollbar.setValue(self.max_value)
+        if self.leaf_numrows > model.numrows:
+            self.tricky_vscrollbar.setValue(self.max_value)
 
     def keyboardNavInfo(self):
         """Gives information about model, and current cell.
@@ -780,13 +1123,15 @@ class LeafView(QtWidgets.QTableView):
         """
 
         model = self.tmodel
-        if model.numrows < self.leaf_numrows:
+        if model.numrows < self.leaf_numrows or \
+                model.numcols < self.leaf_numcols:
             # Get the selected indexes from the QItemSelection object
             selection = selected.indexes()
             if len(selection):
                 model.selected_cell = {
                     'index': selection[0],
                     'buffer_start': model.start,
+                    'col_start': model.col_start,
                 }
         else:
             QtWidgets.QTableView.selectionChanged(self, selected, deselected)
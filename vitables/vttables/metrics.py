@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module collects performance metrics of the views of datasets.
+
+Buffers, models and the read-ahead worker report here how long reading and
+formatting data take, how much data are read and how often buffer faults
+happen. Together with the state of the shared page cache and the memory held
+by the open views, these metrics help to choose the chunkshape and
+compression settings of datasets.
+
+Metrics are collected by a single `Metrics` instance (see `getMetrics`) and
+can be exported as JSON.
+"""
+
+import collections
+import json
+import sys
+import threading
+import time
+import weakref
+
+from . import pagecache
+
+__docformat__ = 'restructuredtext'
+
+#: The upper bounds (in milliseconds) of the buckets of timing histograms.
+#: The last bucket is unbounded.
+BUCKETS = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000, 10000)
+
+
+def stringsSize(strings):
+    """Estimate the amount of memory (in bytes) used by a list of strings.
+
+    :Parameter strings: the list of strings being measured
+    """
+
+    return sys.getsizeof(strings) + sum(sys.getsizeof(string)
+                                        for string in strings)
+
+
+class Histogram:
+    """A histogram of durations with logarithmic buckets.
+
+    Durations are given in seconds and reported in milliseconds.
+    """
+
+    def __init__(self):
+        """Create an empty histogram."""
+
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, seconds):
+        """Add a duration to the histogram.
+
+        :Parameter seconds: the duration being added
+        """
+
+        milliseconds = seconds * 1000.
+        bucket = 0
+        while bucket < len(BUCKETS) and milliseconds > BUCKETS[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def mean(self):
+        """The mean duration in milliseconds."""
+        return self.total / self.count if self.count else 0.
+
+    def toDict(self):
+        """The histogram contents as a dictionary."""
+
+        return {
+            'bounds_ms': list(BUCKETS),
+            'counts': list(self.counts),
+            'count': self.count,
+            'total_ms': self.total,
+            'mean_ms': self.mean(),
+            'max_ms': self.max,
+        }
+
+
+class Metrics:
+    """Counters and timing histograms of the views of datasets.
+
+    Reads can be reported from any thread so every update is done under a
+    lock.
+    """
+
+    def __init__(self):
+        """Create empty metrics."""
+
+        self.lock = threading.Lock()
+        # The buffers and models of the open views (used for measuring their
+        # memory)
+        self.buffers = weakref.WeakSet()
+        self.models = weakref.WeakSet()
+        self.reset()
+
+    def reset(self):
+        """Reset every counter and histogram."""
+
+        with self.lock:
+            self.started = time.time()
+            self.reads = Histogram()
+            self.read_bytes = 0
+            self.background_reads = Histogram()
+            self.background_bytes = 0
+            self.faults = Histogram()
+            self.fault_rows = 0
+            self.fault_times = collections.deque()
+            self.formats = Histogram()
+            self.formatted_cells = 0
+            cache = pagecache.getCache()
+            self.cache_base = (cache.hits, cache.misses)
+
+    def register(self, rbuffer):
+        """Track the memory held by a buffer.
+
+        :Parameter rbuffer: the buffer being tracked
+        """
+
+        self.buffers.add(rbuffer)
+
+    def registerModel(self, model):
+        """Track the memory held by a model.
+
+        :Parameter model: the model being tracked
+        """
+
+        self.models.add(model)
+
+    def recordRead(self, seconds, nbytes, background=False):
+        """Report a read of the data source.
+
+        :Parameters:
+
+        - `seconds`: the read duration
+        - `nbytes`: the amount of data read
+        - `background`: True if the read has been done by the read-ahead
+        """
+
+        with self.lock:
+            if background:
+                self.background_reads.add(seconds)
+                self.background_bytes += nbytes
+            else:
+                self.reads.add(seconds)
+                self.read_bytes += nbytes
+
+    def recordFault(self, seconds, nrows):
+        """Report a buffer fault i.e. the load of a new chunk in a model.
+
+        :Parameters:
+
+        - `seconds`: the time spent loading the chunk
+        - `nrows`: the number of rows of the chunk
+        """
+
+        now = time.time()
+        with self.lock:
+            self.faults.add(seconds)
+            self.fault_rows += nrows
+            self.fault_times.append(now)
+            while self.fault_times and self.fault_times[0] < now - 60:
+                self.fault_times.popleft()
+
+    def recordFormat(self, seconds, ncells):
+        """Report the formatting of a block of cells.
+
+        :Parameters:
+
+        - `seconds`: the formatting duration
+        - `ncells`: the number of formatted cells
+        """
+
+        with self.lock:
+            self.formats.add(seconds)
+            self.formatted_cells += ncells
+
+    def faultsPerMinute(self):
+        """The number of buffer faults in the last minute."""
+
+        now = time.time()
+        with self.lock:
+            return sum(1 for when in self.fault_times if when >= now - 60)
+
+    def cacheStats(self):
+        """The state of the shared page cache.
+
+        :Returns: a dictionary with the hits, misses and hit ratio since the
+          last reset and the number of pages and bytes cached
+        """
+
+        cache = pagecache.getCache()
+        hits = cache.hits - self.cache_base[0]
+        misses = cache.misses - self.cache_base[1]
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.,
+            'pages': len(cache),
+            'bytes': cache.nbytes,
+            'max_bytes': cache.max_bytes,
+        }
+
+    def viewsMemory(self):
+        """The memory (in bytes) held by the open views.
+
+        Pages are shared by the views so they are counted once, as the
+        memory of the shared page cache. The memory held by every buffer
+        and model on its own (i.e. chunks joined from several pages and
+        display strings) is added to it.
+        """
+
+        views = list(self.buffers) + list(self.models)
+        return pagecache.getCache().nbytes + \
+            sum(view.privateMemory() for view in views)
+
+    def toDict(self):
+        """A snapshot of every metric as a dictionary."""
+
+        with self.lock:
+            snapshot = {
+                'started': self.started,
+                'timestamp': time.time(),
+                'reads': self.reads.toDict(),
+                'read_bytes': self.read_bytes,
+                'background_reads': self.background_reads.toDict(),
+                'background_bytes': self.background_bytes,
+                'faults': self.faults.toDict(),
+                'fault_rows': self.fault_rows,
+                'formats': self.formats.toDict(),
+                'formatted_cells': self.formatted_cells,
+            }
+        snapshot['faults_per_minute'] = self.faultsPerMinute()
+        snapshot['cache'] = self.cacheStats()
+        snapshot['views'] = {'count': len(self.buffers),
+                             'bytes': self.viewsMemory()}
+        return snapshot
+
+    def exportJSON(self, filepath):
+        """Save a snapshot of the metrics in a JSON file.
+
+        :Parameter filepath: the full path of the file being written
+        """
+
+        with open(filepath, 'w') as json_file:
+            json.dump(self.toDict(), json_file, indent=2)
+
+
+_metrics = None
+
+
+def getMetrics():
+    """Return the metrics collector, creating it if needed."""
+
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module implements a cache for the pages read by buffers.
+
+Browsing a huge dataset usually means moving back and forth around a given
+region of it. Keeping the most recently read pages in memory makes that kind
+of navigation much cheaper because going back to an already visited region
+doesn't require reading (and decompressing) it again.
+
+The cache follows a least recently used (LRU) eviction policy and is bounded
+both by a number of pages and by an amount of memory.
+
+Pages of tables are stored column-wise, as dictionaries mapping field names
+to arrays, so that they can hold just a subset of the table fields. Pages of
+`VLArrays` are lists of raw rows: rows of pseudo atoms (objects and strings)
+are decoded only when they are displayed (see `decodeRow`).
+
+A single cache is shared by every buffer of the application (see `getCache`)
+so views of the same dataset don't read and decompress the same pages
+independently. Its keys start with the file and node paths of the dataset so
+the pages of a node can be invalidated when the node is modified or its file
+is closed (see `invalidate`).
+"""
+
+import collections
+import sys
+
+import numpy as np
+import tables
+
+__docformat__ = 'restructuredtext'
+
+#: The default maximum number of pages kept in a cache.
+MAX_PAGES = 32
+
+#: The default maximum amount of memory (in bytes) used by a cache.
+MAX_BYTES = 256 * 2**20
+
+#: The maximum number of pages kept in the shared cache.
+SHARED_MAX_PAGES = 4096
+
+#: The default maximum amount of memory (in bytes) used by the shared cache.
+SHARED_MAX_BYTES = 1024 * 2**20
+
+#: The maximum amount of data (in bytes) read at once by the scans of whole
+#: datasets (i.e. finding cells and computing statistics).
+BLOCK_BYTES = 2**24
+
+
+def pageSize(page):
+    """Estimate the amount of memory (in bytes) used by a page.
+
+    Pages read from `VLArrays` are Python lists so their size is estimated
+    by adding the sizes of their elements.
+
+    :Parameter page: the page being measured
+    """
+
+    if isinstance(page, np.ndarray):
+        return page.nbytes
+    if isinstance(page, (list, tuple)):
+        return sys.getsizeof(page) + sum(pageSize(item) for item in page)
+    if isinstance(page, dict):
+        return sys.getsizeof(page) + \
+            sum(pageSize(item) for item in page.values())
+    nbytes = getattr(page, 'nbytes', None)
+    if nbytes is None:
+        nbytes = sys.getsizeof(page)
+    return nbytes
+
+
+#: A range of rows of a table in the order of a column with a completely
+#: sorted index (CSI). Rows in descending order are read in ascending order
+#: and reversed.
+SortedRows = collections.namedtuple('SortedRows',
+                                    ['sortby', 'start', 'stop', 'descending'])
+
+#: A range of rows of a table selected by their coordinates, kept in an
+#: `EArray` (i.e. the result of a query made of row coordinates).
+CoordinateRows = collections.namedtuple('CoordinateRows',
+                                        ['coordinates', 'start', 'stop'])
+
+
+def tablePage(records, fields=None):
+    """Build a table page from a set of records.
+
+    If only some fields are kept then they are copied so that the memory
+    used by the whole records can be released.
+
+    :Parameters:
+
+    - `records`: the structured array read from the table
+    - `fields`: the names of the fields kept in the page (all if None)
+
+    :Returns: a dictionary mapping field names to arrays
+    """
+
+    names = records.dtype.names
+    if fields is None or set(fields) >= set(names):
+        return {name: records[name] for name in names}
+    return {name: records[name].copy() for name in names if name in fields}
+
+
+def readSelection(leaf, selection, fields=None):
+    """Read a page of a dataset.
+
+    :Parameters:
+
+    - `leaf`: the dataset being read
+    - `selection`: a tuple of slices in the dataset axes, a `SortedRows`
+      range or a `CoordinateRows` range
+    - `fields`: the table fields kept in the page (None for arrays)
+
+    :Returns: the page contents
+    """
+
+    if isinstance(selection, CoordinateRows):
+        data = leaf.read_coordinates(
+            selection.coordinates[selection.start:selection.stop])
+    elif isinstance(selection, SortedRows):
+        if selection.descending:
+            nrows = leaf.nrows
+            data = leaf.read_sorted(selection.sortby, checkCSI=True,
+                                    start=nrows - selection.stop,
+                                    stop=nrows - selection.start)[::-1]
+        else:
+            data = leaf.read_sorted(selection.sortby, checkCSI=True,
+                                    start=selection.start,
+                                    stop=selection.stop)
+    elif isinstance(leaf, tables.VLArray):
+        data = readRawRows(leaf, selection[0].start, selection[0].stop)
+    elif isinstance(leaf, tables.Table):
+        rows = selection[0]
+        data = leaf.read(rows.start, rows.stop)
+    else:
+        data = leaf[selection]
+    if fields is not None:
+        data = tablePage(data, fields)
+    return data
+
+
+def readRawRows(leaf, start, stop):
+    """Read a range of rows of a `VLArray` without decoding them.
+
+    :Parameters:
+
+    - `leaf`: the `tables.VLArray` being read
+    - `start`: the first row of the range
+    - `stop`: the row where the range stops (not included)
+
+    :Returns: a list of ``numpy`` arrays (arrays of bytes for pseudo atoms)
+    """
+
+    start, stop, step = leaf._process_range_read(start, stop, 1)
+    if start >= stop:
+        return []
+    # VLArray.read would decode every row of pseudo atoms
+    return leaf._read_array(start, stop, step)
+
+
+def isPseudoAtom(atom):
+    """Find out if the rows of a `VLArray` with a given atom must be
+    decoded (i.e. the atom is an object, vlstring or vlunicode atom).
+
+    :Parameter atom: the atom of the `VLArray`
+    """
+    return not hasattr(atom, 'size')
+
+
+def decodeRow(leaf, row):
+    """Decode a raw row of a `VLArray` read by `readRawRows`.
+
+    :Parameters:
+
+    - `leaf`: the `tables.VLArray` the row belongs to
+    - `row`: the raw row
+
+    :Returns: the row as returned by `tables.VLArray.read`
+    """
+
+    if isPseudoAtom(leaf.atom):
+        return leaf.atom.fromarray(row)
+    return row
+
+
+class PageCache:
+    """A LRU cache of pages bounded by number of pages and memory usage.
+
+    The most recently stored page is never evicted, even if it alone
+    exceeds the memory budget, so a cache always can serve the page that
+    has just been read.
+
+    Pages can be stored in groups (i.e. the pages of a dataset in the shared
+    cache) whose keys and memory usage are kept up to date, so they are
+    known without scanning the whole cache.
+
+    :Parameters:
+
+    - `max_pages`: the maximum number of pages kept in the cache
+    - `max_bytes`: the maximum amount of memory used by the cached pages
+    """
+
+    def __init__(self, max_pages=MAX_PAGES, max_bytes=MAX_BYTES):
+        """Create an empty cache."""
+
+        self.max_pages = max(1, max_pages)
+        self.max_bytes = max_bytes
+        self.pages = collections.OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
+        # The group of every grouped page, and the keys and memory usage of
+        # every group
+        self.key_groups = {}
+        self.group_keys = {}
+        self.group_bytes = {}
+        # Counters useful for tuning the cache
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """The number of pages currently cached."""
+        return len(self.pages)
+
+    def __contains__(self, key):
+        """Find out if a page is cached without updating its LRU position."""
+        return key in self.pages
+
+    def get(self, key):
+        """Return a cached page or None if it is not cached.
+
+        A successful lookup makes the page the most recently used one.
+
+        :Parameter key: the key of the page being retrieved
+        """
+
+        page = self.pages.get(key)
+        if page is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.pages.move_to_end(key)
+        return page
+
+    def put(self, key, page, group=None):
+        """Store a page in the cache and evict pages if needed.
+
+        :Parameters:
+
+        - `key`: the key of the page being stored
+        - `page`: the page being stored
+        - `group`: the group of the page (None if it is not grouped)
+        """
+
+        self.discard(key)
+        size = pageSize(page)
+        self.pages[key] = page
+        self.sizes[key] = size
+        self.nbytes += size
+        if group is not None:
+            self.key_groups[key] = group
+            self.group_keys.setdefault(group, {})[key] = None
+            self.group_bytes[group] = self.group_bytes.get(group, 0) + size
+        self.evict()
+
+    def discard(self, key):
+        """Remove a page from the cache (if it is cached).
+
+        :Parameter key: the key of the page being removed
+        """
+
+        if key in self.pages:
+            del self.pages[key]
+            self.forget(key)
+
+    def forget(self, key):
+        """Update the memory usage and groups once a page is removed.
+
+        :Parameter key: the key of the removed page
+        """
+
+        size = self.sizes.pop(key)
+        self.nbytes -= size
+        group = self.key_groups.pop(key, None)
+        if group is None:
+            return
+        keys = self.group_keys[group]
+        del keys[key]
+        if keys:
+            self.group_bytes[group] -= size
+        else:
+            del self.group_keys[group]
+            del self.group_bytes[group]
+
+    def evict(self):
+        """Drop the least recently used pages until the cache fits its limits.
+        """
+
+        while len(self.pages) > 1 and (len(self.pages) > self.max_pages or
+                                       self.nbytes > self.max_bytes):
+            key, _ = self.pages.popitem(last=False)
+            self.forget(key)
+
+    def clear(self):
+        """Remove every page from the cache."""
+
+        self.pages.clear()
+        self.sizes.clear()
+        self.nbytes = 0
+        self.key_groups.clear()
+        self.group_keys.clear()
+        self.group_bytes.clear()
+
+    def groupKeys(self, group):
+        """The keys of the cached pages of a group.
+
+        :Parameter group: the group of the pages
+        """
+
+        return list(self.group_keys.get(group, ()))
+
+    def groupBytes(self, group):
+        """The amount of memory used by the cached pages of a group.
+
+        :Parameter group: the group of the pages
+        """
+
+        return self.group_bytes.get(group, 0)
+
+    def setMaxBytes(self, max_bytes):
+        """Change the memory budget of the cache.
+
+        :Parameter max_bytes: the maximum amount of memory used by the pages
+        """
+
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def discardMatching(self, predicate):
+        """Remove the pages whose keys fulfill a given condition.
+
+        :Parameter predicate: a callable returning True for the keys of the
+          pages being removed
+        """
+
+        for key in [key for key in self.pages if predicate(key)]:
+            self.discard(key)
+
+
+class LeafCache:
+    """The view of a shared cache restricted to the pages of a dataset.
+
+    Keys passed to and returned by this class are page keys. Keys of the
+    shared cache are made by prepending them a prefix that identifies the
+    dataset and the geometry of its pages. The prefix is computed by a
+    callable every time it is needed because the geometry of the pages can
+    change (i.e. when an array is sliced).
+
+    Pages are stored in the shared cache grouped by their prefix, so the
+    pages of the dataset and their memory usage are known without scanning
+    the shared cache. Hits and misses are counted per dataset.
+
+    :Parameters:
+
+    - `cache`: the shared `PageCache`
+    - `prefix`: a callable returning the key prefix of the dataset pages.
+      The first two items of the prefix are the file and node paths
+    """
+
+    def __init__(self, cache, prefix):
+        """Create the view."""
+
+        self.cache = cache
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_pages(self):
+        """The maximum number of pages kept in the shared cache."""
+        return self.cache.max_pages
+
+    @property
+    def max_bytes(self):
+        """The maximum amount of memory used by the shared cache."""
+        return self.cache.max_bytes
+
+    @property
+    def pages(self):
+        """A dictionary with the cached pages of the dataset."""
+
+        prefix = self.prefix()
+        size = len(prefix)
+        return {key[size:]: self.cache.pages[key]
+                for key in self.cache.groupKeys(prefix)}
+
+    @property
+    def nbytes(self):
+        """The amount of memory used by the cached pages of the dataset."""
+        return self.cache.groupBytes(self.prefix())
+
+    def __len__(self):
+        """The number of cached pages of the dataset."""
+        return len(self.cache.group_keys.get(self.prefix(), ()))
+
+    def __contains__(self, key):
+        """Find out if a page is cached without updating its LRU position."""
+        return self.prefix() + key in self.cache
+
+    def peek(self, key):
+        """Return a cached page without updating its LRU position.
+
+        :Parameter key: the key of the page being retrieved
+        """
+
+        return self.cache.pages.get(self.prefix() + key)
+
+    def get(self, key):
+        """Return a cached page or None if it is not cached.
+
+        :Parameter key: the key of the page being retrieved
+        """
+
+        page = self.cache.get(self.prefix() + key)
+        if page is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return page
+
+    def put(self, key, page):
+        """Store a page in the shared cache.
+
+        :Parameters:
+
+        - `key`: the key of the page being stored
+        - `page`: the page being stored
+        """
+
+        prefix = self.prefix()
+        self.cache.put(prefix + key, page, group=prefix)
+
+    def discard(self, key):
+        """Remove a page from the shared cache (if it is cached).
+
+        :Parameter key: the key of the page being removed
+        """
+
+        self.cache.discard(self.prefix() + key)
+
+    def clear(self):
+        """Remove every page of the dataset from the shared cache."""
+
+        filepath, nodepath = self.prefix()[:2]
+        invalidate(filepath, nodepath, self.cache)
+
+
+_shared_cache = None
+
+
+def getCache():
+    """Return the page cache shared by every buffer, creating it if needed."""
+
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = PageCache(SHARED_MAX_PAGES, SHARED_MAX_BYTES)
+    return _shared_cache
+
+
+def invalidate(filepath, nodepath=None, cache=None):
+    """Forget the cached pages of a node (and its descendants) or a file.
+
+    Must be called when a node is modified, moved or deleted and when a
+    file is closed.
+
+    :Parameters:
+
+    - `filepath`: the full path of the file
+    - `nodepath`: the full path of the node (every node of the file if None)
+    - `cache`: the cache being updated (the shared cache if None)
+    """
+
+    if cache is None:
+        cache = _shared_cache
+    if cache is None:
+        return
+    if nodepath is None or nodepath == '/':
+        cache.discardMatching(lambda key: key[0] == filepath)
+        return
+    children = nodepath.rstrip('/') + '/'
+    cache.discardMatching(
+        lambda key: key[0] == filepath and
+        (key[1] == nodepath or key[1].startswith(children)))
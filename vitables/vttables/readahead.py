@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module implements the read-ahead of pages for buffers.
+
+While the user browses a dataset, the pages that are likely to be needed next
+(the ones following and preceding the data currently displayed) are read in a
+worker thread so that they are already in the buffer cache when a buffer
+fault happens.
+
+`PyTables` is not thread safe so the worker never uses the file handles of the
+GUI thread. Instead it opens its own read-only handle for every file it reads
+from. Files opened by the GUI in a writable mode cannot be opened read-only a
+second time, so the read-ahead is disabled for them.
+
+The reads done by the worker and by buffers are serialized via `HDF5_LOCK`
+because the `HDF5` library itself may not be thread safe. Other background
+jobs (statistics scans, searches, index builds) take the lock too, but the
+rest of the GUI (the tree of databases, the property dialogs...) reads files
+without taking it.
+"""
+
+import atexit
+import itertools
+import logging
+import threading
+import time
+import weakref
+
+import tables
+from qtpy import QtCore
+
+from . import metrics, pagecache
+
+__docformat__ = 'restructuredtext'
+
+#: The lock serializing the access to the HDF5 library from several threads.
+HDF5_LOCK = threading.RLock()
+
+log = logging.getLogger(__name__)
+
+
+def workerMode(h5file):
+    """The mode used by the worker for opening a file.
+
+    `PyTables` doesn't allow to open in read-only mode a file already opened
+    in a writable mode, and a second writable handle of the same file is not
+    safe, so only files opened read-only by the GUI are opened by workers.
+
+    :Parameter h5file: the `tables.File` instance opened by the GUI
+
+    :Returns: the worker file mode or None if the file cannot be opened
+    """
+
+    return 'r' if h5file.mode == 'r' else None
+
+
+class ReadAheadWorker(QtCore.QObject):
+    """Read pages of datasets in a worker thread.
+
+    The worker keeps its own file handles, one per file being read.
+    """
+
+    page_read = QtCore.Signal(int, object, object)
+
+    def __init__(self):
+        """Setup the worker."""
+
+        super(ReadAheadWorker, self).__init__()
+        self.handles = {}
+        # The files that can be opened by the worker. Requests queued before
+        # a file is closed by the GUI must not open it again
+        self.allowed = set()
+
+    @QtCore.Slot(object)
+    def readPages(self, request):
+        """Read a sequence of pages and send them to the GUI thread.
+
+        :Parameter request: a tuple ``(key, filename, mode, nodepath, ranges,
+          fields)`` where `key` identifies the requesting buffer, `ranges` is
+          a sequence of ``(page, selection)`` tuples and `fields` are the
+          table fields being read (None for arrays)
+        """
+
+        key, filename, mode, nodepath, ranges, fields = request
+        for page, selection in ranges:
+            with HDF5_LOCK:
+                data = self.readRange(filename, mode, nodepath, selection,
+                                      fields)
+            if data is None:
+                return
+            self.page_read.emit(key, page, data)
+
+    def readRange(self, filename, mode, nodepath, selection, fields):
+        """Read a selection of a dataset using the worker file handles.
+
+        :Parameters:
+
+        - `filename`: the full path of the file being read
+        - `mode`: the mode used for opening that file
+        - `nodepath`: the full path of the dataset in the file
+        - `selection`: a tuple of slices in the dataset axes
+        - `fields`: the table fields being read (None for arrays)
+
+        :Returns: the read data or None if they cannot be read
+        """
+
+        if filename not in self.allowed:
+            return None
+        try:
+            h5file = self.handles.get(filename)
+            if h5file is None or not h5file.isopen:
+                h5file = tables.open_file(filename, mode)
+                self.handles[filename] = h5file
+            started = time.perf_counter()
+            data = pagecache.readSelection(h5file.get_node(nodepath),
+                                           selection, fields)
+            metrics.getMetrics().recordRead(time.perf_counter() - started,
+                                            pagecache.pageSize(data),
+                                            background=True)
+            return data
+        except Exception as e:
+            # Read-ahead is just an optimization. Buffers will read the
+            # page by themselves if needed
+            log.debug(f'Read-ahead of {filename}:{nodepath} failed: {e}')
+        return None
+
+    def closeFile(self, filename):
+        """Close the worker handle of a file (if any).
+
+        :Parameter filename: the full path of the file being closed
+        """
+
+        with HDF5_LOCK:
+            self.allowed.discard(filename)
+            h5file = self.handles.pop(filename, None)
+            if h5file is not None and h5file.isopen:
+                h5file.close()
+
+    def closeAll(self):
+        """Close every file handle of the worker."""
+
+        for filename in list(self.handles):
+            self.closeFile(filename)
+
+
+class ReadAhead(QtCore.QObject):
+    """Manage the read-ahead of pages for every registered buffer.
+
+    Buffers request pages via `requestPages`. The requests are queued to the
+    worker thread and the read pages are stored in the buffer caches from
+    the GUI thread.
+    """
+
+    pages_requested = QtCore.Signal(object)
+
+    def __init__(self):
+        """Start the worker thread."""
+
+        super(ReadAhead, self).__init__()
+        self.buffers = weakref.WeakValueDictionary()
+        self.keys = itertools.count()
+        self.thread = QtCore.QThread()
+        self.worker = ReadAheadWorker()
+        self.worker.moveToThread(self.thread)
+        self.pages_requested.connect(self.worker.readPages)
+        self.worker.page_read.connect(self.storePage)
+        self.thread.start(QtCore.QThread.LowPriority)
+
+    def register(self, rbuffer):
+        """Enable the read-ahead for a given buffer.
+
+        :Parameter rbuffer: the buffer being registered
+
+        :Returns: True if the read-ahead is available for the buffer
+        """
+
+        h5file = rbuffer.leaf._v_file
+        if workerMode(h5file) is None:
+            return False
+        with HDF5_LOCK:
+            self.worker.allowed.add(h5file.filename)
+        rbuffer.read_ahead_key = next(self.keys)
+        self.buffers[rbuffer.read_ahead_key] = rbuffer
+        return True
+
+    def unregister(self, rbuffer):
+        """Disable the read-ahead for a given buffer.
+
+        :Parameter rbuffer: the buffer being unregistered
+        """
+
+        self.buffers.pop(getattr(rbuffer, 'read_ahead_key', None), None)
+
+    def requestPages(self, rbuffer, ranges, fields=None):
+        """Queue the reading of some pages of a buffer data source.
+
+        :Parameters:
+
+        - `rbuffer`: the buffer requesting the pages
+        - `ranges`: a sequence of ``(page, selection)`` tuples
+        - `fields`: the table fields being read (None for arrays)
+        """
+
+        h5file = rbuffer.leaf._v_file
+        if fields is not None:
+            fields = tuple(fields)
+        self.pages_requested.emit((rbuffer.read_ahead_key, h5file.filename,
+                                   workerMode(h5file),
+                                   rbuffer.leaf._v_pathname, tuple(ranges),
+                                   fields))
+
+    def storePage(self, key, page, data):
+        """Give a page read by the worker to the buffer that requested it.
+
+        :Parameters:
+
+        - `key`: the key of the requesting buffer
+        - `page`: the page key
+        - `data`: the page contents
+        """
+
+        rbuffer = self.buffers.get(key)
+        if rbuffer is not None:
+            rbuffer.storePage(page, data)
+
+    def closeFile(self, filename):
+        """Release the worker file handle of a file being closed by the GUI.
+
+        :Parameter filename: the full path of the file being closed
+        """
+
+        self.worker.closeFile(filename)
+
+    def stop(self):
+        """Stop the worker thread and close its file handles.
+
+        The worker thread and handles are still available if the manager
+        has been deleted with the application that owned it.
+        """
+
+        if not isDeleted(self.thread) and self.thread.isRunning():
+            self.thread.quit()
+            self.thread.wait()
+        self.worker.closeAll()
+
+
+_read_ahead = None
+
+
+def isDeleted(qobject):
+    """Find out if the C++ object wrapped by a `QObject` has been deleted.
+
+    Objects with no parent are deleted with the application that created
+    them, while their Python wrappers can outlive it.
+
+    :Parameter qobject: the `QObject` instance
+    """
+
+    try:
+        qobject.objectName()
+    except RuntimeError:
+        return True
+    return False
+
+
+def getReadAhead():
+    """Return the read-ahead manager, creating it if needed.
+
+    A new manager is created if the current one has been deleted with the
+    application that owned it.
+    """
+
+    global _read_ahead
+    if _read_ahead is not None and isDeleted(_read_ahead):
+        _read_ahead.stop()
+        _read_ahead = None
+    if _read_ahead is None:
+        _read_ahead = ReadAhead()
+    return _read_ahead
+
+
+def stopReadAhead():
+    """Stop the read-ahead manager (if any) and close its file handles."""
+
+    if _read_ahead is not None:
+        _read_ahead.stop()
+
+
+atexit.register(stopReadAhead)
+
+
+def closeFile(filename):
+    """Release the read-ahead resources tied to a file being closed.
+
+    :Parameter filename: the full path of the file being closed
+    """
+
+    if _read_ahead is not None:
+        _read_ahead.closeFile(filename)
@@ -40,11 +40,14 @@ class ScrollBar(QScrollBar):
     """
     A specialised scrollbar for views of huge datasets.
 
-    :Parameter scrollbar: the scrollbar being hidden
+    :Parameters:
+
+    - `view`: the view whose scrollbar is being hidden
+    - `orientation`: the orientation of the scrollbar being hidden
     """
 
-    def __init__(self, view):
-        """Replace a vertical scrollbar with other one.
+    def __init__(self, view, orientation=Qt.Vertical):
+        """Replace a vertical (or horizontal) scrollbar with other one.
 
         After replacing, the ancestor widgets of `scrollbar` looks
         exactly the same, but the visible scrollbar is not currently
@@ -55,16 +58,27 @@ class ScrollBar(QScrollBar):
         self.view = view
         # Cheat the user hidding a scrollbar and displaying other one
         # that looks exactly the same
-        parent = view.vscrollbar.parent()
+        if orientation == Qt.Vertical:
+            hidden = view.vscrollbar
+            name = 'tricky_vscrollbar'
+        else:
+            hidden = view.hscrollbar
+            name = 'tricky_hscrollbar'
+        parent = hidden.parent()
         super(ScrollBar, self).__init__(parent)
-        view.vscrollbar.setVisible(False)
+        hidden.setVisible(False)
         parent.layout().addWidget(self)
-        self.setOrientation(Qt.Vertical)
-        self.setObjectName('tricky_vscrollbar')
+        self.setOrientation(orientation)
+        self.setObjectName(name)
 
     def event(self, e):
-        """Filter wheel events and send them to the table viewport. """
-        if (e.type() == QEvent.Wheel):
+        """Filter wheel events and send them to the table viewport.
+
+        Only vertical scrollbars filter wheel events. Horizontal ones handle
+        them as usual.
+        """
+        if (e.type() == QEvent.Wheel) and \
+                (self.orientation() == Qt.Vertical):
             self.view.wheelEvent(e)
             return True
         return QScrollBar.event(self, e)
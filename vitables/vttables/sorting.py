@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module provides the support for sorted views of tables.
+
+Tables are displayed sorted by a column only if that column has a completely
+sorted index (CSI): rows are then read page by page in the index order, so
+the table is never loaded in memory. Indexes of big tables take a while to be
+built so they are built in a worker thread by the index jobs of the
+:mod:`vitables.queries.indexing` module.
+"""
+
+from . import readahead
+
+__docformat__ = 'restructuredtext'
+
+
+def hasSortedIndex(table, colname):
+    """Find out if a table column has a completely sorted index.
+
+    :Parameters:
+
+    - `table`: the `tables.Table` instance
+    - `colname`: the name of the column
+
+    :Returns: True if rows can be read in the column order
+    """
+
+    if colname not in table.colpathnames:
+        return False
+    # Indexes can be being built in a worker thread
+    with readahead.HDF5_LOCK:
+        column = table.cols._f_col(colname)
+        return column.is_indexed and column.index.is_csi
+
+
+def canIndex(table, colname):
+    """Find out if a completely sorted index can be built for a column.
+
+    The file must be writable and the column must not be nested. The file
+    is not read, so the GUI never waits for index jobs here.
+
+    :Parameters:
+
+    - `table`: the `tables.Table` instance
+    - `colname`: the name of the column
+    """
+
+    return table._v_file.mode != 'r' and colname in table.colpathnames
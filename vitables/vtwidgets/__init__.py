@@ -17,4 +17,4 @@
 #
 #       Author:  Vicent Mas - vmas@vitables.org
 
-__all__ = ["nodenamedlg", "renamedlg", "zoom_cell"]
+__all__ = ["find_dlg", "nodenamedlg", "metrics_panel", "renamedlg", "slice_navigator", "zoom_cell"]
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module provides a dialog for finding cells of the displayed datasets.
+
+The user enters a value, a substring or a condition, picks the searched
+column (tables only) and the direction of the search.
+"""
+
+from qtpy import QtWidgets
+
+from ..vttables import finder
+
+__docformat__ = 'restructuredtext'
+
+translate = QtWidgets.QApplication.translate
+
+
+class FindDlg(QtWidgets.QDialog):
+    """
+    A dialog for entering the cells being found.
+
+    :Parameters:
+
+    - `parent`: the parent of this dialog
+    - `colnames`: the column names of a table (None for arrays)
+    - `query`: the last `FindQuery` (if any)
+    - `backward`: True if the last search was backward
+    """
+
+    def __init__(self, parent, colnames=None, query=None, backward=False):
+        """Create the dialog.
+        """
+
+        super(FindDlg, self).__init__(parent)
+        self.setWindowTitle(translate('FindDlg', 'Find',
+                                      'The Find dialog title'))
+        self.colnames = colnames
+
+        layout = QtWidgets.QFormLayout(self)
+        self.text_edit = QtWidgets.QLineEdit(self)
+        layout.addRow(translate('FindDlg', 'Find:', 'A Find dialog label'),
+                      self.text_edit)
+        self.mode_combo = QtWidgets.QComboBox(self)
+        self.mode_combo.addItems([
+            translate('FindDlg', 'Value', 'A find mode'),
+            translate('FindDlg', 'Substring', 'A find mode'),
+            translate('FindDlg', 'Condition', 'A find mode')])
+        self.mode_combo.setToolTip(translate(
+            'FindDlg', 'Conditions are numexpr expressions. Table columns are '
+            'referred to by their names and array cells by x, e.g. x > 0.5',
+            'The tooltip of the Find dialog modes'))
+        layout.addRow(translate('FindDlg', 'Match:', 'A Find dialog label'),
+                      self.mode_combo)
+        self.column_combo = QtWidgets.QComboBox(self)
+        self.column_combo.addItem(translate('FindDlg', 'All columns',
+                                            'An item of the columns combo'))
+        if colnames is not None:
+            self.column_combo.addItems(colnames)
+            layout.addRow(translate('FindDlg', 'Column:',
+                                    'A Find dialog label'),
+                          self.column_combo)
+        else:
+            self.column_combo.hide()
+        self.backward_check = QtWidgets.QCheckBox(
+            translate('FindDlg', 'Search backward', 'A Find dialog option'),
+            self)
+        layout.addRow(self.backward_check)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel,
+            self)
+        buttons.button(QtWidgets.QDialogButtonBox.Ok).setText(
+            translate('FindDlg', 'Find', 'The Find dialog button'))
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+        self.mode_combo.currentIndexChanged.connect(self.updateColumns)
+
+        if query is not None:
+            self.text_edit.setText(query.text)
+            self.mode_combo.setCurrentIndex(
+                finder.FIND_MODES.index(query.mode))
+            if query.column is not None:
+                self.column_combo.setCurrentIndex(query.column + 1)
+        self.backward_check.setChecked(backward)
+        self.text_edit.selectAll()
+        self.updateColumns()
+
+    def updateColumns(self):
+        """Conditions choose their own columns."""
+
+        self.column_combo.setEnabled(
+            finder.FIND_MODES[self.mode_combo.currentIndex()] != 'condition')
+
+    def query(self):
+        """The query entered by the user.
+
+        :Returns: a ``(FindQuery, backward)`` tuple
+        """
+
+        mode = finder.FIND_MODES[self.mode_combo.currentIndex()]
+        column = self.column_combo.currentIndex() - 1
+        if column < 0 or mode == 'condition':
+            column = None
+        return (finder.FindQuery(self.text_edit.text(), mode, column),
+                self.backward_check.isChecked())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module provides the widgets that display the performance metrics of
+views.
+
+A status bar label summarises the metrics and a dockable panel shows them in
+detail. The panel can export the metrics as JSON.
+"""
+
+import logging
+
+from qtpy import QtCore, QtWidgets
+
+from ..vttables import metrics
+
+__docformat__ = 'restructuredtext'
+
+translate = QtWidgets.QApplication.translate
+log = logging.getLogger(__name__)
+
+#: The refresh interval (in milliseconds) of the metrics widgets.
+REFRESH_INTERVAL = 1000
+
+
+def formatBytes(nbytes):
+    """Format an amount of bytes in a human readable way.
+
+    :Parameter nbytes: the amount of bytes
+    """
+
+    for unit in ('B', 'KiB', 'MiB'):
+        if nbytes < 1024:
+            return f'{nbytes:.0f} {unit}'
+        nbytes /= 1024.
+    return f'{nbytes:.1f} GiB'
+
+
+class MetricsLabel(QtWidgets.QLabel):
+    """
+    A status bar label summarising the metrics of views.
+
+    Clicking the label toggles the metrics panel.
+
+    :Parameters:
+
+    - `parent`: the parent of this widget
+    - `dock`: the metrics panel
+    """
+
+    def __init__(self, parent, dock):
+        """Create the label.
+        """
+
+        super(MetricsLabel, self).__init__(parent)
+        self.dock = dock
+        self.setObjectName('metrics status bar widget')
+        self.setToolTip(translate(
+            'MetricsLabel', 'Buffer faults per minute, mean read latency and '
+            'cache hit ratio of views. Click for details',
+            'The tooltip of the metrics status bar widget'))
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_INTERVAL)
+        self.refresh()
+
+    def refresh(self):
+        """Update the summary."""
+
+        snapshot = metrics.getMetrics().toDict()
+        self.setText(translate(
+            'MetricsLabel', 'Faults/min: {0}  Read: {1:.1f} ms  Hits: {2:.0%}',
+            'The metrics status bar widget').format(
+                snapshot['faults_per_minute'], snapshot['reads']['mean_ms'],
+                snapshot['cache']['hit_ratio']))
+
+    def mousePressEvent(self, event):
+        """Toggle the metrics panel.
+
+        :Parameter event: the event being processed
+        """
+
+        self.dock.setVisible(not self.dock.isVisible())
+
+
+class MetricsDock(QtWidgets.QDockWidget):
+    """
+    A dockable panel displaying the metrics of views.
+
+    :Parameter parent: the main window
+    """
+
+    def __init__(self, parent):
+        """Create the panel.
+        """
+
+        super(MetricsDock, self).__init__(
+            translate('MetricsDock', 'Metrics', 'The metrics panel title'),
+            parent)
+        self.setObjectName('MetricsDockWidget')
+        self.setFeatures(
+            QtWidgets.QDockWidget.DockWidgetClosable
+            | QtWidgets.QDockWidget.DockWidgetMovable
+            | QtWidgets.QDockWidget.DockWidgetFloatable)
+
+        widget = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(widget)
+        self.table = QtWidgets.QTableWidget(0, 2, widget)
+        self.table.setHorizontalHeaderLabels([
+            translate('MetricsDock', 'Metric', 'A metrics table header'),
+            translate('MetricsDock', 'Value', 'A metrics table header')])
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QtWidgets.QHBoxLayout()
+        export_button = QtWidgets.QPushButton(translate(
+            'MetricsDock', 'Export JSON...', 'A button of the metrics panel'),
+            widget)
+        reset_button = QtWidgets.QPushButton(translate(
+            'MetricsDock', 'Reset', 'A button of the metrics panel'), widget)
+        buttons.addStretch()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(export_button)
+        layout.addLayout(buttons)
+        self.setWidget(widget)
+
+        export_button.clicked.connect(self.exportMetrics)
+        reset_button.clicked.connect(self.resetMetrics)
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.toggleRefresh)
+
+    def toggleRefresh(self, visible):
+        """Refresh the panel only while it is visible.
+
+        :Parameter visible: True if the panel is visible
+        """
+
+        if visible:
+            self.refresh()
+            self.timer.start(REFRESH_INTERVAL)
+        else:
+            self.timer.stop()
+
+    def rows(self):
+        """The ``(metric, value)`` pairs displayed by the panel."""
+
+        snapshot = metrics.getMetrics().toDict()
+        reads = snapshot['reads']
+        background = snapshot['background_reads']
+        faults = snapshot['faults']
+        formats = snapshot['formats']
+        cache = snapshot['cache']
+        rows = [
+            (translate('MetricsDock', 'Reads', 'A metric'),
+             f"{reads['count']} ({formatBytes(snapshot['read_bytes'])})"),
+            (translate('MetricsDock', 'Read latency', 'A metric'),
+             f"{reads['mean_ms']:.2f} ms mean, {reads['max_ms']:.2f} ms max"),
+            (translate('MetricsDock', 'Read-ahead reads', 'A metric'),
+             f"{background['count']} "
+             f"({formatBytes(snapshot['background_bytes'])})"),
+            (translate('MetricsDock', 'Buffer faults', 'A metric'),
+             f"{faults['count']} ({snapshot['fault_rows']} rows)"),
+            (translate('MetricsDock', 'Faults per minute', 'A metric'),
+             f"{snapshot['faults_per_minute']}"),
+            (translate('MetricsDock', 'Fault latency', 'A metric'),
+             f"{faults['mean_ms']:.2f} ms mean, {faults['max_ms']:.2f} ms max"),
+            (translate('MetricsDock', 'Cells formatted', 'A metric'),
+             f"{snapshot['formatted_cells']} "
+             f"({formats['total_ms']:.1f} ms)"),
+            (translate('MetricsDock', 'Cache hits', 'A metric'),
+             f"{cache['hits']} / {cache['hits'] + cache['misses']} "
+             f"({cache['hit_ratio']:.0%})"),
+            (translate('MetricsDock', 'Cached pages', 'A metric'),
+             f"{cache['pages']} ({formatBytes(cache['bytes'])} of "
+             f"{formatBytes(cache['max_bytes'])})"),
+            (translate('MetricsDock', 'Memory held by views', 'A metric'),
+             f"{formatBytes(snapshot['views']['bytes'])} "
+             f"({snapshot['views']['count']} buffers)"),
+        ]
+        for name, histogram in ((translate('MetricsDock', 'Read', 'A metric'),
+                                 reads),
+                                (translate('MetricsDock', 'Fault', 'A metric'),
+                                 faults)):
+            bounds = [f'<={bound} ms' for bound in histogram['bounds_ms']]
+            bounds.append(f">{histogram['bounds_ms'][-1]} ms")
+            rows.append((
+                translate('MetricsDock', '{0} histogram',
+                          'A metric').format(name),
+                ', '.join(f'{bound}: {count}' for bound, count in
+                          zip(bounds, histogram['counts']) if count)))
+        return rows
+
+    def refresh(self):
+        """Update the displayed metrics."""
+
+        rows = self.rows()
+        self.table.setRowCount(len(rows))
+        for row, (name, value) in enumerate(rows):
+            self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(name))
+            self.table.setItem(row, 1, QtWidgets.QTableWidgetItem(value))
+        self.table.resizeColumnToContents(0)
+
+    def resetMetrics(self):
+        """Reset the collected metrics."""
+
+        metrics.getMetrics().reset()
+        self.refresh()
+
+    def exportMetrics(self):
+        """Save the collected metrics in a JSON file."""
+
+        filepath, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, translate('MetricsDock', 'Export metrics',
+                            'Caption of the metrics export dialog'),
+            'metrics.json',
+            translate('MetricsDock', 'JSON files (*.json)',
+                      'Filter of the metrics export dialog'))
+        if not filepath:
+            return
+        try:
+            metrics.getMetrics().exportJSON(filepath)
+        except OSError as e:
+            log.error(translate(
+                'MetricsDock', 'Metrics cannot be exported: {0}',
+                'A metrics export error').format(e))
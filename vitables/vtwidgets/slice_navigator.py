@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+#       Copyright (C) 2005-2007 Carabos Coop. V. All rights reserved
+#       Copyright (C) 2008-2024 Vicent Mas. All rights reserved
+#
+#       This program is free software: you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation, either version 3 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#       Author:  Vicent Mas - vmas@vitables.org
+
+"""
+This module provides a navigator for slicing arrays with more than two
+dimensions.
+
+The user picks the axes displayed as rows and columns of the view and fixes
+an index for every other axis, so the view displays a 2-D hyperslab of the
+array whose cells are scalars.
+"""
+
+from qtpy import QtCore, QtWidgets
+
+__docformat__ = 'restructuredtext'
+
+translate = QtWidgets.QApplication.translate
+
+
+class SliceNavigator(QtWidgets.QDialog):
+    """
+    A non modal dialog for browsing N-dimensional arrays by 2-D slices.
+
+    Changes are applied as soon as they are done.
+
+    :Parameters:
+
+    - `datasheet`: the `DataSheet` displaying the array being sliced
+    """
+
+    slice_changed = QtCore.Signal(object, object)
+
+    def __init__(self, datasheet):
+        """Create the navigator.
+        """
+
+        super(SliceNavigator, self).__init__(datasheet)
+        self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        self.shape = datasheet.leaf_model.leaf.shape
+        self.setWindowTitle(translate(
+            'SliceNavigator', 'Slice navigator: {0}',
+            'The navigator window title').format(datasheet.dbt_leaf.name))
+
+        rbuffer = datasheet.leaf_model.rbuffer
+        axes = rbuffer.axes
+        indices = rbuffer.indices or (0,) * len(self.shape)
+
+        layout = QtWidgets.QGridLayout(self)
+        self.rows_combo = QtWidgets.QComboBox(self)
+        self.columns_combo = QtWidgets.QComboBox(self)
+        for combo in (self.rows_combo, self.columns_combo):
+            combo.addItems([translate(
+                'SliceNavigator', 'Axis {0} ({1})',
+                'An item of the axes combos').format(axis, size)
+                for axis, size in enumerate(self.shape)])
+        self.rows_combo.setCurrentIndex(axes[0])
+        self.columns_combo.setCurrentIndex(axes[1])
+        layout.addWidget(QtWidgets.QLabel(translate(
+            'SliceNavigator', 'Rows:', 'A label of the navigator')), 0, 0)
+        layout.addWidget(self.rows_combo, 0, 1)
+        layout.addWidget(QtWidgets.QLabel(translate(
+            'SliceNavigator', 'Columns:', 'A label of the navigator')), 1, 0)
+        layout.addWidget(self.columns_combo, 1, 1)
+
+        # An index selector for every axis. Those of the displayed axes
+        # are disabled
+        self.spinboxes = []
+        for axis, size in enumerate(self.shape):
+            spinbox = QtWidgets.QSpinBox(self)
+            spinbox.setRange(0, max(size - 1, 0))
+            spinbox.setValue(indices[axis])
+            spinbox.setKeyboardTracking(False)
+            layout.addWidget(QtWidgets.QLabel(translate(
+                'SliceNavigator', 'Index of axis {0}:',
+                'A label of the navigator').format(axis)), axis + 2, 0)
+            layout.addWidget(spinbox, axis + 2, 1)
+            spinbox.valueChanged.connect(self.applySlice)
+            self.spinboxes.append(spinbox)
+
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        self.cells_button = buttons.addButton(
+            translate('SliceNavigator', 'Whole cells',
+                      'A button of the navigator'),
+            QtWidgets.QDialogButtonBox.ResetRole)
+        self.cells_button.setToolTip(translate(
+            'SliceNavigator',
+            'Display the array without slicing it (cells hold sub-arrays)',
+            'The tooltip of the Whole cells button'))
+        buttons.rejected.connect(self.close)
+        self.cells_button.clicked.connect(self.showCells)
+        layout.addWidget(buttons, len(self.shape) + 2, 0, 1, 2)
+
+        self.axes = (axes[0], axes[1])
+        self.rows_combo.currentIndexChanged.connect(self.changeRowsAxis)
+        self.columns_combo.currentIndexChanged.connect(self.changeColumnsAxis)
+        self.updateSpinBoxes()
+
+    def changeRowsAxis(self, axis):
+        """Display a given axis as rows.
+
+        If that axis is being displayed as columns then axes are swapped.
+
+        :Parameter axis: the new rows axis
+        """
+
+        self.changeAxes((axis, self.axes[1]), self.columns_combo)
+
+    def changeColumnsAxis(self, axis):
+        """Display a given axis as columns.
+
+        If that axis is being displayed as rows then axes are swapped.
+
+        :Parameter axis: the new columns axis
+        """
+
+        self.changeAxes((self.axes[0], axis), self.rows_combo)
+
+    def changeAxes(self, axes, other_combo):
+        """Update the displayed axes and apply the new slice.
+
+        :Parameters:
+
+        - `axes`: the new ``(rows axis, columns axis)`` tuple
+        - `other_combo`: the combo of the axis that has not been changed
+        """
+
+        if axes[0] == axes[1]:
+            # Swap the displayed axes
+            if other_combo is self.columns_combo:
+                axes = (axes[0], self.axes[0])
+            else:
+                axes = (self.axes[1], axes[1])
+            other_combo.blockSignals(True)
+            other_combo.setCurrentIndex(
+                axes[1] if other_combo is self.columns_combo else axes[0])
+            other_combo.blockSignals(False)
+        self.axes = axes
+        self.updateSpinBoxes()
+        self.applySlice()
+
+    def updateSpinBoxes(self):
+        """Enable the index selectors of the axes not being displayed."""
+
+        for axis, spinbox in enumerate(self.spinboxes):
+            spinbox.setEnabled(axis not in self.axes)
+
+    def applySlice(self):
+        """Ask the data sheet to display the selected slice."""
+
+        indices = tuple(spinbox.value() for spinbox in self.spinboxes)
+        self.slice_changed.emit(self.axes, indices)
+
+    def showCells(self):
+        """Ask the data sheet to display the whole array."""
+
+        self.slice_changed.emit(None, None)
@@ -20,14 +20,43 @@
 
 """
 Display recursively the content of a given cell of a view.
+
+Zoomed cells are displayed by a `QTableView` whose model (see `ZoomModel`)
+formats lazily just the visible elements, in blocks of rows that are cached.
+The elements are provided by a cell source: an `ArrayCell` for contents
+held in memory or a `HyperslabCell` for array cells read directly from disk,
+a few tiles at a time.
 """
 
+import collections
+import logging
+
+import tables
 from qtpy import QtCore, QtWidgets
 
 import vitables.utils
+from ..vttables import pagecache, readahead
 
 __docformat__ = 'restructuredtext'
 
+log = logging.getLogger(__name__)
+
+#: The number of rows of the blocks formatted at once.
+DISPLAY_BLOCK_SIZE = 256
+
+#: The maximum number of formatted blocks kept by a zoomed view.
+MAX_DISPLAY_BLOCKS = 512
+
+#: The maximum size (in bytes) of the tiles read from disk at once.
+TILE_BYTES = 2**22
+
+#: The maximum number of tiles kept in memory by a hyperslab.
+MAX_TILES = 16
+
+#: Cells bigger than this (in bytes) can be read directly from disk.
+DISK_READ_BYTES = 2**24
+
+
 def getArrayDimensions(shape):
     """
     Get the dimensions of the grid where the cell will be zoomed.
@@ -53,11 +82,385 @@ def getArrayDimensions(shape):
         nrows = shape[0]
         ncols = shape[1]
 
-    return (nrows, ncols)
+    return (int(nrows), int(ncols))
+
+
+class ArrayCell:
+    """
+    The source of a zoomed cell whose content is held in memory.
+
+    The cell content can be:
+
+    - a ``numpy`` scalar or array
+    - a ``numpy.void`` object or a structured array (nested table fields)
+      displayed with one column per field
+    - a `Python` list or tuple (`VLArray` rows with pseudo atoms)
+    - a `Python` string or any other `Python` object
+
+    :Parameter data: the content of the cell
+    """
+
+    def __init__(self, data):
+        """Setup the cell source."""
+
+        self.data = data
+        self.headers = None
+        dtype = getattr(data, 'dtype', None)
+        if dtype is not None and dtype.names is not None:
+            self.headers = list(dtype.names)
+            self.nrows, self.ncols = 1, len(self.headers)
+        elif hasattr(data, 'shape'):
+            self.nrows, self.ncols = getArrayDimensions(data.shape)
+        elif isinstance(data, (list, tuple)):
+            self.nrows, self.ncols = len(data), 1
+        else:
+            self.nrows = self.ncols = 1
+
+    def columnValues(self, col, first, last):
+        """The elements of a range of rows of a column.
+
+        :Parameters:
+
+        - `col`: the column of the elements
+        - `first`: the first row of the range
+        - `last`: the row where the range stops (not included)
+        """
+
+        data = self.data
+        if self.headers is not None:
+            return [data[self.headers[col]]]
+        if isinstance(data, (list, tuple)):
+            return data[first:last]
+        shape = getattr(data, 'shape', ())
+        if len(shape) == 1:
+            return data[first:last]
+        if len(shape) > 1:
+            return data[first:last, col]
+        return [data]
+
+    def formatValues(self, values):
+        """Format the elements of a column.
+
+        :Parameter values: the elements being formatted
+        """
+
+        if hasattr(self.data, 'shape'):
+            return vitables.utils.formatArrayColumn(values)
+        if isinstance(self.data, str):
+            return [vitables.utils.formatStringContent(value)
+                    for value in values]
+        return [str(vitables.utils.formatObjectContent(value))
+                for value in values]
+
+    def canZoom(self):
+        """Find out if the elements of the cell can be zoomed."""
+
+        if self.headers is not None:
+            return True
+        if hasattr(self.data, 'shape'):
+            return self.data.shape != ()
+        return isinstance(self.data, (list, tuple))
+
+    def cell(self, row, col):
+        """The source of an element of the cell.
+
+        :Parameters:
+
+        - `row`: the row of the element
+        - `col`: the column of the element
+        """
+
+        data = self.data
+        if self.headers is not None:
+            return ArrayCell(data[self.headers[col]])
+        if hasattr(data, 'shape') and len(data.shape) > 1:
+            return ArrayCell(data[row, col])
+        return ArrayCell(data[row])
+
+
+class HyperslabCell:
+    """
+    The source of a zoomed array cell read directly from disk.
+
+    The cell is an hyperslab of the array: the selection fixes some axes and
+    selects every element of the other (free) axes. Just the tiles of the
+    hyperslab being displayed are read.
+
+    :Parameters:
+
+    - `leaf`: the `tables.Array` the cell belongs to
+    - `selection`: a tuple with an integer for every fixed axis and
+      ``slice(None)`` for every free axis
+    """
+
+    def __init__(self, leaf, selection):
+        """Setup the cell source."""
+
+        self.leaf = leaf
+        self.selection = tuple(selection)
+        self.free_axes = [axis for axis, key in enumerate(self.selection)
+                          if isinstance(key, slice)]
+        self.shape = tuple(int(leaf.shape[axis]) for axis in self.free_axes)
+        self.headers = None
+        self.nrows, self.ncols = getArrayDimensions(self.shape)
+        self.tiles = collections.OrderedDict()
+
+        # Tiles are made of whole display blocks and as many columns as fit
+        element_bytes = leaf.atom.size
+        for length in self.shape[2:]:
+            element_bytes *= length
+        self.tile_columns = int(min(
+            max(TILE_BYTES // (DISPLAY_BLOCK_SIZE * element_bytes), 1),
+            self.ncols))
+
+    def tile(self, row_block, col_block):
+        """Read a tile of the hyperslab (unless it is cached).
+
+        :Parameters:
+
+        - `row_block`: the display block of the tile rows
+        - `col_block`: the number of the tile along the columns
+        """
+
+        key = (row_block, col_block)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        selection = list(self.selection)
+        first = row_block * DISPLAY_BLOCK_SIZE
+        selection[self.free_axes[0]] = slice(
+            first, min(first + DISPLAY_BLOCK_SIZE, self.nrows))
+        if len(self.free_axes) > 1:
+            first = col_block * self.tile_columns
+            selection[self.free_axes[1]] = slice(
+                first, min(first + self.tile_columns, self.ncols))
+        with readahead.HDF5_LOCK:
+            data = self.leaf[tuple(selection)]
+        self.tiles[key] = data
+        if len(self.tiles) > MAX_TILES:
+            self.tiles.popitem(last=False)
+        return data
+
+    def columnValues(self, col, first, last):
+        """The elements of a range of rows of a column.
+
+        The range must lie inside a display block.
+
+        :Parameters:
+
+        - `col`: the column of the elements
+        - `first`: the first row of the range
+        - `last`: the row where the range stops (not included)
+        """
+
+        row_block = first // DISPLAY_BLOCK_SIZE
+        offset = row_block * DISPLAY_BLOCK_SIZE
+        col_block = col // self.tile_columns
+        data = self.tile(row_block, col_block)
+        if len(self.shape) == 1:
+            return data[first - offset:last - offset]
+        return data[first - offset:last - offset,
+                    col - col_block * self.tile_columns]
+
+    def formatValues(self, values):
+        """Format the elements of a column.
+
+        :Parameter values: the elements being formatted
+        """
+        return vitables.utils.formatArrayColumn(values)
+
+    def canZoom(self):
+        """Find out if the elements of the cell can be zoomed."""
+        return True
+
+    def cell(self, row, col):
+        """The source of an element of the cell.
+
+        Elements with more than two free axes are hyperslabs too.
+
+        :Parameters:
+
+        - `row`: the row of the element
+        - `col`: the column of the element
+        """
+
+        if len(self.shape) > 2:
+            selection = list(self.selection)
+            selection[self.free_axes[0]] = row
+            selection[self.free_axes[1]] = col
+            return HyperslabCell(self.leaf, selection)
+        return ArrayCell(self.columnValues(col, row, row + 1)[0])
+
+
+def canReadCell(rbuffer):
+    """Find out if the cells of a view can be read directly from disk.
+
+    Cells of tables and of arrays with more than two dimensions (unless
+    they are being sliced) can be read.
+
+    :Parameter rbuffer: the `Buffer` of the view
+    """
+
+    if isinstance(rbuffer.leaf, tables.Table):
+        return True
+    return rbuffer.axes is not None and rbuffer.indices is None \
+        and len(rbuffer.leaf.shape) > 2
+
+
+def diskCell(rbuffer, row, col):
+    """Read a cell of a view directly from disk.
+
+    Table cells are read field by field so just the zoomed field of the
+    row is read. Array cells are read lazily as hyperslabs.
+
+    :Parameters:
+
+    - `rbuffer`: the `Buffer` of the view
+    - `row`: the row of the cell in the dataset as displayed by the view
+    - `col`: the column of the cell in the dataset
+
+    :Returns: the source of the cell
+    """
+
+    leaf = rbuffer.leaf
+    selection = rbuffer.rangeSelection(row, row + 1)
+    if not isinstance(leaf, tables.Table):
+        selection = list(selection)
+        row_axis, col_axis = rbuffer.axes
+        selection[row_axis] = row
+        selection[col_axis] = col
+        return HyperslabCell(leaf, selection)
+
+    field = leaf.colnames[col]
+    with readahead.HDF5_LOCK:
+        if isinstance(selection, pagecache.SortedRows):
+            start, stop = selection.start, selection.stop
+            if selection.descending:
+                start, stop = leaf.nrows - stop, leaf.nrows - start
+            data = leaf.read_sorted(selection.sortby, checkCSI=True,
+                                    field=field, start=start, stop=stop)
+        elif isinstance(selection, pagecache.CoordinateRows):
+            data = leaf.read_coordinates(
+                selection.coordinates[row:row + 1], field=field)
+        else:
+            data = leaf.read(row, row + 1, field=field)
+    return ArrayCell(data[0])
+
+
+class ZoomModel(QtCore.QAbstractTableModel):
+    """
+    A model over the source of a zoomed cell.
+
+    Elements are formatted by blocks of rows of a column, when they are
+    displayed for the first time. The most recently used blocks are cached.
+
+    :Parameters:
+
+    - `source`: the source of the zoomed cell
+    - `parent`: the parent of the model
+    """
+
+    def __init__(self, source, parent=None):
+        """Create the model."""
+
+        super(ZoomModel, self).__init__(parent)
+        self.source = source
+        self.display_strings = collections.OrderedDict()
+
+    def rowCount(self, index=QtCore.QModelIndex()):
+        """The number of rows of the zoomed cell.
+
+        :Parameter index: the parent index (always invalid for tables)
+        """
+
+        return 0 if index.isValid() else self.source.nrows
+
+    def columnCount(self, index=QtCore.QModelIndex()):
+        """The number of columns of the zoomed cell.
+
+        :Parameter index: the parent index (always invalid for tables)
+        """
+
+        return 0 if index.isValid() else self.source.ncols
+
+    def headerData(self, section, orientation, role):
+        """Returns the data for the given role and section in the header
+        with the specified orientation.
+
+        :Parameters:
+
+        - `section`: the header section being inspected
+        - `orientation`: the header orientation (horizontal or vertical)
+        - `role`: the role of the header section being inspected
+        """
+
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal and self.source.headers:
+            return self.source.headers[section]
+        return str(section)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """Returns the data stored under the given role for the item
+        referred to by the index.
+
+        :Parameters:
+
+        - `index`: the index of a data item
+        - `role`: the role being returned
+        """
+
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.DisplayRole:
+            return self.displayString(index.row(), index.column())
+        if role == QtCore.Qt.TextAlignmentRole:
+            return int(QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop)
+        return None
+
+    def displayString(self, row, col):
+        """The formatted content of an element.
+
+        :Parameters:
+
+        - `row`: the row of the element
+        - `col`: the column of the element
+        """
+
+        block = row // DISPLAY_BLOCK_SIZE
+        key = (col, block)
+        strings = self.display_strings.get(key)
+        if strings is None:
+            strings = self.formatBlock(col, block)
+            self.display_strings[key] = strings
+            if len(self.display_strings) > MAX_DISPLAY_BLOCKS:
+                self.display_strings.popitem(last=False)
+        else:
+            self.display_strings.move_to_end(key)
+        return strings[row - block * DISPLAY_BLOCK_SIZE]
+
+    def formatBlock(self, col, block):
+        """Format a block of rows of a column.
+
+        :Parameters:
+
+        - `col`: the column of the block
+        - `block`: the number of the block
+        """
+
+        first = block * DISPLAY_BLOCK_SIZE
+        last = min(first + DISPLAY_BLOCK_SIZE, self.source.nrows)
+        try:
+            values = self.source.columnValues(col, first, last)
+        except tables.HDF5ExtError as e:
+            log.error(f'Cells of the zoomed view cannot be read: {e}')
+            return [''] * (last - first)
+        return self.source.formatValues(values)
+
 
 class ZoomCell(QtWidgets.QMdiSubWindow):
     """
-    Display an array/table cell on its own view (table widget).
+    Display an array/table cell on its own view.
 
     When a leaf is displayed in a view, is quite usual that the content
     of some cells is not fully visible because it doesn't fit into
@@ -79,9 +482,13 @@ class ZoomCell(QtWidgets.QMdiSubWindow):
     - a `numpy.void` object when the cell corresponds to nested field of the
         record
 
+    Contents are displayed lazily by a `ZoomModel` so cells with millions of
+    elements can be zoomed.
+
     :Parameters:
 
-        - `data`: the value stored in the cell being zoomed
+        - `data`: the value stored in the cell being zoomed or its source
+          (an `ArrayCell` or a `HyperslabCell`)
         - `title`: the base string for the zoomed view title
         - `workspace`: the parent of the zoomed view
         - `leaf`: a LeafNode instance
@@ -90,17 +497,14 @@ class ZoomCell(QtWidgets.QMdiSubWindow):
     def __init__(self, data, title, workspace, leaf):
         """
         Creates a zoom view for a given cell.
-
-        The passed cell is an element of a given dataset. It is always
-        a (potentially nested) `numpy` array. See cell accessor methods
-        in the `Buffer` class for details.
         """
 
-        self.data = data
+        if isinstance(data, (ArrayCell, HyperslabCell)):
+            self.source = data
+        else:
+            self.source = ArrayCell(data)
         self.title = title
         self.workspace = workspace
-        self.data_shape = self.hasShape()
-        self.field_names = []
 
         # Create and customise the widget that will display the zoomed cell
         # The pindex attribute is required to keep working the code for
@@ -118,205 +522,48 @@ class ZoomCell(QtWidgets.QMdiSubWindow):
         self.dbt_leaf = leaf
         self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
         # The internal widget
-        self.grid = QtWidgets.QTableWidget()
+        self.grid = QtWidgets.QTableView()
+        self.model = ZoomModel(self.source, self.grid)
+        self.grid.setModel(self.model)
+        self.grid.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        # Fixed size rows keep the vertical header fast for long cells
+        self.grid.verticalHeader().setSectionResizeMode(
+            QtWidgets.QHeaderView.Fixed)
         self.setWidget(self.grid)
         # Configure the titlebar
         self.setWindowTitle(self.title)
         icons_dictionary = vitables.utils.getIcons()
         self.setWindowIcon(icons_dictionary['zoom-in'])
 
-        # Decide how the cell content will be formatted. Content can be:
-        # - a numpy array
-        # - either a string or a unicode string
-        # - other Python object
-        if self.data_shape:
-            self.formatContent = vitables.utils.formatArrayContent
-        elif isinstance(self.data, str):
-            self.formatContent = vitables.utils.formatStringContent
-        else:
-            self.formatContent = vitables.utils.formatObjectContent
-
-        # Setup grid dimensions
-        (nrows, ncols) = self.getGridDimensions()
-        self.grid.setColumnCount(ncols)
-        self.grid.setRowCount(nrows)
-
-        # Setup grid editing
-        self.grid.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
-
-        # Setup grid horizontal header
-        if self.field_names:
-            for section in range(0, ncols):
-                item = QtWidgets.QTableWidgetItem()
-                item.setText(self.field_names[section])
-                self.grid.setHorizontalHeaderItem(section, item)
-        else:
-            for section in range(0, ncols):
-                item = QtWidgets.QTableWidgetItem()
-                item.setText(f'{section}')
-                self.grid.setHorizontalHeaderItem(section, item)
-
-        # Setup grid vertical header
-        for section in range(0,nrows):
-            item = QtWidgets.QTableWidgetItem()
-            item.setText(f'{section}')
-            self.grid.setVerticalHeaderItem(section, item)
-
-        # Fill the grid
-        if self.field_names:
-            self.zoomTable()
-        else:
-            self.zoomArray()
-
         self.show()
 
         rmode = QtWidgets.QHeaderView.Stretch
-        if self.grid.columnCount() == 1:
+        if self.source.ncols == 1:
             self.grid.horizontalHeader().setSectionResizeMode(rmode)
-        if self.grid.rowCount() == 1:
+        if self.source.nrows == 1:
             self.grid.verticalHeader().setSectionResizeMode(rmode)
 
         # Connect signals to slots
-        self.grid.cellDoubleClicked.connect(self.zoomView)
-
-
-    def hasShape(self):
-        """Find out if the zoomed cell has a shape attribute."""
-        return hasattr(self.data, 'shape')
-
-
-    def getGridDimensions(self):
-        """
-        Get the dimensions of the grid where the zoomed cell will be displayed.
-
-        :Returns: a tuple (rows, columns)
-        """
-
-        if self.data_shape:
-            # The cell contains a numpy object
-            shape = self.data.shape
-            dtype = self.data.dtype
-            if dtype.fields is None:
-                # Arrays with nested fields come here
-                return getArrayDimensions(shape)
-            else:
-                # Table nested fields come here
-                return self.getNestedFieldDimensions()
-        else:
-            # The cell contains a Python object
-            return self.getPyObjectDimensions()
-
-
-    def getPyObjectDimensions(self):
-        """
-        Get the dimensions of the grid where the cell will be zoomed.
+        self.grid.doubleClicked.connect(self.zoomView)
 
-        The zoomed cell contains a `Python` object.
-
-        :Returns: a tuple (rows, columns)
-        """
-
-        if isinstance(self.data, list) or isinstance(self.data, tuple):
-            return (len(self.data), 1)
-        else:
-            return (1, 1)
-
-
-    def getNestedFieldDimensions(self):
-        """
-        Get the dimensions of the grid where the cell will be zoomed.
-
-        The zoomed cell contains a nested field (a field made of inner
-        fields, than can be nested or not) and will be displayed in a
-        table with only one row and one column per (top - 1) level field.
-
-        The dtype.descr attribute describes the inner fields. A field
-        description is a tuple with one of the following formats:
-
-        - (field_name, format)  field is not nested, shape=()
-        - (field_name, format, shape)   field is not nested, shape!=()
-        - (field_name, descr)   field is nested
-
-        :Returns: a tuple (rows, columns)
-        """
-
-        self.field_names = [item[0] for item in self.data.dtype.descr]
-        ncols = len(self.field_names)
-        nrows = 1
-
-        return (nrows, ncols)
-
-
-    def zoomTable(self):
-        """Fill the zoom view with the content of the clicked nested field."""
-
-        for column in range(0, self.grid.columnCount()):
-            content = self.data[self.field_names[column]]
-            text = self.formatContent(content)
-            item = QtWidgets.QTableWidgetItem(text)
-            self.grid.setItem(0, column, item)
-
-
-    def zoomArray(self):
-        """Fill the zoom view with the content of the clicked cell."""
-
-        num_rows = self.grid.rowCount()
-        num_cols = self.grid.columnCount()
-        # Numpy scalars are displayed in a 1x1 grid
-        if num_rows == num_cols == 1:
-            content = self.data
-            text = self.formatContent(content)
-            item = QtWidgets.QTableWidgetItem(text)
-            self.grid.setItem(0, 0, item)
-        # 1-D arrays
-        elif num_cols == 1:
-            for row in range(0, num_rows):
-                content = self.data[row]
-                text = self.formatContent(content)
-                item = QtWidgets.QTableWidgetItem(text)
-                self.grid.setItem(row, 0, item)
-        # N-D arrays
-        else:
-            for row in range(0, num_rows):
-                for column in range(0, num_cols):
-                    content = self.data[row][column]
-                    text = self.formatContent(content)
-                    item = QtWidgets.QTableWidgetItem(text)
-                    self.grid.setItem(row, column, item)
-
-
-    def zoomView(self, row, col):
+    def zoomView(self, index):
         """Makes the content of the clicked cell fully visible.
 
-        :Parameters:
-
-        - `row`: the row of the clicked cell
-        - `col`: the column of the clicked cell
+        :Parameter index: the model index of the clicked cell
         """
 
-        # Check if the zoom has to be done
-        if self.data_shape:
-            if not (self.data.shape !=() or self.field_names):
-                return
-        elif not (isinstance(self.data, list) or isinstance(self.data, tuple)):
+        if not self.source.canZoom():
+            return
+        row, col = index.row(), index.column()
+        try:
+            cell = self.source.cell(row, col)
+        except tables.HDF5ExtError as e:
+            log.error(f'The zoomed cell cannot be read: {e}')
             return
-
-        # Get data
-        if self.data_shape:
-            # Arrays and table nested fields
-            if self.field_names:
-                cell = self.data[self.field_names[col]]
-            elif len(self.data.shape) > 1:
-                cell = self.data[row][col]
-            elif len(self.data.shape) == 1:
-                cell = self.data[row]
-        else:
-            # Python lists and tuples
-            cell = self.data[row]
 
         # Get caption
-        if self.field_names:
-            caption = f'{self.title}: {self.field_names[col]}[{row}]'
+        if self.source.headers:
+            caption = f'{self.title}: {self.source.headers[col]}[{row}]'
         else:
             caption = f'{self.title}: ({row}, {col})'
         ZoomCell(cell, caption, self.workspace, self.dbt_leaf)